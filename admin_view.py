@@ -1,8 +1,238 @@
 import streamlit as st
 import data_manager
 import pandas as pd
-import plotly.express as px
-import threading
+import os
+import importer
+import jobs
+import metrics
+import tile_proxy
+
+def _format_eta(seconds):
+    if seconds is None:
+        return "계산 중"
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}시간 {minutes}분"
+    if minutes:
+        return f"{minutes}분 {secs}초"
+    return f"{secs}초"
+
+@st.fragment(run_every=2)
+def _render_job_panel():
+    # Polls the background worker every 2s without rerunning the whole dashboard
+    recent_jobs = jobs.list_jobs(limit=5)
+    active = jobs.has_active_jobs()
+    st.caption("이 서버 프로세스에서 실행한 작업만 표시됩니다. 서버를 다시 시작하면 대기·진행 중인 작업은 사라지므로 다시 실행하세요.")
+    
+    for job in recent_jobs:
+        status_text = {
+            jobs.QUEUED: "대기 중",
+            jobs.RUNNING: "진행 중",
+            jobs.DONE: "완료",
+            jobs.FAILED: "실패",
+            jobs.CANCELLED: "취소됨",
+        }[job.status]
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            if job.status == jobs.RUNNING and not job.total:
+                st.caption(f"{job.label}: {job.done:,}건 처리 중")
+            elif job.status == jobs.RUNNING:
+                st.progress(job.fraction, text=f"{job.label}: {job.done}/{job.total} · 남은 시간 {_format_eta(job.eta_seconds)}")
+            else:
+                detail = job.error if job.status == jobs.FAILED else job.message
+                st.caption(f"{job.label}: {status_text}" + (f" ({detail})" if detail else ""))
+        with col2:
+            if job.status in jobs.ACTIVE_STATES:
+                st.button("취소", key=f"cancel_job_{job.id}", on_click=jobs.cancel, args=(job.id,),
+                          disabled=job.cancel_requested, width='stretch')
+    
+    # Refresh the KPIs/tables once when the last running job finishes
+    if st.session_state.get('jobs_were_active') and not active:
+        st.session_state['jobs_were_active'] = False
+        st.rerun(scope="app")
+    st.session_state['jobs_were_active'] = active
+
+FEED_LENGTH = 20
+
+def _poll_status_feed():
+    # Applies new change-log entries to this session's feed; the dataset itself is only patched, never reloaded
+    cursor = st.session_state.get('feed_version') or data_manager.get_data_version()
+    version, changes = data_manager.get_changes_since(cursor)
+    feed = st.session_state.setdefault('status_feed', [])
+    if changes is None:
+        # A full import replaced the data; older events no longer refer to current rows
+        feed.clear()
+        changes = []
+    
+    status_changes = [(row_id, value) for row_id, field, value in changes if field == 'Status']
+    if status_changes:
+        names = data_manager.get_data(columns=['Company Name', 'Manager'], include_removed=True)
+        now = pd.Timestamp.now().strftime('%H:%M:%S')
+        for row_id, status in status_changes:
+            if row_id in names.index:
+                feed.insert(0, {
+                    '시각': now,
+                    '담당사원': names.at[row_id, 'Manager'],
+                    '상호': names.at[row_id, 'Company Name'],
+                    '상태': status,
+                })
+        del feed[FEED_LENGTH:]
+    st.session_state['feed_version'] = version
+    return feed
+
+@st.fragment(run_every=3)
+def _render_live_status():
+    # Field status changes show up here within a few seconds without a full dashboard rerun
+    feed = _poll_status_feed()
+    
+    # KPIs come from the maintained Status x Branch x Manager aggregates, not a scan of every row
+    summary = data_manager.get_kpi_summary()
+    status_counts = summary.groupby('Status')['Count'].sum()
+    
+    col1, col2, col3 = st.columns(3)
+    total_contracts = int(status_counts.sum())
+    completed_contracts = int(status_counts.get('완료', 0))
+    in_progress_contracts = int(status_counts.get('진행중', 0))
+    
+    col1.metric("총 계약 대상", f"{total_contracts} 건")
+    col2.metric("완료", f"{completed_contracts} 건")
+    col3.metric("진행중", f"{in_progress_contracts} 건")
+    
+    chart_col1, chart_col2 = st.columns(2)
+    
+    with chart_col1:
+        # plotly.express is slow to import; the field page imports this module for the timing panel only
+        import plotly.express as px
+
+        st.subheader("전체 진척도")
+        status_summary = status_counts.reset_index()
+        status_summary.columns = ['상태', '건수']
+        fig = px.pie(status_summary, values='건수', names='상태', hole=0.3,
+                     color='상태', color_discrete_map={'완료':'blue', '진행중':'orange', '미확인':'red'})
+        st.plotly_chart(fig, width='stretch')
+    
+    with chart_col2:
+        st.subheader("최근 상태 변경")
+        if feed:
+            st.dataframe(pd.DataFrame(feed), width='stretch', hide_index=True)
+        else:
+            st.caption("이 화면을 연 이후 변경된 상태가 없습니다.")
+
+def _paginate(df, key, page_size=50):
+    # Slice on the server so only one page of rows is sent to the browser
+    page_count = max(1, -(-len(df) // page_size))
+    page = st.number_input(f"페이지 (총 {page_count})", min_value=1, max_value=page_count, value=1, key=f"{key}_page")
+    return df.iloc[(page - 1) * page_size:page * page_size], page
+
+def render_timing_panel(current):
+    """Admin-only breakdown of the script run that just finished (`current` from metrics.request) and process totals."""
+    with st.expander(f"⏱️ 성능 계측 (이번 실행 {current.get('total_ms', 0):,.0f} ms)", expanded=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.caption("이번 실행 (포함 시간, 중첩 구간은 겹쳐서 집계)")
+            if current['timers']:
+                run_df = pd.DataFrame(sorted(current['timers'].items(), key=lambda item: -item[1]), columns=['구간', 'ms'])
+                st.dataframe(run_df, hide_index=True, width='stretch')
+            if current['counters']:
+                st.dataframe(pd.DataFrame(list(current['counters'].items()), columns=['카운터', '값']), hide_index=True, width='stretch')
+        with col2:
+            st.caption("프로세스 누적")
+            timers, counters = metrics.snapshot()
+            if timers:
+                totals_df = pd.DataFrame(
+                    [(name, count, total / count, worst) for name, (count, total, worst) in timers.items()],
+                    columns=['구간', '횟수', '평균 ms', '최대 ms']
+                ).sort_values('평균 ms', ascending=False)
+                st.dataframe(totals_df.round(1), hide_index=True, width='stretch')
+            if counters:
+                st.dataframe(pd.DataFrame(list(counters.items()), columns=['카운터', '값']), hide_index=True, width='stretch')
+        
+        recent = metrics.recent_requests()
+        if recent:
+            st.caption(f"최근 요청 {len(recent)}건 (파일 로그: {metrics.LOG_FILE or '꺼짐, METRICS_LOG로 켜기'})")
+            st.dataframe(
+                pd.DataFrame([
+                    {'시각': pd.Timestamp(r['started_at'], unit='s').strftime('%H:%M:%S'), '페이지': r['page'], 'ms': r.get('total_ms')}
+                    for r in recent
+                ]),
+                hide_index=True, width='stretch'
+            )
+
+def _spool_upload(uploaded_file):
+    # Keep the upload on disk so the background import can stream it after this script run ends
+    spooled = st.session_state.get('upload_spool')
+    if spooled and spooled[0] == uploaded_file.file_id and os.path.exists(spooled[1]):
+        return spooled[1]
+    if spooled:
+        # A different file replaced the one that was never imported
+        importer.discard_spool(spooled[1])
+    path = importer.spool(uploaded_file, uploaded_file.name)
+    st.session_state['upload_spool'] = (uploaded_file.file_id, path)
+    return path
+
+def _import_and_geocode(job, path, mapping, row_count, incremental):
+    try:
+        if incremental:
+            summary = data_manager.upsert_mapped_chunks(
+                importer.iter_chunks(path), mapping, progress=job.report, total_rows=row_count
+            )
+            job.message = (
+                f"신규 {summary['inserted']:,} · 변경 {summary['updated']:,} · 유지 {summary['unchanged']:,}"
+                f" · 해지 {summary['removed']:,} · 재지오코딩 {summary['regeocode']:,}"
+            )
+        else:
+            count = data_manager.import_mapped_chunks(
+                importer.iter_chunks(path), mapping, progress=job.report, total_rows=row_count
+            )
+            job.message = f"전체 {count:,}건 교체"
+    finally:
+        importer.discard_spool(path)
+    # Queued behind this job on the same worker, so they see the new data (plans after coordinates)
+    data_manager.submit_geocoding_job()
+    data_manager.submit_route_plan_job()
+
+def _render_territory_assignment():
+    st.caption(
+        "지사의 미배정 고객을 가까운 고객끼리 묶어 담당자별로 건수·월정료가 고르게 나눠지도록 한 번에 배정합니다. "
+        "담당 고객이 적은 사원에게 더 많이 배정되고, 좌표가 없는 고객은 제외됩니다."
+    )
+    unassigned = data_manager.get_data({'Manager': data_manager.UNASSIGNED}, columns=['Branch'])
+    if unassigned.empty:
+        st.success("미배정 고객이 없습니다.")
+        return
+    counts = unassigned['Branch'].value_counts()
+    branch = st.selectbox(
+        "지사", options=counts.index.tolist(),
+        format_func=lambda b: f"{b} (미배정 {counts[b]:,}건)", key='territory_branch'
+    )
+    staff = data_manager.get_data({'Branch': branch}, columns=['Manager'])['Manager'].unique().tolist()
+    staff = sorted(m for m in staff if m != data_manager.UNASSIGNED)
+    managers = st.multiselect("배정할 담당자", options=staff, default=staff, key=f'territory_managers_{branch}')
+    new_names = st.text_input("담당자 추가 (쉼표로 구분)", key='territory_new_managers')
+    managers += [name.strip() for name in new_names.split(',') if name.strip()]
+    fee_weight = st.slider("균형 기준 (0 = 건수만, 1 = 월정료만)", 0.0, 1.0, 0.5, 0.1, key='territory_fee_weight')
+
+    col1, col2 = st.columns(2)
+    with col1:
+        preview = st.button("배정 미리보기", width='stretch', disabled=not managers)
+    with col2:
+        apply = st.button("배정 실행", type="primary", width='stretch', disabled=not managers)
+    if not (preview or apply):
+        return
+    with st.spinner("구역 계산 중..."):
+        summary, skipped = data_manager.assign_unassigned(branch, managers, fee_weight, apply=apply)
+    if apply:
+        st.success(f"{summary['Assigned'].sum():,}건을 {len(summary)}명에게 배정했습니다. 방문 계획은 백그라운드에서 다시 계산됩니다.")
+    st.dataframe(
+        summary.rename(columns={
+            'Assigned': '신규 배정', 'Assigned Fee': '신규 월정료', 'Contracts': '배정 후 고객 수',
+            'Monthly Fee': '배정 후 월정료', 'Spread km': '구역 반경 (km)',
+        }).round(2),
+        width='stretch'
+    )
+    if skipped:
+        st.warning(f"좌표가 없는 {skipped:,}건은 배정하지 못했습니다. 지오코딩 후 다시 실행하세요.")
 
 def render_admin_dashboard():
     st.title("📊 관리자 대시보드")
@@ -10,13 +240,15 @@ def render_admin_dashboard():
     # --- Dynamic Excel Upload & Mapping Section ---
     with st.expander("📥 엑셀 데이터 업로드 및 컬럼 매핑 (전문가용)", expanded=False):
         st.write("새로운 엑셀 데이터를 업로드하고, 우리 시스템에 맞게 컬럼을 지정하여 반영합니다.")
-        uploaded_file = st.file_uploader("엑셀 파일 선택 (.xlsx)", type=['xlsx'])
+        uploaded_file = st.file_uploader("데이터 파일 선택 (.xlsx / .csv / .parquet)", type=importer.SUPPORTED_TYPES)
         
         if uploaded_file is not None:
             try:
-                raw_df = pd.read_excel(uploaded_file)
-                excel_cols = raw_df.columns.tolist()
-                st.success(f"파일 로드 성공! 총 {len(raw_df)}행, {len(excel_cols)}개의 컬럼이 발견되었습니다.")
+                # Only the header is read here; rows are streamed in chunks by the import job
+                upload_path = _spool_upload(uploaded_file)
+                excel_cols, row_count = importer.read_header(upload_path)
+                row_text = f"총 {row_count:,}행, " if row_count is not None else ""
+                st.success(f"파일 로드 성공! {row_text}{len(excel_cols)}개의 컬럼이 발견되었습니다.")
                 
                 # Define Fields to Map
                 fields_to_map = {
@@ -64,62 +296,112 @@ def render_admin_dashboard():
                             key=f"map_{field_key}"
                         )
                         
-                if st.button("적용 및 지오코딩(좌표변환) 시작", type="primary", use_container_width=True):
-                    with st.spinner("데이터를 변환하고 좌표를 가져오는 중입니다. 잠시만 기다려주세요..."):
-                        # Process and save DB
-                        mapped_df = data_manager.apply_custom_mapping(raw_df, mapping_result)
-                        
-                        # Generate Lat/Lng
-                        data_manager.geocode_missing(mapped_df)
-                        
-                    st.success("데이터 적용 및 좌표 변환이 완료되었습니다!")
-                    st.rerun()
+                import_mode = st.radio(
+                    "반영 방식",
+                    options=['incremental', 'replace'],
+                    format_func={
+                        'incremental': "변경분만 반영 (계약번호 기준, 방문 상태·좌표 유지)",
+                        'replace': "전체 교체 (모든 상태·좌표 초기화)",
+                    }.get,
+                    key="import_mode"
+                )
+                
+                if st.button("적용 및 지오코딩(좌표변환) 시작", type="primary", width='stretch'):
+                    # Process and save DB, then generate Lat/Lng, on the background worker
+                    jobs.submit(
+                        'import',
+                        lambda job: _import_and_geocode(
+                            job, upload_path, mapping_result, row_count, import_mode == 'incremental'
+                        ),
+                        label="엑셀 데이터 반영"
+                    )
+                    # The job owns (and deletes) the spooled file now
+                    st.session_state.pop('upload_spool', None)
+                    st.success("백그라운드 작업으로 등록되었습니다. 아래 작업 현황에서 진행 상황을 확인하세요.")
                     
             except Exception as e:
                 st.error(f"파일을 읽거나 처리하는 중 오류가 발생했습니다: {e}")
     # --- End Upload Section ---
     
-    # Reload data
-    df = data_manager.get_data()
+    if jobs.list_jobs():
+        with st.expander("⏳ 백그라운드 작업 현황", expanded=jobs.has_active_jobs()):
+            _render_job_panel()
     
-    # KPIs
-    st.header("실시간 현황")
-    col1, col2, col3 = st.columns(3)
-    total_contracts = len(df)
-    completed_contracts = len(df[df['Status'] == '완료'])
-    in_progress_contracts = len(df[df['Status'] == '진행중'])
+    with st.expander("🗓️ 일일 방문 계획", expanded=False):
+        st.caption("사원별 담당 고객을 하루 단위 묶음으로 나누고 방문 순서를 미리 계산합니다. 데이터 반영 후 자동으로 다시 계산됩니다.")
+        if st.button("방문 계획 다시 계산", width='stretch'):
+            data_manager.submit_route_plan_job()
+            st.rerun()
     
-    col1.metric("총 계약 대상", f"{total_contracts} 건")
-    col2.metric("완료", f"{completed_contracts} 건")
-    col3.metric("진행중", f"{in_progress_contracts} 건")
+    with st.expander("🗺️ 미배정 고객 구역 배정", expanded=False):
+        _render_territory_assignment()
+
+    if tile_proxy.PUBLIC_URL:
+        with st.expander("🧭 지도 타일 캐시", expanded=False):
+            cache = tile_proxy.get_cache()
+            st.caption(
+                f"사원별 고객 분포 영역의 지도 타일을 미리 받아두면 현장에서 지도가 빠르게 열립니다. "
+                f"현재 {cache.size / 1024 / 1024:,.0f} MB / {cache.max_bytes / 1024 / 1024:,.0f} MB 사용 중"
+            )
+            seedable = tile_proxy.seedable_layers()
+            if not seedable:
+                st.caption("공개 타일 서버(OpenStreetMap, Google 등)는 대량 다운로드를 금지하므로, 미리 받기는 TILE_SOURCE_URL로 자체/계약 타일 서버를 지정한 경우에만 사용할 수 있습니다.")
+            if st.button("지도 타일 미리 받기", width='stretch', disabled=not seedable):
+                data_manager.submit_tile_seed_job()
+                st.rerun()
+    
+    st.header("실시간 현황")
+    _render_live_status()
     
     st.markdown("---")
     
-    # Charts
-    chart_col1, chart_col2 = st.columns(2)
+    st.subheader("⚠️ 미확인 사원 리스트 (Action Required)")
+    unchecked_df = data_manager.get_data(
+        {'Status': '미확인'}, columns=['Branch', 'Manager', 'Company Name', 'Contact', 'Contract No']
+    )
     
-    with chart_col1:
-        st.subheader("전체 진척도")
-        status_summary = df['Status'].value_counts().reset_index()
-        status_summary.columns = ['상태', '건수']
-        fig = px.pie(status_summary, values='건수', names='상태', hole=0.3,
-                     color='상태', color_discrete_map={'완료':'blue', '진행중':'orange', '미확인':'red'})
-        st.plotly_chart(fig, use_container_width=True) # Plotly chart might still use it, we will keep it for plotly to be safe. 
-
-    with chart_col2:
-        st.subheader("⚠️ 미확인 사원 리스트 (Action Required)")
-        unchecked_df = df[df['Status'] == '미확인']
+    if len(unchecked_df) > 0:
+        st.warning(f"총 {len(unchecked_df)}건의 미확인 항목이 있습니다.")
+        unchecked_page, page = _paginate(unchecked_df, 'unchecked_table')
+        selection = st.dataframe(
+            unchecked_page[['Branch', 'Manager', 'Company Name', 'Contact']],
+            width='stretch',
+            hide_index=True,
+            on_select='rerun',
+            selection_mode='multi-row',
+            key=f'unchecked_table_{page}'
+        )
         
-        if len(unchecked_df) > 0:
-            st.warning(f"총 {len(unchecked_df)}건의 미확인 항목이 있습니다.")
-            st.dataframe(
-                unchecked_df[['Branch', 'Manager', 'Company Name', 'Contact']],
-                width='stretch',
-                hide_index=True
-            )
-        else:
-            st.success("모든 사원이 업무를 확인했습니다.")
+        # Multi-select action: one batched write for all selected rows
+        selected_rows = selection.selection.rows
+        if selected_rows:
+            action_col1, action_col2 = st.columns([2, 1])
+            with action_col1:
+                new_status = st.selectbox("선택 항목 상태 변경", options=['진행중', '완료'], key='admin_bulk_status')
+            with action_col2:
+                st.write("")
+                if st.button(f"{len(selected_rows)}건 적용", width='stretch'):
+                    contract_nos = unchecked_page.iloc[selected_rows]['Contract No'].unique()
+                    data_manager.batch_update((contract_no, 'Status', new_status) for contract_no in contract_nos)
+                    st.rerun()
+    else:
+        st.success("모든 사원이 업무를 확인했습니다.")
 
+    st.markdown("---")
+    st.subheader("사원별 현황")
+    summary = data_manager.get_kpi_summary()
+    by_manager = summary.pivot_table(index=['Branch', 'Manager'], columns='Status', values='Count', aggfunc='sum', fill_value=0)
+    by_manager['월정료 합계'] = summary.groupby(['Branch', 'Manager'])['Fee'].sum()
+    st.dataframe(by_manager, width='stretch')
+    
     st.markdown("---")
     st.subheader("전체 데이터 보기")
-    st.dataframe(df, width='stretch')
+    search_query = st.text_input("상호명·주소 검색", placeholder="예: 한결, ㅎㄱ, 역삼동")
+    if search_query:
+        # Best matches first, from the search index rather than a scan of every row
+        df = data_manager.search_contracts(search_query)
+    else:
+        df = data_manager.get_data()
+    page_df, _ = _paginate(df, 'all_data', page_size=100)
+    st.caption(f"총 {len(df):,}건")
+    st.dataframe(page_df, width='stretch')
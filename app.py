@@ -1,5 +1,5 @@
 import streamlit as st
-import data_manager
+import bootstrap
 
 # Page Configuration
 st.set_page_config(
@@ -8,8 +8,8 @@ st.set_page_config(
     layout="centered"
 )
 
-# Initialize Database on First Run
-data_manager.init_db()
+# Initialize the database once per process, off this script run: the login form needs no data
+bootstrap.start()
 
 # Initialize Session State
 if 'authenticated' not in st.session_state:
@@ -35,7 +35,7 @@ with col1:
     st.subheader("👨‍💼 관리자 로그인")
     st.caption("초기 비밀번호: admin123")
     admin_pw = st.text_input("관리자 비밀번호", type="password", key="admin_pw")
-    if st.button("관리자 접속", use_container_width=True):
+    if st.button("관리자 접속", width='stretch'):
         if admin_pw == "admin123":
             st.session_state['authenticated'] = True
             st.session_state['role'] = 'admin'
@@ -48,7 +48,7 @@ with col2:
     st.subheader("🏃‍♂️ 현장사원 로그인")
     st.caption("초기 비밀번호: field123")
     field_pw = st.text_input("사원 비밀번호", type="password", key="field_pw")
-    if st.button("현장사원 접속", use_container_width=True):
+    if st.button("현장사원 접속", width='stretch'):
         if field_pw == "field123":
             st.session_state['authenticated'] = True
             st.session_state['role'] = 'field'
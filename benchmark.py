@@ -0,0 +1,264 @@
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+import subprocess
+
+# Times the data_manager and field_view hot paths on synthetic data (see synthetic_data.py).
+# Each size runs in its own temporary directory, so the real contracts.db is never touched.
+#
+#   python benchmark.py --rows 1000 10000 100000 --output bench.json
+#   python benchmark.py --rows 1000 10000 100000 --compare bench.json
+#   python benchmark.py --imports-only    # cold-start budgets only; exits non-zero when one is exceeded
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+import data_manager
+import field_view
+import synthetic_data
+
+# Cold-start budgets: import time (ms) of each page module in a fresh interpreter. Heavy optional
+# libraries must not be loaded at import time at all; they are imported on first use.
+# `--imports-only` runs just these checks; any violation makes the run exit non-zero.
+IMPORT_BUDGETS_MS = {
+    'bootstrap': 50,
+    # pandas alone is ~500 ms of this
+    'data_manager': 750,
+    'field_view': 2000,
+    'admin_view': 2000,
+}
+LAZY_DEPENDENCIES = ('geopy', 'folium', 'scipy', 'plotly.express')
+# Subsystems a module must import on first use rather than at import time
+LAZY_SUBSYSTEMS = {
+    'data_manager': ('jobs', 'route_plans', 'tile_proxy', 'territories'),
+}
+
+# Stops handed to the route optimizer (the field view's "nearest N" setting); the distance matrix is quadratic
+ROUTE_STOPS = 500
+STATUS_UPDATES = 20
+
+def _reset_store_state():
+    # Module-level caches belong to the previous size's directory
+    data_manager._dataset = data_manager.VersionedDataset()
+    data_manager._spatial_indexes.clear()
+    data_manager._schema_ready = False
+    field_view._map_html.clear()
+
+class Bench:
+    def __init__(self, repeat, baseline=None):
+        self.repeat = repeat
+        self.results = []
+        self.baseline = {(r['name'], r['rows']): r for r in (baseline or {}).get('results', [])}
+
+    def measure(self, name, rows, fn, setup=None, repeat=None):
+        """Median/min wall time of fn() over `repeat` runs; setup() runs untimed before each."""
+        times = []
+        for _ in range(repeat or self.repeat):
+            # The store functions print progress; keep it out of the results table
+            with contextlib.redirect_stdout(io.StringIO()):
+                if setup:
+                    setup()
+                start = time.perf_counter()
+                fn()
+                times.append(time.perf_counter() - start)
+        return self.add(name, rows, times)
+
+    def add(self, name, rows, times):
+        """Records timings (seconds) taken elsewhere, e.g. in a subprocess."""
+        result = {
+            'name': name,
+            'rows': rows,
+            'median_ms': round(statistics.median(times) * 1000, 3),
+            'min_ms': round(min(times) * 1000, 3),
+            'repeat': len(times),
+        }
+        self.results.append(result)
+        self._print(result)
+        return result
+
+    def _print(self, result):
+        line = f"{result['name']:<38} {result['rows']:>10,} {result['median_ms']:>12.1f} {result['min_ms']:>12.1f}"
+        previous = self.baseline.get((result['name'], result['rows']))
+        if previous and previous['median_ms']:
+            line += f" {result['median_ms'] / previous['median_ms']:>9.2f}x"
+        print(line, flush=True)
+
+    def header(self):
+        line = f"{'benchmark':<38} {'rows':>10} {'median ms':>12} {'min ms':>12}"
+        if self.baseline:
+            line += f" {'vs base':>10}"
+        print(line)
+        print('-' * len(line))
+
+def _route_frame(seed_df):
+    """Field-view style visit list: the nearest ROUTE_STOPS stops optimized, the rest appended unrouted."""
+    located = seed_df.dropna(subset=['Latitude', 'Longitude'])
+    start_lat = located.iloc[0]['Latitude'] - 0.01
+    start_lng = located.iloc[0]['Longitude'] - 0.01
+    index = data_manager.get_spatial_index(located.iloc[0]['Manager'])
+    nearby_ids, _ = index.nearest(start_lat, start_lng, k=ROUTE_STOPS)
+    targets = located[located.index.isin(nearby_ids)]
+    rest = located[~located.index.isin(nearby_ids)].copy()
+    rest['Distance'] = float('inf')
+    rest['Route_Km'] = float('inf')
+    return start_lat, start_lng, targets, rest
+
+def run_size(bench, rows, seed, geocoder_latency):
+    raw = synthetic_data.generate_raw(rows, seed=seed)
+    _reset_store_state()
+    data_manager._create_schema()
+
+    bench.measure('apply_custom_mapping', rows, lambda: data_manager.apply_custom_mapping(raw, synthetic_data.RAW_MAPPING))
+    # Only the first run geocodes; later runs would be served from the cache
+    bench.measure(
+        'geocode_missing (stub geocoder)', rows,
+        lambda: data_manager.geocode_missing(provider=synthetic_data.SyntheticGeocoder(latency=geocoder_latency)),
+        repeat=1
+    )
+
+    cold = lambda: setattr(data_manager, '_dataset', data_manager.VersionedDataset())
+    bench.measure('get_data (cold, all columns)', rows, data_manager.get_data, setup=cold)
+    bench.measure('get_data (cold, field columns)', rows, lambda: data_manager.get_data(columns=field_view.FIELD_COLUMNS), setup=cold)
+    bench.measure('get_data (warm)', rows, data_manager.get_data)
+
+    df = data_manager.get_data()
+    top_manager = df['Manager'].value_counts().index[0]
+    bench.measure('get_data (manager filter)', rows, lambda: data_manager.get_data({'Manager': top_manager}, columns=field_view.FIELD_COLUMNS))
+    bench.measure('get_kpi_summary', rows, data_manager.get_kpi_summary)
+
+    contract_nos = df['Contract No'].head(STATUS_UPDATES).tolist()
+    statuses = iter(['진행중', '완료'] * (bench.repeat * STATUS_UPDATES))
+
+    def update_statuses():
+        for contract_no in contract_nos:
+            data_manager.update_status(contract_no, next(statuses))
+        # Readers pick the writes up through the delta log
+        data_manager.get_data()
+
+    bench.measure(f'update_status x{STATUS_UPDATES} + replay', rows, update_statuses)
+
+    manager_df = data_manager.get_data({'Manager': top_manager}, columns=field_view.FIELD_COLUMNS)
+    start_lat, start_lng, targets, rest = _route_frame(manager_df)
+    bench.measure(
+        f'optimize_route ({len(targets)} stops)', rows,
+        lambda: field_view.optimize_route(start_lat, start_lng, targets)
+    )
+    optimized_df = field_view.assign_route_order(pd.concat([field_view.optimize_route(start_lat, start_lng, targets), rest]))
+    bench.measure(
+        f'map build + html ({len(optimized_df)} markers)', rows,
+        lambda: field_view.build_field_map(optimized_df, start_lat, start_lng).get_root().render()
+    )
+    # Same rows again: a rerun served from the rendered-map cache
+    field_view.field_map_html('benchmark', optimized_df, start_lat, start_lng)
+    bench.measure(
+        'map html (cached rerun)', rows,
+        lambda: field_view.field_map_html('benchmark', optimized_df, start_lat, start_lng)
+    )
+    bench.measure('list page build (50 rows)', rows, lambda: field_view.build_list_page(optimized_df, 1, 50))
+
+    # Territory split of the branch with the most unassigned contracts, not written back
+    unassigned = df[df['Manager'] == data_manager.UNASSIGNED]
+    branch = unassigned['Branch'].value_counts().index[0]
+    branch_managers = df.loc[(df['Branch'] == branch) & (df['Manager'] != data_manager.UNASSIGNED), 'Manager'].unique().tolist()
+    bench.measure(
+        f'assign_unassigned ({len(branch_managers)} managers)', rows,
+        lambda: data_manager.assign_unassigned(branch, branch_managers, apply=False)
+    )
+
+def check_imports(bench, repeat):
+    """
+    Times each module in IMPORT_BUDGETS_MS from a fresh interpreter and
+    returns the budget violations: too slow, or a LAZY_DEPENDENCIES (or the
+    module's LAZY_SUBSYSTEMS) module loaded at import time.
+    """
+    code = (
+        "import sys, time, json\n"
+        "start = time.perf_counter()\n"
+        "import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        "print(json.dumps([elapsed, [m for m in {lazy!r} if m in sys.modules]]))\n"
+    )
+    failures = []
+    for module, budget_ms in IMPORT_BUDGETS_MS.items():
+        times, loaded = [], set()
+        for _ in range(repeat):
+            output = subprocess.run(
+                [sys.executable, '-c', code.format(module=module, lazy=LAZY_DEPENDENCIES + LAZY_SUBSYSTEMS.get(module, ()))],
+                capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout
+            elapsed, eager = json.loads(output.strip().splitlines()[-1])
+            times.append(elapsed)
+            loaded.update(eager)
+        result = bench.add(f'import {module} (cold)', 0, times)
+        if result['median_ms'] > budget_ms:
+            failures.append(f"import {module}: {result['median_ms']:.0f} ms > budget {budget_ms} ms")
+        if loaded:
+            failures.append(f"import {module} loads {', '.join(sorted(loaded))}; import it on first use instead")
+    return failures
+
+def _environment(args):
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'geocoder_latency': args.geocoder_latency,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark data_manager/field_view on synthetic contracts.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--geocoder-latency', type=float, default=0.0, help="seconds per stub geocoder call")
+    parser.add_argument('--output', help="write results as JSON for later --compare")
+    parser.add_argument('--compare', help="JSON from an earlier run; adds a ratio column")
+    parser.add_argument('--imports-only', action='store_true', help="only the cold-start import budget checks")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    bench = Bench(args.repeat, baseline)
+    bench.header()
+
+    failures = check_imports(bench, args.repeat)
+    origin = os.getcwd()
+    for rows in [] if args.imports_only else args.rows:
+        with tempfile.TemporaryDirectory(prefix='field_sales_bench_') as workdir:
+            os.chdir(workdir)
+            try:
+                run_size(bench, rows, args.seed, args.geocoder_latency)
+            finally:
+                os.chdir(origin)
+                _reset_store_state()
+
+    report = {'environment': _environment(args), 'results': bench.results, 'failures': failures}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Results written to {args.output}")
+    for failure in failures:
+        print(f"BUDGET EXCEEDED: {failure}")
+    return report
+
+if __name__ == '__main__':
+    sys.exit(1 if main()['failures'] else 0)
@@ -0,0 +1,59 @@
+import threading
+import metrics
+
+# Process start-up shared by every page. Streamlit reruns a page script on every interaction, but
+# the store only needs initializing once per process, and the first page after login should find
+# the contracts already loaded. data_manager (pandas, pyarrow) is imported here on first use, so the
+# login page renders without waiting for it.
+
+_lock = threading.Lock()
+_initialized = False
+_warmup = None
+
+def ensure_initialized():
+    """Runs data_manager.init_db() once per process, then starts warming the dataset. Later calls return at once."""
+    global _initialized
+    if _initialized:
+        return
+    with _lock:
+        if not _initialized:
+            import data_manager
+            with metrics.timer('bootstrap.init_db'):
+                data_manager.init_db()
+            # Uploads abandoned by a previous run (closed session, crash mid-import)
+            import importer
+            importer.sweep_stale_spools()
+            _initialized = True
+    _start_warmup()
+
+def start():
+    """Initializes in the background; for the login page, which does not read the store itself."""
+    if not _initialized:
+        threading.Thread(target=_initialize_quietly, name='bootstrap', daemon=True).start()
+
+def _initialize_quietly():
+    try:
+        ensure_initialized()
+    except Exception as e:
+        # The next page calls ensure_initialized() again and reports the error there
+        print(f"Background initialization failed: {e}")
+
+def _start_warmup():
+    global _warmup
+    with _lock:
+        if _warmup is None:
+            _warmup = threading.Thread(target=_warm, name='dataset-warmup', daemon=True)
+            _warmup.start()
+
+def _warm():
+    import data_manager
+    # Only for its column list; streamlit is already loaded in the process that warms up
+    import field_view
+
+    try:
+        with metrics.timer('bootstrap.warm'):
+            # What the first field page and dashboard KPIs read; other columns stay on disk until a page asks for them
+            data_manager.get_data(columns=field_view.FIELD_COLUMNS)
+            data_manager.get_kpi_summary()
+    except Exception as e:
+        print(f"Dataset warm-up failed: {e}")
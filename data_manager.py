@@ -1,13 +1,617 @@
 import pandas as pd
+import numpy as np
 import os
 import random
-from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
+import socket
+import sqlite3
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+import geocoding
+import spatial_index
+import search_index
+import snapshot
+import file_locks
+import metrics
+# jobs, route_plans, tile_proxy and territories are imported in the functions that use them, so
+# pages that only read contracts do not load the background subsystems
 
-DB_FILE = "contracts_db.csv"
+# SQLite (WAL mode) is the source of truth; the CSV is kept as the import/export format
+DB_FILE = "contracts.db"
+CSV_FILE = "contracts_db.csv"
+# Single-host store: any number of processes on one machine, with the files on its local disk. WAL needs
+# shared memory between all writers, so init_db refuses a network filesystem and records the owning host
+# here; another host opening the store is refused. Delete this file after moving the store to a new machine.
+HOST_FILE = "contracts.host"
+
+# Manager value of contracts nobody is assigned to yet
+UNASSIGNED = '미배정'
+
+COLUMNS = {
+    'Branch': 'TEXT',
+    'Contract No': 'TEXT',
+    'Company Name': 'TEXT',
+    'Monthly Fee': 'REAL',
+    'Manager': 'TEXT',
+    'Contact': 'TEXT',
+    'Address': 'TEXT',
+    'Stop Reason': 'TEXT',
+    'Stop Start Date': 'TEXT',
+    'Stop Days': 'REAL',
+    'Latitude': 'REAL',
+    'Longitude': 'REAL',
+    'Status': 'TEXT',
+    'Checked': 'INTEGER',
+    # Set by incremental imports when a contract is no longer in the source file
+    'Removed': 'INTEGER',
+}
+
+BOOL_COLUMNS = ('Checked', 'Removed')
+
+# Low-cardinality text columns held as pandas categoricals in memory and dictionary-encoded on disk
+CATEGORY_COLUMNS = ('Branch', 'Manager', 'Status', 'Stop Reason')
+
+# Columns that come from the uploaded file; everything else is field progress or derived
+SOURCE_FIELDS = [
+    'Branch', 'Contract No', 'Company Name', 'Monthly Fee', 'Manager', 'Contact',
+    'Address', 'Stop Reason', 'Stop Start Date', 'Stop Days'
+]
+
+# Pseudo-field in the delta log for a row inserted by an incremental import (value = full row)
+ROW_INSERT = '__row__'
+
+def _connect():
+    # Autocommit connection; writers open their own transaction via _transaction()
+    conn = sqlite3.connect(DB_FILE, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+@contextmanager
+def _transaction():
+    # BEGIN IMMEDIATE takes the write lock up front so concurrent writers (of this host, see HOST_FILE) queue
+    # instead of losing updates
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def _create_schema():
+    conn = _connect()
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        column_sql = ", ".join(f'"{name}" {sql_type}' for name, sql_type in COLUMNS.items())
+        conn.execute(f"CREATE TABLE IF NOT EXISTS contracts (id INTEGER PRIMARY KEY, {column_sql})")
+        # Columns added after a store was created
+        existing_columns = {row[1] for row in conn.execute("PRAGMA table_info(contracts)")}
+        for name, sql_type in COLUMNS.items():
+            if name not in existing_columns:
+                conn.execute(f'ALTER TABLE contracts ADD COLUMN "{name}" {sql_type}')
+        # Contract No is not guaranteed unique in the source data, so it is indexed rather than the primary key
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_contracts_contract_no ON contracts ("Contract No")')
+        # Delta log: every single-row write is appended here so in-memory copies can patch instead of reloading
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS changes ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, row_id INTEGER NOT NULL, field TEXT NOT NULL, value TEXT)"
+        )
+        # 'generation' is bumped whenever the whole table is replaced (imports)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+        # Deltas up to 'compacted_seq' have been folded into the snapshot and deleted (see compact_journal)
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('compacted_seq', 0)")
+        # Precomputed daily visit plans (see build_route_plans), stamped with the data version they were built from
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS route_plans ("
+            "manager TEXT NOT NULL, day INTEGER NOT NULL, position INTEGER NOT NULL, row_id INTEGER NOT NULL, "
+            "leg_km REAL, start_lat REAL, start_lng REAL, PRIMARY KEY (manager, day, position))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS route_plan_info ("
+            "manager TEXT PRIMARY KEY, generation INTEGER, seq INTEGER, stops_per_day INTEGER, created_at REAL)"
+        )
+        # Last status write each offline route file made per row, so uploading it again is not a conflict with itself
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS bundle_syncs ("
+            "bundle_id TEXT NOT NULL, row_id INTEGER NOT NULL, seq INTEGER NOT NULL, PRIMARY KEY (bundle_id, row_id))"
+        )
+    finally:
+        conn.close()
+
+def _contract_key(value):
+    # Excel/CSV readers hand back 52238249, 52238249.0 or '52238249' for the same contract
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+def _to_db_value(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if hasattr(value, 'item'):
+        # numpy scalar -> python scalar
+        value = value.item()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+def _insert_frame(conn, df, first_id, table='contracts'):
+    """
+    Inserts df with consecutive row ids starting at first_id (into `table`,
+    shaped like contracts). Returns df re-indexed by those ids. Must be
+    called inside _transaction().
+    """
+    df = df.reindex(columns=list(COLUMNS))
+    df['Contract No'] = df['Contract No'].map(_contract_key)
+    df.index = pd.RangeIndex(first_id, first_id + len(df), name='id')
+
+    placeholders = ", ".join("?" for _ in range(len(COLUMNS) + 1))
+    column_sql = ", ".join(f'"{name}"' for name in COLUMNS)
+    rows = (
+        [row_id] + [_to_db_value(v) for v in values]
+        for row_id, values in zip(df.index, df.itertuples(index=False, name=None))
+    )
+    conn.executemany(f"INSERT INTO {table} (id, {column_sql}) VALUES ({placeholders})", rows)
+    return df
+
+def _bump_generation(conn):
+    # Old deltas refer to the replaced rows; readers see the new generation and reload
+    conn.execute("DELETE FROM changes")
+    # Plans point at row ids, which a full import reassigns
+    conn.execute("DELETE FROM route_plans")
+    conn.execute("DELETE FROM route_plan_info")
+    conn.execute("DELETE FROM bundle_syncs")
+    conn.execute("UPDATE meta SET value = 0 WHERE key = 'compacted_seq'")
+    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+
+def _meta(conn, key):
+    return conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+def _current_seq(conn):
+    # Compaction may have emptied the delta log; the version must not go back when it does
+    return conn.execute(
+        "SELECT MAX(COALESCE((SELECT MAX(seq) FROM changes), 0), (SELECT value FROM meta WHERE key = 'compacted_seq'))"
+    ).fetchone()[0]
+
+@metrics.timed('db.write_all')
+def _write_all(df):
+    """
+    Replaces the whole contracts table with df in a single transaction.
+    Returns df re-indexed by the row ids used in the store.
+    """
+    with _transaction() as conn:
+        conn.execute("DELETE FROM contracts")
+        df = _insert_frame(conn, df, 1)
+        _bump_generation(conn)
+    write_snapshot()
+    return df
+
+def _apply_schema(df):
+    """Typed in-memory schema: bools, float64 numerics (all-NULL columns come back as object) and categoricals."""
+    for col in df.columns:
+        if col in BOOL_COLUMNS:
+            df[col] = df[col].fillna(0).astype(bool)
+        elif COLUMNS[col] == 'REAL':
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        elif col in CATEGORY_COLUMNS and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            # Snapshot columns are categorical already; re-casting them hands back a read-only view
+            df[col] = df[col].astype('category')
+    return df
+
+@metrics.timed('db.read_frame')
+def _read_frame(conn, columns=None):
+    selected = list(COLUMNS) if columns is None else [c for c in COLUMNS if c in columns]
+    column_sql = ", ".join(f'"{name}"' for name in selected)
+    df = pd.read_sql_query(f"SELECT id, {column_sql} FROM contracts ORDER BY id", conn, index_col='id')
+    return _apply_schema(df)
+
+def _load_frame():
+    conn = _connect()
+    try:
+        return _read_frame(conn)
+    finally:
+        conn.close()
+
+def _write_rows(conn, updates):
+    """
+    Applies (row_id, field, value) updates and appends them to the delta log.
+    Must be called inside _transaction().
+    """
+    by_field = {}
+    log = []
+    for row_id, field, value in updates:
+        if field not in COLUMNS:
+            raise ValueError(f"Unknown field: {field}")
+        db_value = _to_db_value(value)
+        by_field.setdefault(field, []).append((db_value, int(row_id)))
+        log.append((int(row_id), field, json.dumps(db_value)))
+    for field, params in by_field.items():
+        conn.executemany(f'UPDATE contracts SET "{field}" = ? WHERE id = ?', params)
+    conn.executemany("INSERT INTO changes (row_id, field, value) VALUES (?, ?, ?)", log)
+
+def _log_inserted_rows(conn, first_id):
+    # Rows from first_id on, one full-row delta each; lets in-memory datasets append them instead of reloading
+    row_json = ", ".join(f"'{name}', \"{name}\"" for name in COLUMNS)
+    conn.execute(
+        f"INSERT INTO changes (row_id, field, value) "
+        f"SELECT id, ?, json_object({row_json}) FROM contracts WHERE id >= ? ORDER BY id",
+        (ROW_INSERT, first_id)
+    )
+
+def _row_ids_by_contract(conn, contract_nos):
+    found = {}
+    keys = list({_contract_key(c) for c in contract_nos})
+    # Stay under SQLite's bound-parameter limit
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        for row_id, contract_no in conn.execute(
+            f'SELECT id, "Contract No" FROM contracts WHERE "Contract No" IN ({placeholders})', chunk
+        ):
+            found.setdefault(contract_no, []).append(row_id)
+    return found
+
+def _from_db_value(field, value):
+    if field == ROW_INSERT:
+        return {col: _from_db_value(col, v) for col, v in value.items()}
+    if field in BOOL_COLUMNS:
+        return bool(value)
+    if value is None and COLUMNS[field] == 'REAL':
+        return float('nan')
+    return value
+
+def _add_categories(df, field, values):
+    column = df[field]
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        new = [v for v in dict.fromkeys(values) if v is not None and v not in column.cat.categories]
+        if new:
+            df[field] = column.cat.add_categories(new)
+
+def _apply_patch(df, row_id, field, value):
+    # Columns that were never loaded (see VersionedDataset.sync) are skipped; they are read fresh on first use
+    if field in df.columns and row_id in df.index:
+        _add_categories(df, field, [value])
+        df.at[row_id, field] = value
+
+def _append_rows(df, rows):
+    """Appends {row_id: {column: value}} to df in one concat, keeping its dtypes."""
+    new_rows = pd.DataFrame.from_dict(rows, orient='index').reindex(columns=df.columns)
+    new_rows.index.name = df.index.name
+    for col in df.columns:
+        _add_categories(df, col, new_rows[col].tolist())
+    return pd.concat([df, new_rows.astype(df.dtypes.to_dict())])
+
+# Writes to these fields invalidate spatial indexes; status clicks do not
+SPATIAL_FIELDS = ('Latitude', 'Longitude', 'Manager', 'Removed', ROW_INSERT)
+
+# Fields with a row-id partition (value -> set of row ids) for filtered reads
+PARTITION_FIELDS = ('Manager', 'Branch', 'Status', 'Removed')
+
+# KPI aggregates: (count, fee sum) per Status x Branch x Manager over non-removed rows.
+# Monthly Fee and Removed change a row's contribution without changing its key.
+AGGREGATE_DIMENSIONS = ('Status', 'Branch', 'Manager')
+AGGREGATE_FIELDS = AGGREGATE_DIMENSIONS + ('Monthly Fee', 'Removed')
+
+# Text search over company names and addresses (see search_index.py)
+SEARCH_FIELDS = ('Company Name', 'Address')
+
+def _aggregate_key(values):
+    # NaN never equals itself, so missing values are keyed as None
+    return tuple(None if pd.isna(v) else v for v in values)
+
+class VersionedDataset:
+    """
+    Process-wide in-memory copy of the contracts table.
+
+    The frame is loaded once and then kept current by replaying the `changes`
+    delta log, so a status click patches one cell instead of every session
+    re-reading the whole table. A bumped `generation` (full import) triggers a
+    reload. The returned frame is shared: callers must treat it as read-only.
+
+    Partitions for PARTITION_FIELDS, the KPI aggregates and the search index
+    are built on first use and kept current by the same delta replay, so
+    filtered reads touch only matching rows and a status write adjusts two
+    aggregate cells.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.df = None
+        self.generation = None
+        self.seq = 0
+        self.spatial_seq = 0
+        self._partitions = {}
+        self._aggregates = None
+        self._search = None
+
+    @property
+    def version(self):
+        return (self.generation, self.seq)
+
+    @property
+    def spatial_version(self):
+        return (self.generation, self.spatial_seq)
+
+    def sync(self, columns=None):
+        """
+        Brings the frame up to date and makes sure `columns` (None = all) are
+        loaded. Columns are loaded lazily, so a process serving only the field
+        view never materializes the ones it does not use.
+        """
+        wanted = list(COLUMNS) if columns is None else list(columns)
+        with self._lock, metrics.timer('dataset.sync'):
+            conn = _connect()
+            try:
+                # One read transaction so the frame and the delta cursor come from the same snapshot
+                conn.execute("BEGIN")
+                generation = _meta(conn, 'generation')
+                # Deltas this copy still needs may have been compacted away; the snapshot has them
+                if self.df is None or generation != self.generation or self.seq < _meta(conn, 'compacted_seq'):
+                    metrics.incr('dataset.miss')
+                    with metrics.timer('dataset.reload'):
+                        self._reload(conn, generation, wanted)
+                else:
+                    seq = self.seq
+                    self._replay(conn)
+                    # A hit serves the cached frame as is; a patch replayed deltas into it
+                    metrics.incr('dataset.hit' if self.seq == seq else 'dataset.patch')
+                missing = [c for c in wanted if c not in self.df.columns]
+                if missing:
+                    metrics.incr('dataset.column_load', len(missing))
+                    # Read at the same version the frame was just brought to
+                    extra = _read_frame(conn, missing).reindex(self.df.index)
+                    self.df = self.df.join(extra)[[c for c in COLUMNS if c in self.df.columns or c in missing]]
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
+            return self.df
+
+    def _reload(self, conn, generation, columns):
+        self.generation = generation
+        self._partitions = {}
+        self._aggregates = None
+        self._search = None
+        compacted_seq = _meta(conn, 'compacted_seq')
+        version = snapshot.read_version()
+        if version and version[0] == generation and version[1] >= compacted_seq:
+            # Typed, memory-mapped columnar read of just these columns, then catch up through the delta log
+            df, snapshot_generation, snapshot_seq = snapshot.read_snapshot([c for c in COLUMNS if c in columns])
+            # Re-checked on the file actually read: another process may have replaced it in between
+            if snapshot_generation == generation and snapshot_seq >= compacted_seq:
+                self.df = _apply_schema(df)
+                self.seq = snapshot_seq
+                self._replay(conn)
+                self.spatial_seq = self.seq
+                return
+        self.seq = _current_seq(conn)
+        self.df = _read_frame(conn, columns)
+        self.spatial_seq = self.seq
+
+    def _replay(self, conn):
+        inserted = {}
+        for seq, row_id, field, value in conn.execute(
+            "SELECT seq, row_id, field, value FROM changes WHERE seq > ? ORDER BY seq", (self.seq,)
+        ):
+            value = _from_db_value(field, json.loads(value))
+            if field == ROW_INSERT:
+                inserted[row_id] = value
+            elif row_id in inserted:
+                inserted[row_id][field] = value
+            else:
+                known = row_id in self.df.index
+                aggregated = known and self._aggregates is not None and field in AGGREGATE_FIELDS
+                searched = known and self._search is not None and field in SEARCH_FIELDS
+                if aggregated:
+                    self._aggregate_row(row_id, -1)
+                if searched:
+                    self._search.discard(row_id, *(self.df.at[row_id, f] for f in SEARCH_FIELDS))
+                if known and field in self._partitions:
+                    self._move_partition(field, row_id, self.df.at[row_id, field], value)
+                _apply_patch(self.df, row_id, field, value)
+                if aggregated:
+                    self._aggregate_row(row_id, 1)
+                if searched:
+                    self._search.add(row_id, *(self.df.at[row_id, f] for f in SEARCH_FIELDS))
+            self.seq = seq
+            if field in SPATIAL_FIELDS:
+                self.spatial_seq = seq
+        if inserted:
+            # One concat for all new rows rather than growing the frame row by row
+            self.df = _append_rows(self.df, inserted)
+            for field, partition in self._partitions.items():
+                for row_id, row in inserted.items():
+                    partition.setdefault(row.get(field), set()).add(row_id)
+            if self._search is not None:
+                for row_id, row in inserted.items():
+                    self._search.add(row_id, *(row.get(f) for f in SEARCH_FIELDS))
+            if self._aggregates is not None:
+                for row in inserted.values():
+                    self._aggregate(
+                        _aggregate_key(row.get(f) for f in AGGREGATE_DIMENSIONS), row.get('Monthly Fee'), row.get('Removed'), 1
+                    )
+
+    def _move_partition(self, field, row_id, old, new):
+        partition = self._partitions[field]
+        partition.get(old, set()).discard(row_id)
+        partition.setdefault(new, set()).add(row_id)
+
+    def _partition(self, field):
+        # Built lazily from the loaded column; callers hold the lock and have synced `field`
+        if field not in self._partitions:
+            self._partitions[field] = {
+                value: set(ids.tolist()) for value, ids in self.df.groupby(field, observed=True).groups.items()
+            }
+        return self._partitions[field]
+
+    def _aggregate(self, key, fee, removed, sign):
+        if removed:
+            return
+        entry = self._aggregates.setdefault(key, [0, 0.0])
+        entry[0] += sign
+        entry[1] += sign * (0.0 if pd.isna(fee) else float(fee))
+
+    def _aggregate_row(self, row_id, sign):
+        df = self.df
+        key = _aggregate_key(df.at[row_id, f] for f in AGGREGATE_DIMENSIONS)
+        self._aggregate(key, df.at[row_id, 'Monthly Fee'], df.at[row_id, 'Removed'], sign)
+
+    def aggregates(self):
+        """{(Status, Branch, Manager): (count, fee_sum)} over non-removed rows."""
+        self.sync(list(AGGREGATE_FIELDS))
+        with self._lock:
+            if self._aggregates is None:
+                live = self.df[~self.df['Removed']]
+                grouped = live.groupby(list(AGGREGATE_DIMENSIONS), observed=True, dropna=False)['Monthly Fee'].agg(['size', 'sum'])
+                self._aggregates = {
+                    _aggregate_key(key): [int(count), float(fee)]
+                    for key, count, fee in zip(grouped.index, grouped['size'], grouped['sum'])
+                }
+            return {key: tuple(entry) for key, entry in self._aggregates.items() if entry[0]}
+
+    def partition_values(self, field, include_removed=False):
+        """Values of a partition field that currently have at least one (non-removed) row."""
+        self.sync([field, 'Removed'])
+        with self._lock:
+            removed = set() if include_removed else self._partition('Removed').get(True, set())
+            return [value for value, ids in self._partition(field).items() if ids and not ids <= removed]
+
+    def search(self, query, filters=None, limit=None):
+        """
+        [(row_id, score)] matching `query` by company name or address, best
+        first, among rows matching the partition `filters`.
+        """
+        filters = filters or {}
+        self.sync(list(dict.fromkeys(list(SEARCH_FIELDS) + list(filters))))
+        with self._lock:
+            if self._search is None:
+                self._search = search_index.SearchIndex.build(self.df)
+            allowed = None
+            for field, value in filters.items():
+                ids = self._partition(field).get(value, set())
+                allowed = ids if allowed is None else allowed & ids
+            found = []
+            seen = set()
+            for score, row_ids in self._search.search(query):
+                row_ids = (row_ids if allowed is None else row_ids & allowed) - seen
+                seen |= row_ids
+                found.extend((row_id, score) for row_id in sorted(row_ids))
+                if limit is not None and len(found) >= limit:
+                    return found[:limit]
+            return found
+
+    def query(self, filters, columns=None):
+        """
+        Rows matching every field == value in `filters` (PARTITION_FIELDS only),
+        found by intersecting row-id sets instead of scanning whole columns.
+        """
+        self.sync(None if columns is None else list(dict.fromkeys(list(columns) + list(filters))))
+        with self._lock:
+            # Frame and partitions are read under the same lock, so they describe the same version
+            df = self.df
+            row_ids = None
+            for field, value in filters.items():
+                ids = self._partition(field).get(value, set())
+                row_ids = ids if row_ids is None else row_ids & ids
+            if row_ids is None:
+                return df
+            return df.loc[sorted(row_ids)]
+
+    def changes_since(self, version):
+        """
+        Returns (current version, deltas) where deltas are the (row_id, field,
+        value) changes after `version` up to the current version, or None when
+        the caller is on an older generation, or so far behind that its deltas
+        were compacted away, and has to take the full frame.
+        """
+        with self._lock:
+            current = self.version
+        generation, seq = version
+        if generation != current[0]:
+            return current, None
+        conn = _connect()
+        try:
+            conn.execute("BEGIN")
+            if seq < _meta(conn, 'compacted_seq'):
+                return current, None
+            rows = conn.execute(
+                "SELECT row_id, field, value FROM changes WHERE seq > ? AND seq <= ? ORDER BY seq",
+                (seq, current[1])
+            ).fetchall()
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return current, [(row_id, field, _from_db_value(field, json.loads(value))) for row_id, field, value in rows]
+
+_dataset = VersionedDataset()
+
+def import_csv(path=CSV_FILE):
+    """Loads a CSV in the contracts_db.csv schema into the store, replacing its contents."""
+    df = pd.read_csv(path, dtype={'Contract No': str})
+    for col in BOOL_COLUMNS:
+        if col not in df.columns:
+            df[col] = False
+        df[col] = df[col].astype(str).str.lower().isin(['true', '1'])
+    return _write_all(df)
+
+@metrics.timed('db.export_csv')
+def export_csv(path=CSV_FILE):
+    """
+    Writes the current store contents back out in the contracts_db.csv
+    schema. Concurrent exports are serialized, and readers of the CSV never
+    see a half-written file.
+    """
+    df = _load_frame()
+    with file_locks.locked(path):
+        file_locks.atomic_write(path, lambda tmp_path: df.to_csv(tmp_path, index=False))
+    return path
+
+_schema_ready = False
+
+def _claim_host():
+    # See HOST_FILE
+    file_locks.check_local_filesystem(DB_FILE)
+    host = socket.gethostname()
+    with file_locks.locked(HOST_FILE):
+        if os.path.exists(HOST_FILE):
+            with open(HOST_FILE, encoding='utf-8') as f:
+                owner = f.read().strip()
+            if owner and owner != host:
+                raise RuntimeError(
+                    f"{DB_FILE} belongs to host {owner}; the store supports one host only. "
+                    f"Delete {HOST_FILE} if the store was moved here."
+                )
+            if owner:
+                return
+        def write(tmp_path):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(host)
+        file_locks.atomic_write(HOST_FILE, write)
 
 def init_db():
-    if not os.path.exists(DB_FILE):
+    global _schema_ready
+    is_new = not os.path.exists(DB_FILE)
+    if not _schema_ready:
+        _claim_host()
+        # Idempotent; also upgrades stores created before the delta log existed
+        _create_schema()
+        _schema_ready = True
+        if not is_new and snapshot.read_version() is None:
+            # Stores created before snapshots existed
+            write_snapshot()
+
+    if is_new:
+        # Migrate an existing CSV database into the store
+        if os.path.exists(CSV_FILE):
+            df = import_csv(CSV_FILE)
+            print(f"Imported {len(df)} records from {CSV_FILE} into {DB_FILE}")
+            return
+
         try:
             print("Importing real data from Excel...")
             # Load real Excel data
@@ -37,7 +641,7 @@ def init_db():
             df['Checked'] = False
             
             # Clean up potential NaNs
-            df['Manager'] = df['Manager'].fillna('미배정')
+            df['Manager'] = df['Manager'].fillna(UNASSIGNED)
             df['Address'] = df['Address'].fillna('주소없음')
             df['Contact'] = df['Contact'].fillna('연락처없음')
             df['Stop Reason'] = df['Stop Reason'].fillna('정상')
@@ -45,11 +649,12 @@ def init_db():
             df['Stop Days'] = df['Stop Days'].fillna(0)
             df['Monthly Fee'] = pd.to_numeric(df['Monthly Fee'], errors='coerce').fillna(0)
             
-            df.to_csv(DB_FILE, index=False)
+            df = _write_all(df)
             print(f"Successfully imported {len(df)} records into {DB_FILE}")
             
-            # Trigger geocoding only during the first initialization
-            geocode_missing(df)
+            # Trigger geocoding only during the first initialization, off the request thread
+            submit_geocoding_job()
+            submit_route_plan_job()
             
         except Exception as e:
             print(f"Error importing Excel: {e}")
@@ -70,13 +675,10 @@ def init_db():
                 "Status": ["미확인"],
                 "Checked": [False]
             }
-            pd.DataFrame(data).to_csv(DB_FILE, index=False)
+            _write_all(pd.DataFrame(data))
 
-def apply_custom_mapping(raw_df, mapping):
-    """
-    Applies custom UI-mapped columns to the application dataframe schema,
-    saves the DB, and fires off a background thread for geocoding.
-    """
+def _map_columns(raw_df, mapping):
+    """Maps UI-selected source columns onto the application schema and fills defaults."""
     df = pd.DataFrame()
     df['Branch'] = raw_df[mapping['Branch']]
     df['Contract No'] = raw_df[mapping['Contract No']]
@@ -94,75 +696,767 @@ def apply_custom_mapping(raw_df, mapping):
     df['Longitude'] = None
     df['Status'] = '미확인'
     df['Checked'] = False
+    df['Removed'] = False
     
     # Clean up potential NaNs
-    df['Manager'] = df['Manager'].fillna('미배정')
+    df['Manager'] = df['Manager'].fillna(UNASSIGNED)
     df['Address'] = df['Address'].fillna('주소없음')
     df['Contact'] = df['Contact'].fillna('연락처없음')
     df['Stop Reason'] = df['Stop Reason'].fillna('정상')
     df['Stop Start Date'] = df['Stop Start Date'].fillna('-')
-    df['Stop Days'] = df['Stop Days'].fillna(0)
+    df['Stop Days'] = pd.to_numeric(df['Stop Days'], errors='coerce').fillna(0)
     df['Monthly Fee'] = pd.to_numeric(df['Monthly Fee'], errors='coerce').fillna(0)
     
-    df.to_csv(DB_FILE, index=False)
-    
-    if 'get_cached_data' in globals():
-        get_cached_data.clear()
-        
     return df
 
-import streamlit as st
+def apply_custom_mapping(raw_df, mapping):
+    """
+    Applies custom UI-mapped columns to the application dataframe schema
+    and saves the DB. Geocoding is queued separately (see submit_geocoding_job).
+    """
+    return _write_all(_map_columns(raw_df, mapping))
 
-@st.cache_data(ttl=3600)
-def get_cached_data():
-    # Only load data, no slow API calls here
-    df = pd.read_csv(DB_FILE)
-    return df
+def _create_staging():
+    """
+    A new table shaped like contracts for one import, named per process and
+    call so concurrent imports never share one. Drop it with _drop_staging.
+    """
+    name = f"import_staging_{os.getpid()}_{time.time_ns()}"
+    column_sql = ", ".join(f'"{col}" {sql_type}' for col, sql_type in COLUMNS.items())
+    with _transaction() as conn:
+        conn.execute(f"CREATE TABLE {name} (id INTEGER PRIMARY KEY, {column_sql})")
+    return name
+
+def _drop_staging(name):
+    with _transaction() as conn:
+        conn.execute(f"DROP TABLE IF EXISTS {name}")
+
+def _stage_chunks(staging, chunks, mapping, progress=None, total_rows=None):
+    """
+    Maps each raw chunk and inserts it into `staging` with ids in file order.
+    Every chunk is its own short transaction and the next chunk is parsed
+    outside it, so field writes are not held up by parsing a large file.
+    Returns the number of rows staged.
+    """
+    done = 0
+    for raw_chunk in chunks:
+        df = _map_columns(raw_chunk, mapping)
+        with _transaction() as conn:
+            _insert_frame(conn, df, done + 1, table=staging)
+        done += len(raw_chunk)
+        if progress:
+            progress(done, total_rows)
+    return done
+
+@metrics.timed('db.import')
+def import_mapped_chunks(chunks, mapping, progress=None, total_rows=None):
+    """
+    Streaming variant of apply_custom_mapping for large uploads.
+
+    Each raw chunk (see importer.iter_chunks) is mapped, cleaned and staged
+    on its own, so memory stays bounded by the chunk size. The contracts are
+    only replaced at the end, in one short transaction: readers keep the old
+    data until then, and a failure or cancellation (raised from `progress`)
+    leaves it untouched. Returns the number of imported rows.
+    """
+    column_sql = ", ".join(f'"{name}"' for name in COLUMNS)
+    staging = _create_staging()
+    try:
+        done = _stage_chunks(staging, chunks, mapping, progress, total_rows)
+        with _transaction() as conn:
+            conn.execute("DELETE FROM contracts")
+            conn.execute(f"INSERT INTO contracts (id, {column_sql}) SELECT id, {column_sql} FROM {staging}")
+            _bump_generation(conn)
+    finally:
+        _drop_staging(staging)
+    write_snapshot()
+    return done
+
+@metrics.timed('db.upsert')
+def upsert_mapped_chunks(chunks, mapping, progress=None, total_rows=None):
+    """
+    Incremental counterpart of import_mapped_chunks, keyed on Contract No.
+
+    New contracts are inserted, changed source fields are updated in place
+    (coordinates are cleared only when the address changed), and contracts
+    missing from the file are marked Removed. Status, Checked and coordinates
+    of untouched rows are kept. Writes go through the delta log, so their cost
+    follows the number of changed rows. Repeated contract numbers are matched
+    by order of appearance. A source Manager of UNASSIGNED keeps the manager
+    assigned in the app. Returns a summary dict of the counts.
+
+    The file is staged first (see _stage_chunks); the diff against the store
+    is done in SQL in one final transaction, the only one holding the write
+    lock for more than a chunk.
+    """
+    staging = _create_staging()
+    try:
+        _stage_chunks(staging, chunks, mapping, progress, total_rows)
+        with _transaction() as conn:
+            summary = _apply_staged_upsert(conn, staging)
+    finally:
+        _drop_staging(staging)
+    # Fold the import's deltas into the snapshot so cold loads do not replay them
+    write_snapshot()
+    return summary
+
+def _apply_staged_upsert(conn, staging):
+    """Diffs the staged file against contracts and writes the result; see upsert_mapped_chunks."""
+    summary = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'removed': 0, 'regeocode': 0}
+    # The nth staged row with a contract number pairs with the nth stored one
+    numbered = (
+        'SELECT id, "Contract No" AS contract_no, '
+        'ROW_NUMBER() OVER (PARTITION BY "Contract No" ORDER BY id) AS nth FROM {}'
+    )
+    conn.execute("DROP TABLE IF EXISTS temp.upsert_pairs")
+    conn.execute("CREATE TEMP TABLE upsert_pairs (row_id INTEGER PRIMARY KEY, staged_id INTEGER UNIQUE)")
+    conn.execute(
+        f"INSERT INTO upsert_pairs (row_id, staged_id) SELECT c.id, s.id "
+        f"FROM ({numbered.format('contracts')}) c "
+        f"JOIN ({numbered.format(staging)}) s ON s.contract_no = c.contract_no AND s.nth = c.nth"
+    )
+    paired = f"FROM upsert_pairs p JOIN contracts c ON c.id = p.row_id JOIN {staging} s ON s.id = p.staged_id"
+
+    updates = []
+    changed_rows = set()
+    for field in SOURCE_FIELDS:
+        if field == 'Contract No':
+            continue
+        keep = ''
+        if field == 'Manager':
+            # A source row without a manager must not undo an assignment made here (see assign_unassigned)
+            keep = f' AND NOT (s."Manager" = ? AND c."Manager" IS NOT ? AND c."Manager" IS NOT NULL)'
+        changed = conn.execute(
+            f'SELECT p.row_id, s."{field}" {paired} WHERE s."{field}" IS NOT c."{field}"{keep}',
+            (UNASSIGNED, UNASSIGNED) if keep else ()
+        ).fetchall()
+        updates += [(row_id, field, value) for row_id, value in changed]
+        changed_rows.update(row_id for row_id, _ in changed)
+        if field == 'Address':
+            updates += [(row_id, col, None) for row_id, _ in changed for col in ('Latitude', 'Longitude')]
+            summary['regeocode'] += len(changed)
+    revived = [row_id for (row_id,) in conn.execute(f"SELECT p.row_id {paired} WHERE c.Removed")]
+    updates += [(row_id, 'Removed', False) for row_id in revived]
+    changed_rows.update(revived)
+    matched = conn.execute("SELECT COUNT(*) FROM upsert_pairs").fetchone()[0]
+    summary['updated'] = len(changed_rows)
+    summary['unchanged'] = matched - len(changed_rows)
+
+    removed = [
+        (row_id, 'Removed', True)
+        for (row_id,) in conn.execute(
+            "SELECT id FROM contracts WHERE NOT COALESCE(Removed, 0) AND id NOT IN (SELECT row_id FROM upsert_pairs)"
+        )
+    ]
+    _write_rows(conn, updates + removed)
+    summary['removed'] = len(removed)
+
+    # Staged rows without a partner are new contracts, appended after the current ids in file order
+    column_sql = ", ".join(f'"{name}"' for name in COLUMNS)
+    next_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM contracts").fetchone()[0] + 1
+    inserted = conn.execute(
+        f"INSERT INTO contracts (id, {column_sql}) "
+        f"SELECT ? + ROW_NUMBER() OVER (ORDER BY id) - 1, {column_sql} FROM {staging} "
+        f"WHERE id NOT IN (SELECT staged_id FROM upsert_pairs)",
+        (next_id,)
+    ).rowcount
+    _log_inserted_rows(conn, next_id)
+    summary['inserted'] = inserted
+    summary['regeocode'] += inserted
+    conn.execute("DROP TABLE temp.upsert_pairs")
+    return summary
+
+@metrics.timed('db.write_snapshot')
+def write_snapshot():
+    """
+    Rewrites the columnar snapshot from the store so cold loads skip SQLite
+    and the delta log replay starts from now. Returns the (generation, seq)
+    the snapshot on disk now reflects, or None. Best effort: on failure
+    readers simply keep loading from SQLite.
+    """
+    try:
+        conn = _connect()
+        try:
+            conn.execute("BEGIN")
+            generation = _meta(conn, 'generation')
+            seq = _current_seq(conn)
+            df = _read_frame(conn)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        snapshot.write_snapshot(df, generation, seq)
+        # Another process may have written a newer one instead
+        return snapshot.read_version()
+    except Exception as e:
+        print(f"Snapshot write failed: {e}")
+        return None
+
+# Compact once this many deltas have piled up past the snapshot: cold loads replay all of them
+COMPACT_THRESHOLD = 5_000
+# Deltas kept after compaction so change feeds and offline sync can still diff against recent versions
+JOURNAL_KEEP = 1_000
+
+@metrics.timed('db.compact_journal')
+def compact_journal(keep=JOURNAL_KEEP):
+    """
+    Folds the delta log into a fresh snapshot and deletes the deltas it
+    covers, except the newest `keep`. Readers that were further behind
+    reload from the snapshot. Returns the number of deltas deleted.
+    """
+    version = write_snapshot()
+    if version is None:
+        return 0
+    with _transaction() as conn:
+        if _meta(conn, 'generation') != version[0]:
+            return 0
+        cutoff = min(version[1], _current_seq(conn) - keep)
+        if cutoff <= _meta(conn, 'compacted_seq'):
+            return 0
+        deleted = conn.execute("DELETE FROM changes WHERE seq <= ?", (cutoff,)).rowcount
+        # Writes below the cutoff can no longer be told apart from other devices' anyway
+        conn.execute("DELETE FROM bundle_syncs WHERE seq <= ?", (cutoff,))
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'compacted_seq'", (cutoff,))
+    print(f"Compacted {deleted} journal entries up to seq {cutoff}")
+    return deleted
+
+def _journal_backlog():
+    # Deltas a cold load would replay on top of the snapshot
+    version = snapshot.read_version()
+    conn = _connect()
+    try:
+        if version is None or version[0] != _meta(conn, 'generation'):
+            return 0
+        return _current_seq(conn) - version[1]
+    finally:
+        conn.close()
+
+def compact_if_needed(background=True):
+    """Compacts the journal once COMPACT_THRESHOLD deltas have accumulated; queued as a job by default."""
+    if _journal_backlog() < COMPACT_THRESHOLD:
+        return None
+    if not background:
+        return compact_journal()
+    import jobs
+    return jobs.submit('compact', lambda job: compact_journal(), label="변경 기록 정리", unique=True)
+
+def get_cached_data(columns=None):
+    # Only load data, no slow API calls here; writes are replayed from the delta log
+    return _dataset.sync(columns)
+
+def get_data_version():
+    """(generation, change seq) of the in-memory dataset, usable as a cache key."""
+    # Any column brings the version current; Status keeps a cold process from loading the others
+    _dataset.sync(['Status'])
+    return _dataset.version
+
+def get_changes_since(version):
+    """
+    Change feed for polling clients: pass the version from the previous call
+    (or get_data_version()) and get (new version, deltas) back.
+    """
+    _dataset.sync(['Status'])
+    return _dataset.changes_since(version)
+
+_spatial_indexes = {}
+_spatial_lock = threading.Lock()
 
-def geocode_missing(df=None):
+@metrics.timed('data.spatial_index')
+def get_spatial_index(manager=None):
+    """
+    SpatialIndex over one manager's contracts (or all of them), rebuilt only
+    when coordinates or assignments change.
+    """
+    df = get_cached_data(['Latitude', 'Longitude', 'Manager', 'Removed'])
+    version = _dataset.spatial_version
+    with _spatial_lock:
+        cached = _spatial_indexes.get(manager)
+    if cached and cached[0] == version:
+        metrics.incr('spatial_index.hit')
+        return cached[1]
+    
+    metrics.incr('spatial_index.miss')
+    subset = df[~df['Removed']]
+    if manager is not None:
+        subset = subset[subset['Manager'] == manager]
+    index = spatial_index.SpatialIndex(subset)
+    with _spatial_lock:
+        _spatial_indexes[manager] = (version, index)
+    return index
+
+@metrics.timed('geocode.missing')
+def geocode_missing(df=None, provider=None, checkpoint_every=50, progress=None):
+    """
+    Fills missing Latitude/Longitude through the geocoding pipeline.
+    Duplicate addresses are geocoded once, cached coordinates are reused, and
+    rows are committed every `checkpoint_every` addresses, so rerunning after
+    a crash only picks up what is still missing.
+    """
     if df is None:
         if not os.path.exists(DB_FILE):
             return
-        df = pd.read_csv(DB_FILE)
+        df = _load_frame()
         
     print("Checking for missing coordinates...")
-    missing_mask = df['Latitude'].isna() | df['Longitude'].isna()
+    missing_mask = (df['Latitude'].isna() | df['Longitude'].isna()) & ~df['Removed'].fillna(False).astype(bool)
     
     if missing_mask.any():
         print(f"Geocoding {missing_mask.sum()} missing coordinates...")
-        geolocator = Nominatim(user_agent="field_sales_app")
-        geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1.5)
-        
-        for idx, row in df[missing_mask].iterrows():
-            try:
-                location = geocode(row['Address'])
-                if location:
-                    df.at[idx, 'Latitude'] = location.latitude
-                    df.at[idx, 'Longitude'] = location.longitude
-            except Exception as e:
-                print(f"Geocoding failed for {row['Address']}: {e}")
-                
-        df.to_csv(DB_FILE, index=False)
-        get_cached_data.clear() # Clear cache so UI picks up new coordinates
-
-def get_data(query_filters=None):
-    df = get_cached_data()
-    if query_filters:
-        for key, value in query_filters.items():
+        # df is indexed by store row id (see _write_all/_load_frame)
+        row_ids_by_address = {}
+        for row_id, address in df.loc[missing_mask, 'Address'].items():
+            key = geocoding.normalize_address(address)
+            if key:
+                row_ids_by_address.setdefault(key, []).append(row_id)
+
+        def save_checkpoint(batch):
+            updates = []
+            for address, coords in batch.items():
+                if coords is None:
+                    continue
+                for row_id in row_ids_by_address.get(address, []):
+                    df.at[row_id, 'Latitude'] = coords[0]
+                    df.at[row_id, 'Longitude'] = coords[1]
+                    updates += [(row_id, 'Latitude', coords[0]), (row_id, 'Longitude', coords[1])]
+            if updates:
+                with _transaction() as conn:
+                    _write_rows(conn, updates)
+
+        geocoding.geocode_addresses(
+            row_ids_by_address.keys(),
+            provider=provider,
+            checkpoint_every=checkpoint_every,
+            on_checkpoint=save_checkpoint,
+            progress=progress
+        )
+        # Usually already on the job worker, so compact right here rather than queueing behind ourselves
+        compact_if_needed(background=False)
+
+@metrics.timed('data.kpi_summary')
+def get_kpi_summary():
+    """
+    Contract counts and Monthly Fee sums per Status/Branch/Manager, read from
+    the incrementally maintained aggregates rather than the full table.
+    """
+    rows = [key + entry for key, entry in _dataset.aggregates().items()]
+    return pd.DataFrame(rows, columns=list(AGGREGATE_DIMENSIONS) + ['Count', 'Fee'])
+
+@metrics.timed('data.search')
+def search_contracts(query, query_filters=None, include_removed=False, columns=None, limit=None):
+    """
+    Contracts whose company name or address matches `query`, best match
+    first, as a get_data() frame with a 'Score' column in (0, 1]. Spacing,
+    legal forms such as (주) and small typos are tolerated, and initial
+    consonants alone (ㅎㄱ for 한결) match too.
+    """
+    filters = dict(query_filters or {})
+    if not include_removed:
+        filters['Removed'] = False
+    indexed = {key: value for key, value in filters.items() if key in PARTITION_FIELDS}
+    # Other filters are applied on the frame, so the limit can only be taken afterwards
+    matches = _dataset.search(query, indexed, limit if len(indexed) == len(filters) else None)
+    df = get_data(query_filters, include_removed, columns)
+    scores = pd.Series(dict(matches), dtype=float)
+    found = df.loc[scores.index.intersection(df.index, sort=False)]
+    found = found.assign(Score=scores.loc[found.index])
+    return found if limit is None else found.head(limit)
+
+def get_partition_values(field, include_removed=False):
+    """Values of Manager/Branch/Status that currently have rows, without scanning the table."""
+    return sorted(_dataset.partition_values(field, include_removed))
+
+@metrics.timed('data.get_data')
+def get_data(query_filters=None, include_removed=False, columns=None):
+    """
+    Contracts as a read-only frame indexed by row id. `columns` limits both
+    what is loaded into memory and what is returned. Filters on
+    PARTITION_FIELDS are answered from the row-id partitions.
+    """
+    filters = dict(query_filters or {})
+    if not include_removed:
+        filters['Removed'] = False
+    indexed = {key: value for key, value in filters.items() if key in PARTITION_FIELDS}
+    
+    df = _dataset.query(indexed, None if columns is None else list(dict.fromkeys(list(columns) + list(filters))))
+    for key, value in filters.items():
+        if key not in indexed:
             df = df[df[key] == value]
+    if columns is not None:
+        df = df[list(columns)]
     return df
 
+@metrics.timed('db.update_rows')
+def update_rows(updates):
+    """
+    Applies (row_id, field, value) updates in one transaction.
+    Row ids are the index of the frames returned by get_data().
+    """
+    updates = list(updates)
+    if updates:
+        with _transaction() as conn:
+            _write_rows(conn, updates)
+        compact_if_needed()
+    return len(updates)
+
+@metrics.timed('db.batch_update')
+def batch_update(changes):
+    """
+    Applies many (contract_no, field, value) changes in a single transaction.
+    Every row sharing a contract number is updated, as with update_status.
+    Returns the number of row updates written.
+    """
+    changes = list(changes)
+    if not changes:
+        return 0
+    with _transaction() as conn:
+        row_ids = _row_ids_by_contract(conn, [contract_no for contract_no, _, _ in changes])
+        updates = [
+            (row_id, field, value)
+            for contract_no, field, value in changes
+            for row_id in row_ids.get(_contract_key(contract_no), [])
+        ]
+        _write_rows(conn, updates)
+    if updates:
+        compact_if_needed()
+    return len(updates)
+
+# Columns shipped to field devices for offline work
+BUNDLE_COLUMNS = ['Contract No', 'Company Name', 'Address', 'Contact', 'Latitude', 'Longitude', 'Status']
+# Tag of the offline route file format; see get_route_bundle
+BUNDLE_FORMAT = 'route-bundle/1'
+
+@metrics.timed('data.route_bundle')
+def get_route_bundle(manager, row_ids=None):
+    """
+    Compact, JSON-serializable copy of one manager's contracts for offline use.
+    `row_ids` (e.g. a planned route) sets the order and subset.
+
+    The same file is the upload format (see sync_route_bundle): the device,
+    normally the offline_recorder page, appends each status change to
+    'changes' as {'Contract No', 'Status', 'changed_at' (epoch seconds)} and
+    leaves the other keys as they are.
+    'version' is the base of the conflict check and 'bundle_id' tells this
+    file's own earlier syncs apart from other writers.
+    """
+    # Taken before the rows so a write in between shows up as a conflict rather than being missed
+    version = get_data_version()
+    df = get_data({'Manager': manager}, columns=BUNDLE_COLUMNS)
+    if row_ids is not None:
+        df = df.loc[[row_id for row_id in row_ids if row_id in df.index]]
+    rows = df.astype(object).where(df.notna(), None).values.tolist()
+    return {
+        'format': BUNDLE_FORMAT,
+        'bundle_id': uuid.uuid4().hex,
+        'manager': manager,
+        'version': list(version),
+        'columns': BUNDLE_COLUMNS,
+        'rows': rows,
+        'changes': [],
+    }
+
+def _bundle_changes(payload):
+    # Validated 'changes' of an uploaded route file; ValueError messages are shown to the user as they are
+    if not isinstance(payload, dict) or payload.get('format') != BUNDLE_FORMAT:
+        raise ValueError("오프라인 기록 파일이 아닙니다. 기록 페이지의 '업로드 파일 만들기'로 받은 파일을 올려 주세요.")
+    version = payload.get('version')
+    if not (isinstance(version, list) and len(version) == 2 and all(isinstance(v, int) for v in version)):
+        raise ValueError("기록 파일의 version 값이 올바르지 않습니다. 기록 페이지를 새로 다운로드해 주세요.")
+    if not isinstance(payload.get('bundle_id'), str) or not isinstance(payload.get('changes'), list):
+        raise ValueError("기록 파일에 bundle_id 또는 changes 목록이 없습니다.")
+    changes = []
+    for number, change in enumerate(payload['changes'], start=1):
+        valid = (
+            isinstance(change, dict)
+            and isinstance(change.get('Contract No'), (str, int))
+            and isinstance(change.get('Status'), str) and change['Status']
+            and isinstance(change.get('changed_at'), (int, float))
+        )
+        if not valid:
+            raise ValueError(f"changes의 {number}번째 항목에 Contract No, Status, changed_at이 모두 있어야 합니다.")
+        changes.append({'Contract No': change['Contract No'], 'Status': change['Status'], 'changed_at': change['changed_at']})
+    return changes
+
+def sync_route_bundle(payload):
+    """
+    Syncs an uploaded route file (see get_route_bundle) through
+    sync_status_changes. Raises ValueError, with a message for the user, when
+    the payload is not a route file.
+    """
+    changes = _bundle_changes(payload)
+    return sync_status_changes(changes, base_version=payload['version'], bundle_id=payload['bundle_id'])
+
+def _last_status_writes(conn, row_ids):
+    # seq of the newest Status delta per row
+    found = {}
+    # Stay under SQLite's bound-parameter limit
+    for i in range(0, len(row_ids), 500):
+        chunk = row_ids[i:i + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        found.update(conn.execute(
+            f"SELECT row_id, MAX(seq) FROM changes WHERE field = 'Status' AND row_id IN ({placeholders}) GROUP BY row_id",
+            chunk
+        ))
+    return found
+
+@metrics.timed('db.sync_status_changes')
+def sync_status_changes(changes, base_version=None, bundle_id=None):
+    """
+    Applies deferred status changes in one transaction.
+
+    `changes` are {'Contract No', 'Status', 'changed_at'} dicts, optionally
+    with the 'version' of the data the change was made against (defaults to
+    `base_version`, e.g. the bundle's). Per contract only the latest change
+    by changed_at counts. A contract whose status changed on the server after
+    that version, or that no longer exists, is a conflict: the server value is
+    kept and the change is returned in 'conflicts' with the server status.
+    A change without any version cannot be checked and is a conflict too.
+    Writes made by earlier syncs of the same `bundle_id` do not count as
+    server changes. 'version' is the store version after the sync, for
+    refreshing the bundle.
+    """
+    latest = {}
+    for change in sorted(changes, key=lambda c: c['changed_at']):
+        latest[_contract_key(change['Contract No'])] = change
+    if not latest:
+        return {'applied': 0, 'conflicts': [], 'version': list(get_data_version())}
+    
+    updates = []
+    conflicts = []
+    with _transaction() as conn:
+        row_ids = _row_ids_by_contract(conn, list(latest))
+        generation = _meta(conn, 'generation')
+        compacted_seq = _meta(conn, 'compacted_seq')
+        ids = [row_id for found in row_ids.values() for row_id in found]
+        server_status = {}
+        own_writes = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            for row_id, status, removed in conn.execute(
+                f'SELECT id, "Status", "Removed" FROM contracts WHERE id IN ({placeholders})', chunk
+            ):
+                server_status[row_id] = None if removed else status
+            if bundle_id:
+                own_writes.update(conn.execute(
+                    f"SELECT row_id, seq FROM bundle_syncs WHERE bundle_id = ? AND row_id IN ({placeholders})",
+                    [bundle_id] + chunk
+                ))
+        last_change = _last_status_writes(conn, ids)
+        
+        for key, change in latest.items():
+            change_generation, change_seq = change.get('version') or base_version or (None, 0)
+            found = [row_id for row_id in row_ids.get(key, []) if server_status.get(row_id) is not None]
+            base = {row_id: max(change_seq, own_writes.get(row_id, 0)) for row_id in found}
+            # A replaced table (new generation) invalidates every change made against the old one, and
+            # a change older than the compacted journal cannot be checked, so it is not trusted either
+            stale = change_generation != generation or any(
+                base[row_id] < compacted_seq or last_change.get(row_id, 0) > base[row_id] for row_id in found
+            )
+            if not found or stale:
+                conflicts.append(dict(change, server_status=server_status.get(found[0]) if found else None))
+            else:
+                # Already at that status (e.g. the same file uploaded again): nothing to write
+                updates.extend((row_id, 'Status', change['Status']) for row_id in found if server_status[row_id] != change['Status'])
+        _write_rows(conn, updates)
+        if bundle_id and updates:
+            written = _last_status_writes(conn, [row_id for row_id, _, _ in updates])
+            conn.executemany(
+                "INSERT OR REPLACE INTO bundle_syncs (bundle_id, row_id, seq) VALUES (?, ?, ?)",
+                ((bundle_id, row_id, seq) for row_id, seq in written.items())
+            )
+        seq = _current_seq(conn)
+    if updates:
+        compact_if_needed()
+    return {'applied': len(latest) - len(conflicts), 'conflicts': conflicts, 'version': [generation, seq]}
+
 def update_status(contract_no, new_status):
-    df = pd.read_csv(DB_FILE)
-    df.loc[df['Contract No'] == contract_no, 'Status'] = new_status
-    df.to_csv(DB_FILE, index=False)
-    get_cached_data.clear() # Clear cache on update
+    batch_update([(contract_no, 'Status', new_status)])
 
 def update_checked(contract_no, is_checked):
-    df = pd.read_csv(DB_FILE)
-    df.loc[df['Contract No'] == contract_no, 'Checked'] = is_checked
-    df.to_csv(DB_FILE, index=False)
-    get_cached_data.clear() # Clear cache on update
+    batch_update([(contract_no, 'Checked', bool(is_checked))])
+
+def submit_geocoding_job():
+    """
+    Queues geocode_missing on the background job worker (one at a time).
+    Retries resume from the last checkpoint, so they only redo unfinished addresses.
+    """
+    import jobs
+    return jobs.submit(
+        'geocode',
+        lambda job: geocode_missing(progress=job.report),
+        label="좌표 변환 (지오코딩)",
+        max_retries=3,
+        unique=True
+    )
+
+@metrics.timed('route_plans.build')
+def build_route_plans(managers=None, stops_per_day=None, workers=None, progress=None):
+    """
+    Precomputes daily visit plans for every manager (or `managers`) across
+    a process pool and stores them, replacing those managers' older plans.
+    Contracts without coordinates are left out. Returns the number of
+    managers planned. The UNASSIGNED pool is not a route and is never planned.
+    `stops_per_day` defaults to route_plans.STOPS_PER_DAY.
+    """
+    import route_plans
+
+    stops_per_day = stops_per_day or route_plans.STOPS_PER_DAY
+    df = get_data(columns=['Manager', 'Latitude', 'Longitude'])
+    generation, seq = _dataset.spatial_version
+    located = df.dropna(subset=['Latitude', 'Longitude'])
+    located = located[located['Manager'] != UNASSIGNED]
+    if managers is not None:
+        located = located[located['Manager'].isin(managers)]
+    tasks = [
+        (manager, group.index.to_numpy(), group['Latitude'].to_numpy(), group['Longitude'].to_numpy(), stops_per_day)
+        for manager, group in located.groupby('Manager', observed=True)
+    ]
+    planned = list(route_plans.plan_all(tasks, workers=workers, progress=progress))
+    
+    now = time.time()
+    with _transaction() as conn:
+        current_generation = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+        if current_generation != generation:
+            # Replaced by an import while planning; the follow-up plan job covers the new data
+            print("Discarding route plans built for replaced data")
+            return 0
+        if managers is None:
+            conn.execute("DELETE FROM route_plans")
+            conn.execute("DELETE FROM route_plan_info")
+        else:
+            conn.executemany("DELETE FROM route_plans WHERE manager = ?", [(m,) for m in managers])
+            conn.executemany("DELETE FROM route_plan_info WHERE manager = ?", [(m,) for m in managers])
+        conn.executemany(
+            "INSERT INTO route_plans VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((manager,) + row for manager, rows in planned for row in rows)
+        )
+        conn.executemany(
+            "INSERT INTO route_plan_info VALUES (?, ?, ?, ?, ?)",
+            ((manager, generation, seq, stops_per_day, now) for manager, _ in planned)
+        )
+    return len(planned)
+
+def get_route_plan(manager):
+    """
+    (plan, info) for one manager, or None when there is no plan for the
+    current data. `plan` has day, position, row_id, leg_km, start_lat and
+    start_lng in visiting order; info['stale'] is True when coordinates or
+    assignments changed after the plan was built.
+    """
+    _dataset.sync(['Manager', 'Latitude', 'Longitude'])
+    current_generation, current_seq = _dataset.spatial_version
+    conn = _connect()
+    try:
+        info = conn.execute(
+            "SELECT generation, seq, stops_per_day, created_at FROM route_plan_info WHERE manager = ?", (manager,)
+        ).fetchone()
+        if info is None or info[0] != current_generation:
+            return None
+        plan = pd.read_sql_query(
+            "SELECT day, position, row_id, leg_km, start_lat, start_lng FROM route_plans "
+            "WHERE manager = ? ORDER BY day, position",
+            conn, params=(manager,)
+        )
+    finally:
+        conn.close()
+    return plan, {'stale': info[1] != current_seq, 'stops_per_day': info[2], 'created_at': info[3]}
+
+def submit_route_plan_job():
+    """
+    Queues build_route_plans. Jobs run one at a time in submission order, so
+    submitted after an import/geocoding job it plans the new coordinates.
+    """
+    def run(job):
+        planned = build_route_plans(progress=job.report)
+        job.message = f"{planned}명 계획 완료"
+        return planned
+
+    import jobs
+    return jobs.submit('route_plans', run, label="일일 방문 계획 계산", unique=True)
+
+def manager_bounds(margin=0.005):
+    """{manager: (south, west, north, east)} around each manager's geocoded contracts, padded by `margin` degrees."""
+    located = get_data(columns=['Manager', 'Latitude', 'Longitude']).dropna(subset=['Latitude', 'Longitude'])
+    grouped = located.groupby('Manager', observed=True)
+    lats, lngs = grouped['Latitude'], grouped['Longitude']
+    bounds = pd.DataFrame({
+        'south': lats.min() - margin, 'west': lngs.min() - margin,
+        'north': lats.max() + margin, 'east': lngs.max() + margin,
+    })
+    return {manager: tuple(row) for manager, row in zip(bounds.index, bounds.itertuples(index=False, name=None))}
+
+def submit_tile_seed_job(zooms=None):
+    """
+    Queues downloading the map tiles around every manager's customers into
+    the tile proxy cache; `zooms` defaults to tile_proxy.SEED_ZOOMS.
+    """
+    import jobs
+    import tile_proxy
+
+    def run(job):
+        # Unassigned contracts are on nobody's route
+        bounds = [box for manager, box in manager_bounds().items() if manager != UNASSIGNED]
+        fetched = tile_proxy.seed(bounds, zooms=zooms or tile_proxy.SEED_ZOOMS, progress=job.report)
+        job.message = f"타일 {fetched:,}개 저장"
+        return fetched
+
+    return jobs.submit('tile_seed', run, label="지도 타일 미리 받기", unique=True)
+
+@metrics.timed('territories.assign')
+def assign_unassigned(branch, managers, fee_weight=0.5, apply=True):
+    """
+    Splits the branch's geocoded unassigned contracts among `managers` into
+    compact territories balanced by contract count and Monthly Fee
+    (fee_weight 0 = count only, 1 = fee only). Managers with a smaller
+    portfolio in the branch receive more, and those who already have
+    customers there start from their own area. Written in one transaction
+    when `apply`. Returns (summary indexed by manager, number of unassigned
+    contracts left out for lack of coordinates).
+    """
+    import territories
+
+    managers = list(dict.fromkeys(m for m in managers if m and m != UNASSIGNED))
+    if not managers:
+        raise ValueError("배정할 담당자를 한 명 이상 지정하세요.")
+    df = get_data({'Branch': branch}, columns=['Manager', 'Latitude', 'Longitude', 'Monthly Fee'])
+    unassigned = df[df['Manager'] == UNASSIGNED]
+    pool = unassigned.dropna(subset=['Latitude', 'Longitude'])
+    current = df[df['Manager'].isin(managers)]
+
+    # Pool and current portfolios share one load scale, so existing work counts against each target
+    loads = territories.workloads(pd.concat([pool['Monthly Fee'], current['Monthly Fee']]), fee_weight)
+    pool_loads = loads[:len(pool)]
+    current_loads = pd.Series(loads[len(pool):], index=current.index).groupby(
+        current['Manager'].astype(str)
+    ).sum().reindex(managers, fill_value=0.0)
+    targets = (1.0 / len(managers) - current_loads).clip(lower=0).to_numpy()
+    if targets.sum() <= 0:
+        targets = np.ones(len(managers))
+    located = current.dropna(subset=['Latitude', 'Longitude'])
+    centers = located.groupby(located['Manager'].astype(str))[['Latitude', 'Longitude']].mean().reindex(managers)
+
+    lats, lngs = pool['Latitude'].to_numpy(), pool['Longitude'].to_numpy()
+    labels, _ = territories.balanced_kmeans(lats, lngs, pool_loads, targets, centers=centers.to_numpy())
+    assigned = pd.Series(np.asarray(managers, dtype=object)[labels], index=pool.index)
+    if apply and len(assigned):
+        update_rows((row_id, 'Manager', manager) for row_id, manager in assigned.items())
+        # Plans are per manager; everyone who received contracts needs a new one
+        submit_route_plan_job()
+
+    fees = pool['Monthly Fee'].fillna(0)
+    current_managers = current['Manager'].astype(str)
+    summary = pd.DataFrame({
+        'Assigned': assigned.value_counts(),
+        'Assigned Fee': fees.groupby(assigned).sum(),
+        'Contracts': current_managers.value_counts(),
+        'Monthly Fee': current['Monthly Fee'].fillna(0).groupby(current_managers).sum(),
+    }).reindex(managers).fillna(0)
+    summary['Contracts'] += summary['Assigned']
+    summary['Monthly Fee'] += summary['Assigned Fee']
+    summary[['Assigned', 'Contracts']] = summary[['Assigned', 'Contracts']].astype(int)
+    summary['Spread km'] = territories.spread_km(lats, lngs, labels, len(managers)) if len(pool) else np.nan
+    summary.index.name = 'Manager'
+    return summary, len(unassigned) - len(pool)
 
 def manual_geocode():
     # Helper if we need to call it from UI
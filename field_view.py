@@ -1,34 +1,463 @@
 import streamlit as st
 import pandas as pd
-import folium
-from folium import plugins
-from streamlit_folium import st_folium
-from scipy.spatial.distance import cdist
+import json
+import time
+import html
+import hashlib
 import data_manager
+import offline_recorder
+import routing
+import metrics
+import map_cache
+import tile_proxy
 
-def optimize_route(current_lat, current_lng, target_df):
+# Columns this view reads; the rest (Branch, Checked, ...) is never loaded for field-only processes
+FIELD_COLUMNS = [
+    'Contract No', 'Company Name', 'Monthly Fee', 'Manager', 'Contact', 'Address',
+    'Stop Reason', 'Stop Start Date', 'Stop Days', 'Latitude', 'Longitude', 'Status'
+]
+
+# Above this many customer markers the map switches to a single client-side cluster layer
+CLUSTER_THRESHOLD = 200
+
+STATUS_COLORS = {'미확인': 'red', '진행중': 'orange', '완료': 'blue'}
+
+# Rendered maps kept for reuse, limited by count and by total HTML size
+MAP_CACHE_ENTRIES = 64
+MAP_CACHE_BYTES = 128 * 1024 * 1024
+
+# Row fields the map draws (position, marker, popup, route number); the cached HTML is reused while they are unchanged
+MAP_FIELDS = ['Latitude', 'Longitude', 'Company Name', 'Status', 'Route_Order', 'Distance', 'Stop Reason', 'Stop Start Date', 'Stop Days']
+
+# Column order of each row in the cluster layer's data array (lat/lng first, as FastMarkerCluster expects)
+CLUSTER_FIELDS = ['Latitude', 'Longitude', 'Company Name', 'Status', 'Stop Reason', 'Stop Start Date', 'Stop Days']
+
+# Builds each marker and its popup in the browser; popups are only rendered when opened
+CLUSTER_MARKER_CALLBACK = """
+function (row) {
+    var colors = {'미확인': 'red', '진행중': 'orange', '완료': 'blue'};
+    var color = colors[row[3]] || 'blue';
+    var esc = function (v) {
+        return String(v).replace(/[&<>"']/g, function (c) {
+            return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+        });
+    };
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {
+        icon: L.AwesomeMarkers.icon({icon: 'info-sign', markerColor: color, prefix: 'glyphicon'})
+    });
+    marker.bindTooltip(esc(row[2]));
+    marker.bindPopup(function () {
+        return '<div style="font-family: Arial, sans-serif; font-size: 13px; padding: 4px; width: 220px;">'
+            + '<h4 style="margin-top: 0; margin-bottom: 8px; color: #2C3E50; font-size: 15px;">🏢 ' + esc(row[2]) + '</h4>'
+            + '<div style="margin-bottom: 4px;"><b>상태:</b> <span style="color:' + color + '; font-weight:bold;">' + esc(row[3]) + '</span></div>'
+            + '<div style="margin-bottom: 4px;"><b>정지사유:</b> ' + esc(row[4]) + '</div>'
+            + '<div style="margin-bottom: 4px;"><b>정지일자:</b> ' + esc(row[5]) + '</div>'
+            + '<div style="margin-bottom: 4px;"><b>당월정지:</b> <span style="color:#E74C3C;">' + esc(row[6]) + '일</span></div>'
+            + '</div>';
+    }, {maxWidth: 300});
+    return marker;
+}
+"""
+
+def build_cluster_layer(points_df):
+    """
+    One FastMarkerCluster layer for all of points_df, built from column arrays
+    instead of a per-row Python loop. The payload is one small array per customer.
+    """
+    from folium import plugins
+
+    data = points_df[CLUSTER_FIELDS].astype({'Stop Days': 'object'}).fillna('-').values.tolist()
+    return plugins.FastMarkerCluster(data=data, callback=CLUSTER_MARKER_CALLBACK, name='고객사 (클러스터)')
+
+def add_customer_marker(m, row):
+    import folium
+    from folium import plugins
+
+    color = STATUS_COLORS.get(row['Status'], 'blue')
+    # Field values come from the imported file; escaped like the cluster layer's callback does
+    text = {field: html.escape(str(row[field])) for field in ('Company Name', 'Status', 'Stop Reason', 'Stop Start Date', 'Stop Days')}
+        
+    order_text = f"[{int(row['Route_Order'])}] " if pd.notna(row['Route_Order']) else ""
+    distance_km = f"{row['Distance']:.1f}km" if pd.notna(row['Route_Order']) else ""
+    dist_html = f"<div style='margin-bottom: 4px;'><b>구간거리:</b> <span style='color:#27AE60; font-weight:bold;'>{distance_km}</span></div>" if distance_km else ""
+        
+    popup_html = f"""
+    <div style="font-family: Arial, sans-serif; font-size: 13px; border: 1px solid #ddd; background-color: white; padding: 12px; border-radius: 8px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); width: 220px;">
+        <h4 style="margin-top: 0; margin-bottom: 8px; color: #2C3E50; font-size: 15px;">🏢 {order_text}{text['Company Name']}</h4>
+        <div style="border-bottom: 1px solid #eee; margin-bottom: 8px;"></div>
+        <div style="margin-bottom: 4px;"><b>상태:</b> <span style="color:{color}; font-weight:bold;">{text['Status']}</span></div>
+        {dist_html}
+        <div style="margin-bottom: 4px;"><b>정지사유:</b> {text['Stop Reason']}</div>
+        <div style="margin-bottom: 4px;"><b>정지일자:</b> {text['Stop Start Date']}</div>
+        <div style="margin-bottom: 4px;"><b>당월정지:</b> <span style="color:#E74C3C;">{text['Stop Days']}일</span></div>
+    </div>
+    """
+    
+    # Formatted Icons: Add numbers for top 15
+    if pd.notna(row['Route_Order']):
+        icon = plugins.BeautifyIcon(
+            border_color=color,
+            text_color=color,
+            number=int(row['Route_Order']),
+            inner_icon_style='margin-top:0; font-weight:bold;'
+        )
+    else:
+        icon = folium.Icon(color=color, icon='info-sign')
+    
+    folium.Marker(
+        location=[row['Latitude'], row['Longitude']],
+        popup=folium.Popup(popup_html, max_width=300),
+        tooltip=f"{order_text}{text['Company Name']} {distance_km}",
+        icon=icon
+    ).add_to(m)
+
+@metrics.timed('route.optimize')
+def optimize_route(current_lat, current_lng, target_df, max_stops=None, time_windows=None):
+    """
+    Orders target_df along a planned route from the current position.
+    Distance is the road-approximate km from the previous stop, Route_Km the
+    cumulative km from the start. Stops left out of the plan go last with inf.
+    """
     if len(target_df) == 0:
         return target_df
-    current_pos = [[current_lat, current_lng]]
-    targets = target_df[['Latitude', 'Longitude']].values
+    plan = routing.plan_route(
+        (current_lat, current_lng),
+        target_df['Latitude'].values,
+        target_df['Longitude'].values,
+        max_stops=max_stops,
+        time_windows=time_windows
+    )
+    
+    routed_df = target_df.iloc[plan.order].copy()
+    routed_df['Distance'] = plan.leg_km
+    routed_df['Route_Km'] = plan.leg_km.cumsum()
+    unrouted_df = target_df.iloc[plan.unrouted].copy()
+    unrouted_df['Distance'] = float('inf')
+    unrouted_df['Route_Km'] = float('inf')
+    
+    return pd.concat([routed_df, unrouted_df])
+
+def parse_position(text):
+    """'37.5665, 126.9780' -> (lat, lng), or None when empty or not a coordinate pair."""
+    try:
+        lat, lng = (float(part) for part in text.replace(' ', '').split(','))
+    except ValueError:
+        return None
+    if -90 <= lat <= 90 and -180 <= lng <= 180:
+        return lat, lng
+    return None
+
+def planned_visit_list(start_lat, start_lng, day_df):
+    # Keeps the precomputed order; legs are recomputed because filters may have dropped stops
+    planned = day_df.copy()
+    planned['Distance'] = routing.path_legs_km((start_lat, start_lng), planned['Latitude'], planned['Longitude'])
+    planned['Route_Km'] = planned['Distance'].cumsum()
+    return planned
+
+def assign_route_order(optimized_df, count=15):
+    # Numbers the first `count` routed stops; they get the route guide and individual markers
+    optimized_df['Route_Order'] = None
+    valid_idx = optimized_df[optimized_df['Distance'] != float('inf')].index
+    for i, idx in enumerate(valid_idx[:count]):
+        optimized_df.at[idx, 'Route_Order'] = i + 1
+    return optimized_df
+
+@metrics.timed('map.build')
+def build_field_map(optimized_df, current_lat, current_lng):
+    """Folium map for the visit list: base layers, start marker, route guide and customer markers."""
+    # Imported on first draw: folium costs ~0.4s, and a cached map never needs it
+    import folium
+    from folium import plugins
+
+    # Folium Map with Base Layers
+    m = folium.Map(location=[current_lat, current_lng], zoom_start=14, tiles=None)
+    
+    # Tiles go through the caching proxy when one is configured (see tile_proxy.py)
+    # 0. Self-hosted or licensed tile server, when configured (the only pre-seeded layer)
+    if 'source' in tile_proxy.LAYERS:
+        folium.TileLayer(
+            tiles=tile_proxy.tile_url('source'), attr=tile_proxy.LAYERS['source']['attr'], name='기본 지도 (자체 타일 서버)'
+        ).add_to(m)
+    
+    # 1. Default OpenStreetMap (Regular Roads)
+    folium.TileLayer(
+        tiles=tile_proxy.tile_url('osm'), attr=tile_proxy.LAYERS['osm']['attr'], name='기본 도로망 (OpenStreetMap)'
+    ).add_to(m)
+    
+    # 2. Vworld/CartoDB (Clean layout)
+    folium.TileLayer(
+        tiles=tile_proxy.tile_url('carto'), attr=tile_proxy.LAYERS['carto']['attr'], name='깔끔한 약도 (CartoDB)'
+    ).add_to(m)
+    
+    # 3. Google Satellite Hybrid (Detailed buildings & roads)
+    folium.TileLayer(
+        tiles=tile_proxy.tile_url('google'),
+        attr=tile_proxy.LAYERS['google']['attr'],
+        name='위성 및 상세 도로망 (Google Hybrid)'
+    ).add_to(m)
+    
+    # Add Layer Control to toggle the map styles
+    folium.LayerControl(position='topright').add_to(m)
+    
+    # Add Locate Control (내 위치 이동 버튼)
+    plugins.LocateControl(
+        position="topright",
+        strings={"title": "내 실시간 위치 찾기", "popup": "현재 위치"},
+    ).add_to(m)
+    
+    # Add Current Location Marker
+    folium.Marker(
+        location=[current_lat, current_lng],
+        popup="<div style='width: 150px;'><b>📍 기준 위치(출발점)</b></div>",
+        icon=folium.Icon(color='black', icon='user')
+    ).add_to(m)
+    
+    # Guide Option: Draw animated line through the numbered route stops
+    valid_targets = optimized_df.dropna(subset=['Latitude', 'Longitude'])
+    numbered = valid_targets[valid_targets['Route_Order'].notna()]
+    if not numbered.empty:
+        route_coords = [[current_lat, current_lng]] + numbered[['Latitude', 'Longitude']].values.tolist()
+        plugins.AntPath(
+            locations=route_coords,
+            dash_array=[10, 20],
+            delay=1000,
+            color='red',
+            pulse_color='white',
+            weight=3,
+            tooltip=f'최적 방문 경로 가이드 ({len(numbered)}곳)'
+        ).add_to(m)
+    
+    # Add Customer Markers
+    with metrics.timer('map.markers'):
+        marker_df = valid_targets
+        if len(marker_df) > CLUSTER_THRESHOLD:
+            # Large portfolios: only the numbered route stops are Python-built markers, the rest is one cluster layer
+            clustered = marker_df[marker_df['Route_Order'].isna()]
+            build_cluster_layer(clustered).add_to(m)
+            metrics.incr('map.clustered_points', len(clustered))
+            marker_df = marker_df[marker_df['Route_Order'].notna()]
+        for _, row in marker_df.iterrows():
+            add_customer_marker(m, row)
+        metrics.incr('map.markers', len(marker_df))
+    return m
+
+_map_html = map_cache.LRUCache(MAP_CACHE_ENTRIES, MAP_CACHE_BYTES, name='map_cache')
+
+def _map_signature(optimized_df, current_lat, current_lng):
+    # Digest of everything the map draws: equal signatures render identical maps
+    drawn = optimized_df.loc[optimized_df['Latitude'].notna() & optimized_df['Longitude'].notna(), MAP_FIELDS]
+    digest = hashlib.sha1(pd.util.hash_pandas_object(drawn, index=True).to_numpy().tobytes()).hexdigest()
+    return (float(current_lat), float(current_lng), len(drawn), digest)
+
+@metrics.timed('map.html')
+def field_map_html(key, optimized_df, current_lat, current_lng):
+    """
+    Rendered HTML of the field map for `key` (manager and filters). It is
+    built and rendered again only when a row the map draws has changed, so
+    tab switches, list edits and status changes of other contracts reuse it.
+    """
+    signature = _map_signature(optimized_df, current_lat, current_lng)
+    cached = _map_html.get(key)
+    if cached is not None:
+        if cached[0] == signature:
+            return cached[1]
+        metrics.incr('map_cache.redraw')
+    map_html = build_field_map(optimized_df, current_lat, current_lng).get_root().render()
+    _map_html.put(key, (signature, map_html), cost=len(map_html))
+    return map_html
+
+LIST_COLUMNS = {
+    'Route_Order': '방문순서',
+    'Company Name': '상호',
+    'Status': '상태',
+    'Contact': '연락처',
+    'Address': '주소',
+    'Monthly Fee': '월정료',
+    'Stop Reason': '정지사유',
+    'Stop Start Date': '정지시작일자',
+    'Stop Days': '당월말 정지일수',
+    'Route_Km': '경로거리(km)',
+}
+
+def _queue_pending(changes):
+    # Batch mode: keep (contract_no, status) clicks in the session, stamped with the time and the data version they were made against
+    queue = st.session_state.setdefault('pending_statuses', [])
+    version = st.session_state.get('seen_version')
+    now = time.time()
+    queue.extend(
+        {'Contract No': contract_no, 'Status': status, 'changed_at': now, 'version': version}
+        for contract_no, status in changes
+    )
+
+def _apply_pending(df):
+    # Show queued (not yet synced) statuses as if they were already saved
+    queue = st.session_state.get('pending_statuses')
+    if not queue:
+        return df
+    latest = {change['Contract No']: change['Status'] for change in sorted(queue, key=lambda c: c['changed_at'])}
+    queued = df['Contract No'].map(latest)
+    df['Status'] = queued.where(queued.notna(), df['Status'].astype(object))
+    return df
+
+def _sync_pending():
+    result = data_manager.sync_status_changes(st.session_state.get('pending_statuses', []))
+    st.session_state['pending_statuses'] = []
+    st.session_state['sync_result'] = result
+    st.session_state['sync_error'] = None
+
+def _sync_uploaded_bundle():
+    uploaded = st.session_state.get('route_upload')
+    if uploaded is None:
+        return
+    st.session_state['sync_result'] = None
+    st.session_state['sync_error'] = None
+    try:
+        payload = json.loads(uploaded.getvalue())
+    except ValueError:
+        st.session_state['sync_error'] = "JSON 파일을 읽을 수 없습니다. 기록 페이지에서 만든 파일을 올려 주세요."
+        return
+    try:
+        st.session_state['sync_result'] = data_manager.sync_route_bundle(payload)
+    except ValueError as e:
+        st.session_state['sync_error'] = str(e)
+
+def render_sync_panel(selected_manager, optimized_df):
+    """
+    Batch mode: status edits are queued in the session instead of written
+    per click, then sent in one sync with a per-contract conflict check.
+    The queue lives in the server-side session, so batch mode still needs a
+    connection. Work without signal goes through the offline recorder page
+    (offline_recorder.py): it is downloaded here, keeps taps on the phone,
+    and the file it exports comes back through the upload below.
+    """
+    queue = st.session_state.get('pending_statuses', [])
+    with st.expander(f"🔄 모아서 저장 · 오프라인 기록 (대기 중 {len(queue)}건)", expanded=bool(queue)):
+        st.toggle("상태 변경을 모아서 한 번에 동기화 (연결 필요)", key="batch_mode")
+        st.button(
+            f"대기 중인 {len(queue)}건 동기화", type="primary", disabled=not queue,
+            on_click=_sync_pending, width='stretch'
+        )
+        
+        route_ids = optimized_df.index.tolist()
+        st.download_button(
+            "오프라인 기록 페이지 다운로드",
+            # Deferred: the bundle is only built when it is actually downloaded
+            data=lambda: offline_recorder.build_recorder_page(
+                data_manager.get_route_bundle(selected_manager, route_ids), STATUS_COLORS
+            ),
+            file_name=f"route_{selected_manager}.html",
+            mime="text/html",
+            width='stretch'
+        )
+        st.file_uploader(
+            "오프라인 기록 파일 업로드", type=['json'],
+            key="route_upload", on_change=_sync_uploaded_bundle
+        )
+        st.caption(
+            "신호가 없는 곳에서는 기록 페이지를 휴대폰에 저장해 두고 열어 상태를 누르세요. "
+            "기록은 휴대폰에 남아 있으며, 연결되면 '업로드 파일 만들기'로 받은 파일을 위에 올리면 됩니다. "
+            "같은 파일을 다시 올려도 이미 반영된 변경은 충돌로 표시되지 않습니다."
+        )
+        
+        if st.session_state.get('sync_error'):
+            st.error(st.session_state['sync_error'])
+        result = st.session_state.get('sync_result')
+        if result:
+            st.success(f"{result['applied']}건 반영 완료")
+            if result['conflicts']:
+                st.warning(f"{len(result['conflicts'])}건은 서버에서 먼저 변경되어 반영하지 않았습니다.")
+                st.dataframe(
+                    pd.DataFrame(result['conflicts'])[['Contract No', 'Status', 'server_status']].rename(
+                        columns={'Contract No': '계약번호', 'Status': '내 변경', 'server_status': '서버 상태'}
+                    ),
+                    hide_index=True, width='stretch'
+                )
+
+def _save_list_edits(editor_key, page_contract_nos):
+    # Runs before the next script run: collect every edited status on the page and write them in one batch,
+    # keyed by Contract No like the other status controls
+    edits = st.session_state.get(editor_key, {}).get('edited_rows', {})
+    edited = [(int(pos), change['상태']) for pos, change in edits.items() if change.get('상태')]
+    if st.session_state.get('batch_mode'):
+        _queue_pending((page_contract_nos[pos], status) for pos, status in edited)
+    else:
+        data_manager.batch_update((page_contract_nos[pos], 'Status', status) for pos, status in edited)
+    del st.session_state[editor_key]
+
+def build_list_page(optimized_df, page, page_size):
+    """(rows on the page, the same rows with the display columns) for a 1-based page number."""
+    page_df = optimized_df.iloc[(page - 1) * page_size:page * page_size]
+    return page_df, page_df[list(LIST_COLUMNS)].rename(columns=LIST_COLUMNS)
+
+@metrics.timed('list.build')
+def render_list_page(optimized_df):
+    """
+    One page of the visit list as an editable grid, so the widget count per
+    rerun depends on the page size rather than on the whole portfolio.
+    """
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox("페이지당 건수", options=[20, 50, 100], key="list_page_size")
+    page_count = max(1, -(-len(optimized_df) // page_size))
+    with col2:
+        page = st.number_input(f"페이지 (총 {page_count})", min_value=1, max_value=page_count, value=1, key="list_page")
     
-    distances = cdist(current_pos, targets, 'euclidean')
-    target_df = target_df.copy()
-    target_df['Distance'] = distances[0]
+    page_df, display_df = build_list_page(optimized_df, page, page_size)
     
-    return target_df.sort_values(by='Distance')
+    editor_key = f"list_editor_{page}_{page_size}"
+    st.data_editor(
+        display_df,
+        key=editor_key,
+        hide_index=True,
+        width='stretch',
+        disabled=[name for name in LIST_COLUMNS.values() if name != '상태'],
+        column_config={
+            '상태': st.column_config.SelectboxColumn('상태', options=list(STATUS_COLORS), required=True),
+            '월정료': st.column_config.NumberColumn('월정료', format="%d원"),
+            '경로거리(km)': st.column_config.NumberColumn('경로거리(km)', format="%.2f"),
+        }
+    )
+    st.button(
+        "변경사항 저장", type="primary", width='stretch',
+        on_click=_save_list_edits, args=(editor_key, page_df['Contract No'].tolist())
+    )
+
+def render_bulk_status_action(optimized_df):
+    # Multi-select actions go through data_manager.batch_update: one transaction for the whole selection
+    with st.expander("📦 일괄 상태 변경 (같은 건물 / 여러 고객사)", expanded=False):
+        address_counts = optimized_df['Address'].value_counts()
+        addresses = st.multiselect(
+            "주소로 선택 (해당 주소의 모든 고객사)",
+            options=address_counts.index.tolist(),
+            format_func=lambda address: f"{address} ({address_counts[address]}건)",
+            key="bulk_addresses"
+        )
+        labels = dict(zip(optimized_df.index.tolist(), optimized_df['Company Name'] + ' · ' + optimized_df['Contract No']))
+        picked = st.multiselect("개별 고객사 선택", options=list(labels), format_func=labels.get, key="bulk_rows")
+        
+        selected = optimized_df[optimized_df['Address'].isin(addresses) | optimized_df.index.isin(picked)]
+        new_status = st.selectbox("변경할 상태", options=list(STATUS_COLORS), key="bulk_status")
+        if st.button(f"선택한 {len(selected)}건 상태 변경", disabled=selected.empty, width='stretch'):
+            contract_nos = selected['Contract No'].unique()
+            if st.session_state.get('batch_mode'):
+                _queue_pending((contract_no, new_status) for contract_no in contract_nos)
+            else:
+                data_manager.batch_update((contract_no, 'Status', new_status) for contract_no in contract_nos)
+            st.rerun()
 
 def render_field_sales_view():
     st.title("🏃‍♂️ 현장사원 앱")
     
-    df = data_manager.get_data()
-    managers = df['Manager'].unique().tolist()
+    managers = data_manager.get_partition_values('Manager')
     
     # Manager Selection (Mock Login)
     selected_manager = st.selectbox("사원 선택 (로그인 시뮬레이션)", managers)
     
-    # Filter Data
-    my_df = df[df['Manager'] == selected_manager].copy()
+    # Version of the data this run shows; batched edits are checked against it when synced
+    st.session_state['seen_version'] = list(data_manager.get_data_version())
+    
+    # Filter Data (served from the per-manager partition, not a full-table scan)
+    my_df = _apply_pending(data_manager.get_data({'Manager': selected_manager}, columns=FIELD_COLUMNS).copy())
     
     if len(my_df) == 0:
         st.info("할당된 고객사가 없습니다.")
@@ -38,17 +467,31 @@ def render_field_sales_view():
     with st.expander("🔍 검색 및 필터 옵션 (전문가 옵션)", expanded=False):
         col1, col2 = st.columns(2)
         with col1:
-            search_query = st.text_input("상호명 검색", placeholder="예: 스타벅스")
+            search_query = st.text_input("상호명·주소 검색", placeholder="예: 스타벅스, ㅅㅌㅂㅅ, 역삼동")
         with col2:
             status_filter = st.multiselect(
                 "방문 상태 필터", 
                 options=['미확인', '진행중', '완료'],
                 default=['미확인', '진행중', '완료']
             )
+        col3, col4 = st.columns(2)
+        with col3:
+            radius_option = st.selectbox("출발점 주변 반경", options=['전체', '1km', '3km', '5km', '10km'])
+        with col4:
+            nearest_limit = st.number_input("가까운 고객 최대 수 (0 = 제한 없음)", min_value=0, value=0, step=10)
+        # A phone shortcut can open the page with ?lat=..&lng=.. from the device GPS
+        params = st.query_params
+        position_text = st.text_input(
+            "현재 위치 (위도, 경도)",
+            value=f"{params['lat']}, {params['lng']}" if 'lat' in params and 'lng' in params else "",
+            placeholder="예: 37.5665, 126.9780 (입력하면 이 위치에서 경로를 다시 계산합니다)"
+        )
             
     # Apply Filters
     if search_query:
-        my_df = my_df[my_df['Company Name'].str.contains(search_query, case=False, na=False)]
+        # Spacing, (주) and small typos are tolerated; see data_manager.search_contracts
+        matches = data_manager.search_contracts(search_query, {'Manager': selected_manager}, columns=['Company Name'])
+        my_df = my_df[my_df.index.isin(matches.index)]
     if status_filter:
         my_df = my_df[my_df['Status'].isin(status_filter)]
         
@@ -62,177 +505,103 @@ def render_field_sales_view():
     
     # Try to find the first valid customer location to center the map
     valid_locations = my_df.dropna(subset=['Latitude', 'Longitude'])
-    if not valid_locations.empty:
+    live_position = parse_position(position_text)
+    if live_position:
+        current_lat, current_lng = live_position
+    elif not valid_locations.empty:
         current_lat = valid_locations.iloc[0]['Latitude'] - 0.01
         current_lng = valid_locations.iloc[0]['Longitude'] - 0.01
     
+    # Nearby-only views are answered from the manager's spatial index instead of scanning every row
+    radius_km = float(radius_option[:-2]) if radius_option != '전체' else None
+    if radius_km or nearest_limit:
+        index = data_manager.get_spatial_index(selected_manager)
+        if nearest_limit:
+            nearby_ids, nearby_km = index.nearest(current_lat, current_lng, k=int(nearest_limit))
+            if radius_km:
+                nearby_ids = nearby_ids[nearby_km <= radius_km]
+        else:
+            nearby_ids = index.within(current_lat, current_lng, radius_km)
+        my_df = my_df[my_df.index.isin(nearby_ids)]
+        valid_locations = valid_locations[valid_locations.index.isin(nearby_ids)]
+        if len(my_df) == 0:
+            st.warning("출발점 주변에 조건에 맞는 고객사가 없습니다. 반경을 넓혀주세요.")
+            return
+    
     st.subheader("📍 방문 리스트 및 최적 경로")
     
-    # Filter out NaNs BEFORE route optimization to prevent euclidean distance crash
-    optimized_df = optimize_route(current_lat, current_lng, valid_locations)
+    # Precomputed daily plans cover the whole portfolio; narrowed searches are routed live
+    plan = None
+    plan_day = None
+    if not (radius_km or nearest_limit or search_query):
+        plan = data_manager.get_route_plan(selected_manager)
+    
+    if plan is not None:
+        plan_df, plan_info = plan
+        day_sizes = plan_df['day'].value_counts().sort_index()
+        day = st.selectbox(
+            "방문 일차", options=day_sizes.index.tolist(),
+            format_func=lambda d: f"{d}일차 ({day_sizes[d]}곳)", key="plan_day"
+        )
+        if plan_info['stale']:
+            st.caption("좌표·담당 변경 이후 아직 다시 계산되지 않은 방문 계획입니다.")
+        plan_day = day
+        day_plan = plan_df[plan_df['day'] == day]
+        day_df = valid_locations.loc[[row_id for row_id in day_plan['row_id'] if row_id in valid_locations.index]]
+        if live_position:
+            # Re-optimize only this day's stops from where the staff member actually is
+            optimized_df = optimize_route(current_lat, current_lng, day_df)
+        else:
+            current_lat, current_lng = day_plan['start_lat'].iloc[0], day_plan['start_lng'].iloc[0]
+            optimized_df = planned_visit_list(current_lat, current_lng, day_df)
+        other_days = valid_locations.drop(day_df.index).copy()
+        other_days['Distance'] = float('inf')
+        other_days['Route_Km'] = float('inf')
+        optimized_df = pd.concat([optimized_df, other_days])
+        route_stops = len(day_df)
+    else:
+        # Filter out NaNs BEFORE route optimization to prevent euclidean distance crash
+        optimized_df = optimize_route(current_lat, current_lng, valid_locations)
+        route_stops = 15
     
     # We still want to show the invalid ones in the list below, so we'll append them
     invalid_locations = my_df[my_df['Latitude'].isna() | my_df['Longitude'].isna()].copy()
     if not invalid_locations.empty:
         invalid_locations['Distance'] = float('inf') # Put them at the end of the route
+        invalid_locations['Route_Km'] = float('inf')
         optimized_df = pd.concat([optimized_df, invalid_locations])
         
-    # Assign route order to top 15
-    optimized_df['Route_Order'] = None
-    valid_idx = optimized_df[optimized_df['Distance'] != float('inf')].index
-    for i, idx in enumerate(valid_idx[:15]):
-        optimized_df.at[idx, 'Route_Order'] = i + 1
+    assign_route_order(optimized_df, count=route_stops)
+    
+    render_sync_panel(selected_manager, optimized_df)
     
     # Tabs for Map / List
     tab1, tab2 = st.tabs(["지도 보기", "리스트 보기 (상태 변경)"])
     
     with tab1:
-        st.markdown("#### 🚀 추천 방문 경로 리스트 (가까운 순 15곳)")
+        st.markdown(f"#### 🚀 추천 방문 경로 리스트 (최적 경로 순 {int(optimized_df['Route_Order'].notna().sum())}곳)")
         top_15_df = optimized_df[optimized_df['Route_Order'].notna()].copy()
         if not top_15_df.empty:
-            top_15_df['직선거리'] = (top_15_df['Distance'] * 111).apply(lambda x: f"{x:.1f} km")
-            display_df = top_15_df[['Route_Order', 'Company Name', 'Status', '직선거리', 'Contact', 'Address']].rename(
+            top_15_df['구간거리'] = top_15_df['Distance'].apply(lambda x: f"{x:.1f} km")
+            display_df = top_15_df[['Route_Order', 'Company Name', 'Status', '구간거리', 'Contact', 'Address']].rename(
                 columns={'Route_Order': '방문순서', 'Company Name': '상호', 'Status': '상태', 'Contact': '연락처', 'Address': '주소'}
             )
             display_df['방문순서'] = display_df['방문순서'].astype(int)
-            st.dataframe(display_df, hide_index=True, use_container_width=True)
+            st.dataframe(display_df, hide_index=True, width='stretch')
             
         st.markdown("#### 🗺️ 현장 지도")
-        # Folium Map with Base Layers
-        m = folium.Map(location=[current_lat, current_lng], zoom_start=14, tiles=None)
-        
-        # 1. Default OpenStreetMap (Regular Roads)
-        folium.TileLayer('OpenStreetMap', name='기본 도로망 (OpenStreetMap)').add_to(m)
-        
-        # 2. Vworld/CartoDB (Clean layout)
-        folium.TileLayer('CartoDB positron', name='깔끔한 약도 (CartoDB)').add_to(m)
-        
-        # 3. Google Satellite Hybrid (Detailed buildings & roads)
-        folium.TileLayer(
-            tiles='http://mt0.google.com/vt/lyrs=y&hl=ko&x={x}&y={y}&z={z}',
-            attr='Google',
-            name='위성 및 상세 도로망 (Google Hybrid)'
-        ).add_to(m)
-        
-        # Add Layer Control to toggle the map styles
-        folium.LayerControl(position='topright').add_to(m)
-        
-        # Add Locate Control (내 위치 이동 버튼)
-        plugins.LocateControl(
-            position="topright",
-            strings={"title": "내 실시간 위치 찾기", "popup": "현재 위치"},
-        ).add_to(m)
-        
-        # Add Current Location Marker
-        folium.Marker(
-            location=[current_lat, current_lng],
-            popup="<div style='width: 150px;'><b>📍 기준 위치(출발점)</b></div>",
-            icon=folium.Icon(color='black', icon='user')
-        ).add_to(m)
-        
-        # Guide Option: Draw animated line to top 15 nearest locations
-        valid_targets = optimized_df.dropna(subset=['Latitude', 'Longitude'])
-        if not valid_targets.empty:
-            top_15 = valid_targets.head(15)
-            route_coords = [[current_lat, current_lng]] + top_15[['Latitude', 'Longitude']].values.tolist()
-            plugins.AntPath(
-                locations=route_coords,
-                dash_array=[10, 20],
-                delay=1000,
-                color='red',
-                pulse_color='white',
-                weight=3,
-                tooltip='최적 방문 경로 가이드 (상위 15곳)'
-            ).add_to(m)
-        
-        # Add Customer Markers
-        for _, row in optimized_df.iterrows():
-            if pd.isna(row['Latitude']) or pd.isna(row['Longitude']):
-                continue # Skip if location could not be geocoded
-                
-            if row['Status'] == '미확인':
-                color = 'red'
-            elif row['Status'] == '진행중':
-                color = 'orange'
-            else:
-                color = 'blue'
-                
-            order_text = f"[{int(row['Route_Order'])}] " if pd.notna(row['Route_Order']) else ""
-            distance_km = f"{row['Distance'] * 111:.1f}km" if pd.notna(row['Route_Order']) else ""
-            dist_html = f"<div style='margin-bottom: 4px;'><b>직선거리:</b> <span style='color:#27AE60; font-weight:bold;'>{distance_km}</span></div>" if distance_km else ""
-                
-            popup_html = f"""
-            <div style="font-family: Arial, sans-serif; font-size: 13px; border: 1px solid #ddd; background-color: white; padding: 12px; border-radius: 8px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); width: 220px;">
-                <h4 style="margin-top: 0; margin-bottom: 8px; color: #2C3E50; font-size: 15px;">🏢 {order_text}{row['Company Name']}</h4>
-                <div style="border-bottom: 1px solid #eee; margin-bottom: 8px;"></div>
-                <div style="margin-bottom: 4px;"><b>상태:</b> <span style="color:{color}; font-weight:bold;">{row['Status']}</span></div>
-                {dist_html}
-                <div style="margin-bottom: 4px;"><b>정지사유:</b> {row['Stop Reason']}</div>
-                <div style="margin-bottom: 4px;"><b>정지일자:</b> {row['Stop Start Date']}</div>
-                <div style="margin-bottom: 4px;"><b>당월정지:</b> <span style="color:#E74C3C;">{row['Stop Days']}일</span></div>
-            </div>
-            """
-            
-            # Formatted Icons: Add numbers for top 15
-            if pd.notna(row['Route_Order']):
-                icon = plugins.BeautifyIcon(
-                    border_color=color,
-                    text_color=color,
-                    number=int(row['Route_Order']),
-                    inner_icon_style='margin-top:0; font-weight:bold;'
-                )
-            else:
-                icon = folium.Icon(color=color, icon='info-sign')
-            
-            folium.Marker(
-                location=[row['Latitude'], row['Longitude']],
-                popup=folium.Popup(popup_html, max_width=300),
-                tooltip=f"{order_text}{row['Company Name']} {distance_km}",
-                icon=icon
-            ).add_to(m)
-            
-        # returned_objects=[] prevents Streamlit from waiting for interaction data (Fast speed boost)
-        st_data = st_folium(m, width=800, height=500, returned_objects=[])
+        # The map is display-only, so it is shipped as static HTML; unchanged maps come from the cache
+        map_key = (selected_manager, search_query, tuple(status_filter), radius_option, nearest_limit, position_text, plan_day)
+        map_html = field_map_html(map_key, optimized_df, current_lat, current_lng)
+        with metrics.timer('map.transfer'):
+            st.iframe(map_html, width=800, height=500)
     
     with tab2:
-        st.caption("고객사를 클릭하여 상세 정보 확인 및 상태를 업데이트 하세요.")
-        for idx, row in optimized_df.iterrows():
-            with st.expander(f"🏢 {row['Company Name']} - 현재 상태: [{row['Status']}]"):
-                st.write(f"**연락처**: {row['Contact']}")
-                st.write(f"**주소**: {row['Address']}")
-                st.write(f"**월정료**: {row['Monthly Fee']:,}원")
-                st.write(f"**정지사유**: {row['Stop Reason']}")
-                st.write(f"**정지시작일자**: {row['Stop Start Date']}")
-                st.write(f"**당월말 정지일수**: {row['Stop Days']}일")
-                st.write(f"**현재 위치로부터 거리**: {row['Distance']*111:.2f} km (예상치)") # Rough conversion degree to km
-                
-                # Status Change Actions
-                st.write("---")
-                st.write("**상태 변경하기**")
-                
-                col1, col2, col3 = st.columns(3)
-                
-                def make_update_callback(contract_no, status):
-                    def callback():
-                        data_manager.update_status(contract_no, status)
-                    return callback
-                
-                # Use callbacks to update state and trigger rerun
-                # Note: Appended `idx` to the key to prevent StreamlitDuplicateElementKey when multiple items share a contract_no
-                with col1:
-                    st.button("진행전(미확인)", key=f"btn_un_{row['Contract No']}_{idx}", 
-                              on_click=make_update_callback(row['Contract No'], "미확인"),
-                              use_container_width=True,
-                              disabled=row['Status'] == "미확인")
-                with col2:
-                    st.button("진행중", key=f"btn_ing_{row['Contract No']}_{idx}",
-                              on_click=make_update_callback(row['Contract No'], "진행중"),
-                              use_container_width=True,
-                              disabled=row['Status'] == "진행중")
-                with col3:
-                    st.button("완료", key=f"btn_done_{row['Contract No']}_{idx}",
-                              on_click=make_update_callback(row['Contract No'], "완료"),
-                              use_container_width=True,
-                              disabled=row['Status'] == "완료")
+        st.caption("상태 칸을 직접 수정한 뒤 '변경사항 저장'을 누르면 한 번에 반영됩니다.")
+        render_bulk_status_action(optimized_df)
+        render_list_page(optimized_df)
         
-        st.info("상태를 변경하면 관리자 대시보드에 즉시 반영됩니다.")
+        if st.session_state.get('batch_mode'):
+            st.info("모아서 저장 중: 변경 내용은 '동기화'를 누를 때 관리자 대시보드에 반영됩니다.")
+        else:
+            st.info("상태를 변경하면 관리자 대시보드에 즉시 반영됩니다.")
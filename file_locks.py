@@ -0,0 +1,112 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+# Cross-process locks and atomic file replacement for the files next to the store (snapshot, CSV export),
+# for the several processes of one host that may write them at the same time. SQLite locks contracts.db
+# itself. Both only hold on a local disk: SQLite's WAL index is shared memory and flock is unreliable or
+# local-only on network filesystems, so the store is single-host (see check_local_filesystem and
+# data_manager.init_db). Replicas on other machines need a server database instead.
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_TIMEOUT = 60
+
+# Filesystem types (as in /proc/mounts) on which neither the WAL index nor flock can be trusted
+NETWORK_FILESYSTEMS = ('nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'afpfs', 'ncpfs', 'fuse.sshfs', 'glusterfs', 'ceph', '9p')
+
+# flock is per open file description, so threads of one process also need a lock of their own
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+def _thread_lock(path):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+def _acquire(f, deadline):
+    while True:
+        try:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for lock on {f.name}")
+            time.sleep(0.05)
+
+def _release(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def locked(path, timeout=LOCK_TIMEOUT):
+    """
+    Exclusive lock on `path` across threads and processes, held through a
+    sidecar `<path>.lock` file so the locked file itself can be replaced.
+    Raises TimeoutError after `timeout` seconds.
+    """
+    lock = _thread_lock(path)
+    if not lock.acquire(timeout=timeout):
+        raise TimeoutError(f"Timed out waiting for lock on {path}")
+    try:
+        with open(f"{path}.lock", 'a+') as f:
+            _acquire(f, time.monotonic() + timeout)
+            try:
+                yield
+            finally:
+                _release(f)
+    finally:
+        lock.release()
+
+def atomic_write(path, write):
+    """
+    Calls write(tmp_path) and moves the result over `path` in one rename, so
+    readers see either the old or the new file, never a partial one. The temp
+    file sits in the same directory because rename is only atomic within a
+    file system.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(tmp_path)
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def filesystem_type(path):
+    """Type of the filesystem holding `path` from /proc/mounts, or None where that is not available."""
+    try:
+        with open('/proc/mounts', encoding='utf-8') as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return None
+    path = os.path.realpath(path)
+    best, best_type = '', None
+    for mount_point, fs_type in mounts:
+        # Spaces in mount points are written as \040
+        mount_point = mount_point.replace('\\040', ' ')
+        inside = path == mount_point or path.startswith(mount_point.rstrip('/') + '/')
+        if inside and len(mount_point) > len(best):
+            best, best_type = mount_point, fs_type
+    return best_type
+
+def check_local_filesystem(path):
+    """Raises RuntimeError when the directory of `path` is on a network filesystem."""
+    fs_type = filesystem_type(os.path.dirname(os.path.abspath(path)))
+    if fs_type in NETWORK_FILESYSTEMS:
+        raise RuntimeError(
+            f"{path} is on a network filesystem ({fs_type}). The store's locking only works on a local disk "
+            f"of a single host; move it to local storage."
+        )
@@ -0,0 +1,235 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+import unicodedata
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Address -> coordinate cache, kept outside contracts.db so it survives re-imports
+CACHE_FILE = "geocode_cache.db"
+
+PLACEHOLDER_ADDRESSES = {'주소없음', '-', ''}
+
+def normalize_address(address):
+    """
+    Canonical form used for cache keys and de-duplication.
+    Masked house numbers ('********') are dropped since no geocoder can use them.
+    """
+    if address is None or (not isinstance(address, str) and pd.isna(address)):
+        return None
+    text = unicodedata.normalize('NFC', str(address))
+    text = text.replace('*', ' ')
+    text = re.sub(r'[()\[\],]', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    if text in PLACEHOLDER_ADDRESSES:
+        return None
+    return text
+
+class GeocodeCache:
+    """
+    Persistent address cache. Misses are stored too (NULL coordinates) so the
+    same provider does not retry them every run; another provider still may.
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocode_cache ("
+                "address TEXT PRIMARY KEY, latitude REAL, longitude REAL, provider TEXT, updated_at REAL)"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def get_many(self, addresses, provider_name=None):
+        """Returns {address: (lat, lng) or None} for the addresses that are cached."""
+        found = {}
+        addresses = list(addresses)
+        conn = self._connect()
+        try:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(addresses), 500):
+                chunk = addresses[i:i + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                for address, lat, lng, provider in conn.execute(
+                    f"SELECT address, latitude, longitude, provider FROM geocode_cache WHERE address IN ({placeholders})",
+                    chunk
+                ):
+                    if lat is not None:
+                        found[address] = (lat, lng)
+                    elif provider == provider_name:
+                        found[address] = None
+        finally:
+            conn.close()
+        return found
+
+    def put_many(self, results, provider_name):
+        now = time.time()
+        rows = [
+            (address, coords[0] if coords else None, coords[1] if coords else None, provider_name, now)
+            for address, coords in results.items()
+        ]
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT OR REPLACE INTO geocode_cache VALUES (?, ?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+class RateLimit:
+    """Thread-safe minimum spacing between calls, shared by all worker threads of a provider."""
+
+    def __init__(self, min_delay_seconds):
+        self.min_delay_seconds = min_delay_seconds
+        self._lock = threading.Lock()
+        self._next_call = 0.0
+
+    def wait(self):
+        if self.min_delay_seconds <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.min_delay_seconds
+        if delay > 0:
+            time.sleep(delay)
+
+class GeocodingProvider:
+    """
+    Interface for geocoding backends. `geocode` returns (lat, lng) or None and
+    may raise for transient errors; `max_workers` bounds concurrent calls.
+    """
+    name = "base"
+    max_workers = 1
+
+    def geocode(self, address):
+        raise NotImplementedError
+
+class NominatimProvider(GeocodingProvider):
+    """Nominatim over HTTP. Point `domain` at a self-hosted or stub server to lift the public rate limit."""
+    name = "nominatim"
+
+    def __init__(self, user_agent="field_sales_app", domain=None, scheme=None, min_delay_seconds=1.5, max_workers=1):
+        from geopy.geocoders import Nominatim
+
+        kwargs = {'user_agent': user_agent}
+        if domain:
+            kwargs['domain'] = domain
+        if scheme:
+            kwargs['scheme'] = scheme
+        self._geolocator = Nominatim(**kwargs)
+        self._rate_limit = RateLimit(min_delay_seconds)
+        self.max_workers = max_workers
+
+    def geocode(self, address):
+        self._rate_limit.wait()
+        location = self._geolocator.geocode(address, country_codes='kr')
+        if location:
+            return (location.latitude, location.longitude)
+        return None
+
+class GazetteerProvider(GeocodingProvider):
+    """
+    Offline lookup from a CSV with Address, Latitude, Longitude columns.
+    Falls back to shorter prefixes ('서울 은평구 대조동' for a full street address),
+    so a dong-level gazetteer is enough to place every contract.
+    """
+    name = "gazetteer"
+    max_workers = 1
+
+    def __init__(self, path):
+        df = pd.read_csv(path)
+        self._coords = {}
+        for address, lat, lng in zip(df['Address'], df['Latitude'], df['Longitude']):
+            key = normalize_address(address)
+            if key and pd.notna(lat) and pd.notna(lng):
+                self._coords[key] = (float(lat), float(lng))
+
+    def geocode(self, address):
+        tokens = address.split(' ')
+        while tokens:
+            coords = self._coords.get(' '.join(tokens))
+            if coords:
+                return coords
+            tokens.pop()
+        return None
+
+def get_default_provider():
+    # GEOCODER_GAZETTEER=<csv> for offline use, GEOCODER_DOMAIN=<host:port> for a local/stub Nominatim
+    gazetteer = os.environ.get('GEOCODER_GAZETTEER')
+    if gazetteer:
+        return GazetteerProvider(gazetteer)
+    domain = os.environ.get('GEOCODER_DOMAIN')
+    if domain:
+        return NominatimProvider(domain=domain, scheme='http', min_delay_seconds=0, max_workers=8)
+    return NominatimProvider()
+
+def geocode_addresses(addresses, provider=None, cache=None, checkpoint_every=50, on_checkpoint=None, progress=None):
+    """
+    Geocodes the unique normalized forms of `addresses`.
+
+    Cached addresses are served without touching the provider. Misses are sent
+    to the provider from `provider.max_workers` threads and written to the
+    cache every `checkpoint_every` results; `on_checkpoint` receives the same
+    {normalized_address: coords} batch so callers can persist their rows too.
+    An interrupted run therefore resumes from the last checkpoint.
+    `progress(done, total)` is called per address; an exception raised from
+    it (e.g. job cancellation) stops the run after a final checkpoint.
+    Returns {normalized_address: (lat, lng) or None}.
+    """
+    provider = provider or get_default_provider()
+    cache = cache or GeocodeCache()
+
+    unique = {key for key in (normalize_address(a) for a in addresses) if key}
+    results = cache.get_many(unique, provider.name)
+    if results and on_checkpoint:
+        on_checkpoint(dict(results))
+
+    pending = [a for a in unique if a not in results]
+    if progress:
+        progress(len(results), len(unique))
+    if not pending:
+        return results
+    print(f"Geocoding {len(pending)} unique addresses ({len(results)} served from cache)...")
+
+    batch = {}
+
+    def flush():
+        if batch:
+            cache.put_many(batch, provider.name)
+            if on_checkpoint:
+                on_checkpoint(dict(batch))
+            batch.clear()
+
+    with ThreadPoolExecutor(max_workers=max(1, provider.max_workers)) as pool:
+        futures = {pool.submit(provider.geocode, address): address for address in pending}
+        try:
+            for done, future in enumerate(as_completed(futures), start=len(results) + 1):
+                address = futures[future]
+                try:
+                    coords = future.result()
+                except Exception as e:
+                    # Transient failure: leave it uncached so the next run retries
+                    print(f"Geocoding failed for {address}: {e}")
+                else:
+                    results[address] = coords
+                    batch[address] = coords
+                    if len(batch) >= checkpoint_every:
+                        flush()
+                if progress:
+                    progress(done, len(unique))
+        finally:
+            for future in futures:
+                future.cancel()
+            flush()
+    return results
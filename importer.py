@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import time
+import pandas as pd
+
+# Streaming readers for admin uploads: only one chunk of rows is held in memory at a time
+CHUNK_ROWS = 5000
+
+SUPPORTED_TYPES = ['xlsx', 'csv', 'parquet']
+
+# Uploads are spooled to the temp directory under this prefix until the background import has read them
+SPOOL_PREFIX = 'contracts_upload_'
+# Spools older than this were abandoned (session closed, process killed mid-import); no import runs this long
+SPOOL_MAX_AGE = 24 * 3600
+
+def spool(fileobj, name):
+    """Copies an uploaded file object to a new spool file and returns its path. The caller deletes it."""
+    # Sessions that closed without importing leave their spool behind; a long-running process collects them here
+    sweep_stale_spools()
+    suffix = os.path.splitext(name)[1].lower()
+    fileobj.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, prefix=SPOOL_PREFIX, suffix=suffix) as tmp:
+        shutil.copyfileobj(fileobj, tmp)
+    return tmp.name
+
+def discard_spool(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def sweep_stale_spools(max_age=SPOOL_MAX_AGE):
+    """Deletes spool files left behind by earlier processes; returns how many were removed."""
+    cutoff = time.time() - max_age
+    directory = tempfile.gettempdir()
+    removed = 0
+    for entry in os.scandir(directory):
+        if not entry.name.startswith(SPOOL_PREFIX) or not entry.is_file(follow_symlinks=False):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            # Another process removed it first, or it is not ours to delete
+            pass
+    return removed
+
+def _file_type(path):
+    return os.path.splitext(path)[1].lower().lstrip('.')
+
+def _column_names(header):
+    return [str(col) if col is not None else f"Unnamed: {i}" for i, col in enumerate(header)]
+
+def read_header(path):
+    """
+    Returns (columns, row_count) without loading the data.
+    row_count is None when the format does not record it (CSV).
+    """
+    file_type = _file_type(path)
+    if file_type == 'xlsx':
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+            row_count = sheet.max_row - 1 if sheet.max_row else None
+            return _column_names(header), row_count
+        finally:
+            workbook.close()
+    if file_type == 'csv':
+        return pd.read_csv(path, nrows=0).columns.tolist(), None
+    if file_type == 'parquet':
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        return parquet_file.schema_arrow.names, parquet_file.metadata.num_rows
+    raise ValueError(f"지원하지 않는 파일 형식입니다: {file_type}")
+
+def _iter_xlsx(path, chunk_rows):
+    from openpyxl import load_workbook
+
+    # read_only streams rows from the sheet XML instead of building the whole workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        columns = _column_names(next(rows, ()))
+        width = len(columns)
+        buffer = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            buffer.append(tuple(row[:width]) + (None,) * (width - len(row)))
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame(buffer, columns=columns)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yields the upload as DataFrames of at most chunk_rows rows, header taken from the first row."""
+    file_type = _file_type(path)
+    if file_type == 'xlsx':
+        yield from _iter_xlsx(path, chunk_rows)
+    elif file_type == 'csv':
+        # As text, so phone numbers and contract numbers keep their leading zeros
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype=str)
+    elif file_type == 'parquet':
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"지원하지 않는 파일 형식입니다: {file_type}")
@@ -0,0 +1,152 @@
+import time
+import queue
+import itertools
+import threading
+import traceback
+
+# Long-running work (geocoding, imports) runs here instead of inside a Streamlit script run.
+# The registry is module-level, so it outlives page reruns and is shared by every session in the process.
+# Jobs are per-process and in memory only: nothing is persisted, so a restart drops queued and running
+# jobs (their work is re-submitted by the next import, or from the dashboard), and when several server
+# processes share the store each has its own worker and sees only its own jobs; unique=True does not
+# reach across processes. Deploy one server process per store for a complete job panel.
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+class JobCancelled(Exception):
+    pass
+
+class Job:
+    def __init__(self, job_id, kind, target, label=None, max_retries=0, retry_delay=5.0):
+        self.id = job_id
+        self.kind = kind
+        self.label = label or kind
+        self.target = target
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.status = QUEUED
+        self.attempts = 0
+        self.done = 0
+        self.total = 0
+        self.error = None
+        self.result = None
+        # Short human-readable outcome a task may set for the dashboard
+        self.message = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    def report(self, done, total=None):
+        """Progress callback handed to the task; also the point where cancellation takes effect."""
+        self.done = done
+        if total is not None:
+            self.total = total
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        self._cancel.set()
+        if self.status == QUEUED:
+            self.status = CANCELLED
+            self.finished_at = time.time()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    @property
+    def fraction(self):
+        if not self.total:
+            return 0.0
+        return min(1.0, self.done / self.total)
+
+    @property
+    def eta_seconds(self):
+        if self.status != RUNNING or not self.done or not self.total:
+            return None
+        elapsed = time.time() - self.started_at
+        return elapsed / self.done * (self.total - self.done)
+
+_jobs = {}
+_queue = queue.Queue()
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_worker = None
+
+def _run(job):
+    job.status = RUNNING
+    job.started_at = time.time()
+    while True:
+        job.attempts += 1
+        try:
+            job.result = job.target(job)
+            job.status = DONE
+            break
+        except JobCancelled:
+            job.status = CANCELLED
+            break
+        except Exception as e:
+            job.error = f"{e}"
+            print(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}: {e}")
+            traceback.print_exc()
+            if job.attempts > job.max_retries or job.cancel_requested:
+                job.status = FAILED
+                break
+            time.sleep(job.retry_delay * job.attempts)
+    job.finished_at = time.time()
+
+def _work():
+    while True:
+        job = _queue.get()
+        try:
+            if job.status == QUEUED:
+                _run(job)
+        finally:
+            _queue.task_done()
+
+def _ensure_worker():
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        _worker = threading.Thread(target=_work, name="job-worker", daemon=True)
+        _worker.start()
+
+def submit(kind, target, label=None, max_retries=0, unique=False):
+    """
+    Queues target(job) on this process's background worker and returns the Job.
+    The target should call job.report(done, total) as it goes.
+    With unique=True an already queued/running job of the same kind in this process is returned instead.
+    """
+    with _lock:
+        if unique:
+            for job in _jobs.values():
+                if job.kind == kind and job.status in ACTIVE_STATES:
+                    return job
+        job = Job(next(_ids), kind, target, label=label, max_retries=max_retries)
+        _jobs[job.id] = job
+        _ensure_worker()
+    _queue.put(job)
+    return job
+
+def get_job(job_id):
+    return _jobs.get(job_id)
+
+def list_jobs(kind=None, limit=None):
+    """This process's jobs, newest first."""
+    found = [job for job in reversed(list(_jobs.values())) if kind is None or job.kind == kind]
+    return found[:limit] if limit else found
+
+def has_active_jobs():
+    return any(job.status in ACTIVE_STATES for job in list(_jobs.values()))
+
+def cancel(job_id):
+    job = _jobs.get(job_id)
+    if job:
+        job.cancel()
+    return job
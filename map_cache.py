@@ -0,0 +1,58 @@
+import threading
+from collections import OrderedDict
+import metrics
+
+# Process-wide LRU for rendered maps, shared by reruns and sessions.
+# Values are opaque to the cache; callers decide what a key covers and how costly an entry is.
+
+class LRUCache:
+    """
+    Thread-safe LRU with two limits: at most `max_entries` entries, and at
+    most `max_cost` in total (e.g. bytes held), evicting the least recently
+    used first. `name` prefixes the hit/miss/evict counters in metrics.
+    """
+
+    def __init__(self, max_entries=32, max_cost=50_000, name='map_cache'):
+        self.max_entries = max_entries
+        self.max_cost = max_cost
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (value, cost)
+        self._cost = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def cost(self):
+        return self._cost
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                metrics.incr(f'{self.name}.miss')
+                return None
+            self._entries.move_to_end(key)
+        metrics.incr(f'{self.name}.hit')
+        return entry[0]
+
+    def put(self, key, value, cost=1):
+        """Stores or refreshes `key`; a single entry above max_cost is not kept."""
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._cost -= previous[1]
+            if cost > self.max_cost:
+                return
+            self._entries[key] = (value, cost)
+            self._cost += cost
+            while len(self._entries) > self.max_entries or self._cost > self.max_cost:
+                _, (_, evicted_cost) = self._entries.popitem(last=False)
+                self._cost -= evicted_cost
+                metrics.incr(f'{self.name}.evict')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._cost = 0
@@ -0,0 +1,131 @@
+import os
+import sys
+import json
+import time
+import functools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# Timers and counters for the hot paths. Every measurement goes into process-wide totals, and
+# into the current request's record when one is open (one Streamlit script run, see `request`).
+# With METRICS_LOG=<path> set (e.g. for a load test), finished requests are also appended to that file as
+# one JSON object per line. The file is never rotated, so logging is off unless asked for.
+
+LOG_FILE = os.environ.get('METRICS_LOG', '')
+RECENT_REQUESTS = 50
+
+_lock = threading.Lock()
+_timers = {}      # name -> [count, total_seconds, max_seconds]
+_counters = {}    # name -> count
+_recent = deque(maxlen=RECENT_REQUESTS)
+# Script runs each have their own thread, so a context variable keeps sessions apart
+_current = contextvars.ContextVar('metrics_request', default=None)
+
+def record(name, seconds):
+    with _lock:
+        stat = _timers.setdefault(name, [0, 0.0, 0.0])
+        stat[0] += 1
+        stat[1] += seconds
+        stat[2] = max(stat[2], seconds)
+    current = _current.get()
+    if current is not None:
+        timers = current['timers']
+        timers[name] = round(timers.get(name, 0.0) + seconds * 1000, 3)
+
+def incr(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+    current = _current.get()
+    if current is not None:
+        counters = current['counters']
+        counters[name] = counters.get(name, 0) + n
+
+@contextmanager
+def timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def timed(name):
+    """Decorator form of `timer`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+@contextmanager
+def request(page, **fields):
+    """
+    Scope for one script run. Yields the request record: {'page', 'started_at',
+    'total_ms', 'timers': {name: ms}, 'counters': {name: n}, **fields}. Timers
+    are inclusive, so nested ones overlap. The record is logged on exit, also
+    when the run ends through st.stop()/st.rerun() or an error.
+    """
+    current = {'page': page, 'started_at': round(time.time(), 3), 'timers': {}, 'counters': {}, **fields}
+    token = _current.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current['total_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        _current.reset(token)
+        with _lock:
+            _recent.append(current)
+        _write_log(current)
+
+def _write_log(entry):
+    if not LOG_FILE:
+        return
+    try:
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with _lock, open(LOG_FILE, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+    except OSError as e:
+        print(f"Could not write metrics log {LOG_FILE}: {e}")
+
+def snapshot():
+    """Process-wide totals: ({name: (count, total_ms, max_ms)}, {name: count})."""
+    with _lock:
+        timers = {name: (count, total * 1000, worst * 1000) for name, (count, total, worst) in _timers.items()}
+        return timers, dict(_counters)
+
+def recent_requests(page=None):
+    """Newest first."""
+    with _lock:
+        found = list(_recent)
+    return [r for r in reversed(found) if page is None or r['page'] == page]
+
+def summarize_log(path=LOG_FILE):
+    """
+    Per page and timer: count, p50, p95 and max in ms over a request log,
+    e.g. to compare a load test before and after a change.
+    """
+    import pandas as pd
+
+    rows = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            entry = json.loads(line)
+            rows.append((entry['page'], 'total', entry['total_ms']))
+            rows.extend((entry['page'], name, ms) for name, ms in entry['timers'].items())
+    df = pd.DataFrame(rows, columns=['page', 'timer', 'ms'])
+    grouped = df.groupby(['page', 'timer'])['ms']
+    return pd.DataFrame({
+        'count': grouped.size(),
+        'p50': grouped.quantile(0.5),
+        'p95': grouped.quantile(0.95),
+        'max': grouped.max(),
+    }).round(1)
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else LOG_FILE
+    if not path:
+        sys.exit("usage: python metrics.py <log file> (or set METRICS_LOG)")
+    print(summarize_log(path).to_string())
@@ -0,0 +1,122 @@
+import json
+
+# Offline status recorder: a single self-contained HTML page built from a route bundle
+# (data_manager.get_route_bundle). Staff save it on the phone and open it without signal; each
+# status tap is kept in the browser's localStorage, and "업로드 파일 만들기" downloads the bundle with
+# those taps in its 'changes' list, ready for the field view's upload (data_manager.sync_route_bundle).
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="ko">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>오프라인 방문 기록</title>
+<style>
+body { font-family: Arial, sans-serif; margin: 0; padding: 12px; background: #f6f7f9; }
+h1 { font-size: 18px; margin: 0 0 8px; }
+#bar { position: sticky; top: 0; background: #f6f7f9; padding-bottom: 8px; }
+#search { width: 100%; box-sizing: border-box; padding: 8px; font-size: 15px; margin-bottom: 6px; }
+#export { width: 100%; padding: 10px; font-size: 15px; font-weight: bold; background: #2C3E50; color: white; border: 0; border-radius: 6px; }
+.card { background: white; border-radius: 8px; padding: 10px; margin-bottom: 8px; box-shadow: 0 1px 3px rgba(0,0,0,0.1); }
+.name { font-weight: bold; font-size: 15px; }
+.meta { color: #555; font-size: 13px; margin: 4px 0 8px; }
+.status button { padding: 6px 10px; margin-right: 4px; border: 1px solid #ccc; border-radius: 4px; background: white; font-size: 14px; }
+.status button.on { color: white; border-color: transparent; }
+.pending { color: #E67E22; font-size: 12px; margin-left: 6px; }
+</style>
+</head>
+<body>
+<div id="bar">
+<h1 id="title"></h1>
+<input id="search" type="search" placeholder="상호명·주소 검색">
+<button id="export"></button>
+</div>
+<div id="list"></div>
+<script>
+var bundle = __BUNDLE__;
+var colors = __STATUS_COLORS__;
+var storageKey = 'route-changes-' + bundle.bundle_id;
+var changes = JSON.parse(localStorage.getItem(storageKey) || '[]');
+var col = {};
+bundle.columns.forEach(function (name, i) { col[name] = i; });
+
+function latestStatus(contractNo, fallback) {
+    var status = fallback;
+    changes.forEach(function (change) { if (change['Contract No'] === contractNo) { status = change.Status; } });
+    return status;
+}
+
+function record(contractNo, status) {
+    changes.push({'Contract No': contractNo, 'Status': status, 'changed_at': Date.now() / 1000});
+    localStorage.setItem(storageKey, JSON.stringify(changes));
+    render();
+}
+
+function text(tag, className, value) {
+    // Field values come from the imported file, so they are only ever set as text
+    var el = document.createElement(tag);
+    el.className = className;
+    el.textContent = value == null ? '-' : String(value);
+    return el;
+}
+
+function render() {
+    var query = document.getElementById('search').value.trim();
+    var list = document.getElementById('list');
+    list.textContent = '';
+    bundle.rows.forEach(function (row) {
+        var contractNo = String(row[col['Contract No']]);
+        var name = row[col['Company Name']] || '';
+        var address = row[col['Address']] || '';
+        if (query && name.indexOf(query) < 0 && address.indexOf(query) < 0) { return; }
+        var current = latestStatus(contractNo, row[col['Status']]);
+        var card = document.createElement('div');
+        card.className = 'card';
+        var title = text('div', 'name', name);
+        if (current !== row[col['Status']]) { title.appendChild(text('span', 'pending', '기록됨')); }
+        card.appendChild(title);
+        card.appendChild(text('div', 'meta', address + ' · ' + (row[col['Contact']] || '-')));
+        var buttons = document.createElement('div');
+        buttons.className = 'status';
+        Object.keys(colors).forEach(function (status) {
+            var button = text('button', status === current ? 'on' : '', status);
+            if (status === current) { button.style.background = colors[status]; }
+            button.onclick = function () { record(contractNo, status); };
+            buttons.appendChild(button);
+        });
+        card.appendChild(buttons);
+        list.appendChild(card);
+    });
+    document.getElementById('export').textContent = '업로드 파일 만들기 (기록 ' + changes.length + '건)';
+}
+
+document.getElementById('export').onclick = function () {
+    var payload = JSON.parse(JSON.stringify(bundle));
+    payload.changes = changes;
+    var blob = new Blob([JSON.stringify(payload)], {type: 'application/json'});
+    var link = document.createElement('a');
+    link.href = URL.createObjectURL(blob);
+    link.download = 'route_changes_' + bundle.manager + '.json';
+    document.body.appendChild(link);
+    link.click();
+    link.remove();
+};
+document.getElementById('search').oninput = render;
+document.getElementById('title').textContent = bundle.manager + ' 방문 기록 (' + bundle.rows.length + '곳)';
+render();
+</script>
+</body>
+</html>
+"""
+
+def _script_json(value):
+    # JSON is valid JavaScript; "</" is escaped so a value cannot close the <script> element
+    return json.dumps(value, ensure_ascii=False).replace('</', '<\\/')
+
+def build_recorder_page(bundle, status_colors):
+    """The recorder page for `bundle`, offering the statuses in `status_colors` (status -> CSS color)."""
+    return (
+        PAGE_TEMPLATE
+        .replace('__STATUS_COLORS__', _script_json(status_colors))
+        .replace('__BUNDLE__', _script_json(bundle))
+    )
@@ -1,6 +1,7 @@
 import streamlit as st
-from admin_view import render_admin_dashboard
-import data_manager
+from admin_view import render_admin_dashboard, render_timing_panel
+import bootstrap
+import metrics
 
 # Page Configuration for Admin
 st.set_page_config(page_title="관리자 대시보드", page_icon="📊", layout="wide")
@@ -12,8 +13,11 @@ if not st.session_state.get('authenticated') or st.session_state.get('role') !=
         st.switch_page("app.py")
     st.stop()
 
-# Ensure DB is initialized
-data_manager.init_db()
+with metrics.request('admin_dashboard', role='admin') as current:
+    # Ensure DB is initialized (once per process; waits if the login page started it)
+    bootstrap.ensure_initialized()
+    
+    # Render the Admin Dashboard
+    render_admin_dashboard()
 
-# Render the Admin Dashboard
-render_admin_dashboard()
+render_timing_panel(current)
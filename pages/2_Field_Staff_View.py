@@ -1,6 +1,8 @@
 import streamlit as st
 from field_view import render_field_sales_view
-import data_manager
+from admin_view import render_timing_panel
+import bootstrap
+import metrics
 
 # Page Configuration for Field Staff
 st.set_page_config(page_title="현장사원 뷰", page_icon="🏃‍♂️", layout="wide")
@@ -12,9 +14,6 @@ if not st.session_state.get('authenticated') or st.session_state.get('role') not
         st.switch_page("app.py")
     st.stop()
 
-# Ensure DB is initialized
-data_manager.init_db()
-
 # Hide sidebar for the Field Staff View
 st.markdown("""
     <style>
@@ -23,5 +22,13 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Render the Field Staff View
-render_field_sales_view()
+with metrics.request('field_view', role=st.session_state.get('role')) as current:
+    # Ensure DB is initialized (once per process; waits if the login page started it)
+    bootstrap.ensure_initialized()
+    
+    # Render the Field Staff View
+    render_field_sales_view()
+
+# Timings are for admins checking the field page, not for field staff
+if st.session_state.get('role') == 'admin':
+    render_timing_panel(current)
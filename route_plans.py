@@ -0,0 +1,107 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import routing
+
+# Daily visit plans: each manager's portfolio is cut into day-sized clusters and each day is routed.
+# Pure computation on arrays; data_manager stores the result (see build_route_plans there).
+
+STOPS_PER_DAY = 25
+
+# Below this many stops in total a process pool costs more than it saves
+POOL_MIN_STOPS = 2000
+
+# Per-day optimizer budget; a day is small, so this is rarely reached
+DAY_TIME_LIMIT = 0.2
+
+_HILBERT_ORDER = 16
+
+def hilbert_keys(lats, lngs):
+    """Position of each point along a Hilbert curve over the points' bounding box."""
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    side = 1 << _HILBERT_ORDER
+
+    def scale(values):
+        span = values.max() - values.min()
+        if span == 0:
+            return np.zeros(len(values), dtype=np.int64)
+        return ((values - values.min()) / span * (side - 1)).astype(np.int64)
+
+    x, y = scale(lngs), scale(lats)
+    keys = np.zeros(len(x), dtype=np.int64)
+    s = side // 2
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        keys += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve stays continuous
+        flip = ~ry
+        swap_x = np.where(flip & rx, s - 1 - x, x)
+        swap_y = np.where(flip & rx, s - 1 - y, y)
+        x = np.where(flip, swap_y, swap_x)
+        y = np.where(flip, swap_x, swap_y)
+        s //= 2
+    return keys
+
+def split_days(lats, lngs, stops_per_day=STOPS_PER_DAY):
+    """
+    Day-sized clusters as lists of indices. Cutting the Hilbert order into
+    equal runs keeps each day geographically compact in O(n log n), where
+    a clustering algorithm would be quadratic for large portfolios.
+    """
+    n = len(lats)
+    if n == 0:
+        return []
+    order = np.argsort(hilbert_keys(lats, lngs), kind='stable')
+    days = -(-n // stops_per_day)
+    # Even sizes rather than full days plus a short last one
+    return [chunk for chunk in np.array_split(order, days) if len(chunk)]
+
+def plan_manager(task):
+    """
+    Plans one manager: task is (manager, row_ids, lats, lngs, stops_per_day).
+    Each day starts from the portfolio centroid (the manager's home area)
+    and visits its cluster in optimized order. Returns (manager, rows) with
+    rows as (day, position, row_id, leg_km, start_lat, start_lng).
+    Top-level so process pools can pickle it.
+    """
+    manager, row_ids, lats, lngs, stops_per_day = task
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    rows = []
+    if len(lats) == 0:
+        return manager, rows
+    start = (float(lats.mean()), float(lngs.mean()))
+    for day, members in enumerate(split_days(lats, lngs, stops_per_day), start=1):
+        plan = routing.plan_route(start, lats[members], lngs[members], time_limit=DAY_TIME_LIMIT)
+        for position, (stop, leg) in enumerate(zip(plan.order, plan.leg_km), start=1):
+            rows.append((day, position, int(row_ids[members[stop]]), float(leg), start[0], start[1]))
+    return manager, rows
+
+def plan_all(tasks, workers=None, progress=None):
+    """
+    Runs plan_manager over `tasks`, across processes when the total work is
+    large enough. `progress(done, total)` is called per finished manager.
+    Yields (manager, rows) as managers finish.
+    """
+    tasks = list(tasks)
+    total_stops = sum(len(task[1]) for task in tasks)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) < 2 or total_stops < POOL_MIN_STOPS:
+        for done, task in enumerate(tasks, start=1):
+            result = plan_manager(task)
+            if progress:
+                progress(done, len(tasks))
+            yield result
+        return
+
+    # Largest portfolios first so one big manager does not finish last on its own
+    tasks.sort(key=lambda task: -len(task[1]))
+    # spawn: forking a process that runs Streamlit's threads is not safe
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=multiprocessing.get_context('spawn')) as pool:
+        for done, result in enumerate(pool.map(plan_manager, tasks, chunksize=1), start=1):
+            if progress:
+                progress(done, len(tasks))
+            yield result
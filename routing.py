@@ -0,0 +1,236 @@
+import time
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Road distance is approximated as great-circle distance times a typical urban detour factor
+ROAD_FACTOR = 1.3
+
+# Time-window construction: how strongly a closing window pulls a stop forward
+URGENCY_WEIGHT = 0.5
+URGENCY_HORIZON_MINUTES = 120
+
+def haversine_matrix(lat1, lng1, lat2=None, lng2=None):
+    """Pairwise great-circle distances in km between two sets of points (or one set with itself)."""
+    lat1 = np.radians(np.asarray(lat1, dtype=float))
+    lng1 = np.radians(np.asarray(lng1, dtype=float))
+    if lat2 is None:
+        lat2, lng2 = lat1, lng1
+    else:
+        lat2 = np.radians(np.asarray(lat2, dtype=float))
+        lng2 = np.radians(np.asarray(lng2, dtype=float))
+    dlat = lat2[None, :] - lat1[:, None]
+    dlng = lng2[None, :] - lng1[:, None]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1)[:, None] * np.cos(lat2)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def road_distance_matrix(lats, lngs):
+    return haversine_matrix(lats, lngs) * ROAD_FACTOR
+
+def path_legs_km(start, lats, lngs):
+    """Road-approximate km of each leg when visiting the stops in the given order from `start`."""
+    lats = np.radians(np.concatenate([[start[0]], np.asarray(lats, dtype=float)]))
+    lngs = np.radians(np.concatenate([[start[1]], np.asarray(lngs, dtype=float)]))
+    dlat = np.diff(lats)
+    dlng = np.diff(lngs)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lats[:-1]) * np.cos(lats[1:]) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))) * ROAD_FACTOR
+
+class RoutePlan:
+    """
+    order: indices into the input stops in visiting order
+    leg_km: road-approximate km from the previous stop (or the start) for each stop in `order`
+    arrival_minutes: arrival time per stop when time windows were given, else None
+    unrouted: indices that were left out (max_stops or infeasible time windows)
+    """
+
+    def __init__(self, order, leg_km, arrival_minutes, unrouted):
+        self.order = order
+        self.leg_km = leg_km
+        self.arrival_minutes = arrival_minutes
+        self.unrouted = unrouted
+
+    @property
+    def total_km(self):
+        return float(self.leg_km.sum())
+
+class _Problem:
+    # Node 0 is the start, 1..n are stops, n+1 is a free "end" node at zero distance from everything,
+    # which turns the open path into a tour for the 2-opt/Or-opt moves.
+
+    def __init__(self, start, lats, lngs, time_windows, service_minutes, speed_kmh, start_minute):
+        n = len(lats)
+        all_lats = np.concatenate([[start[0]], lats])
+        all_lngs = np.concatenate([[start[1]], lngs])
+        dist = np.zeros((n + 2, n + 2))
+        dist[:n + 1, :n + 1] = road_distance_matrix(all_lats, all_lngs)
+        self.dist = dist
+        self.n = n
+        self.end = n + 1
+        self.service_minutes = service_minutes
+        self.minutes_per_km = 60.0 / speed_kmh
+        self.start_minute = start_minute
+        if time_windows is not None:
+            windows = np.asarray(time_windows, dtype=float).reshape(n, 2)
+            self.earliest = np.concatenate([[start_minute], windows[:, 0], [-np.inf]])
+            self.latest = np.concatenate([[np.inf], windows[:, 1], [np.inf]])
+            self.earliest = np.nan_to_num(self.earliest, nan=-np.inf)
+            self.latest = np.nan_to_num(self.latest, nan=np.inf)
+        else:
+            self.earliest = None
+
+    @property
+    def timed(self):
+        return self.earliest is not None
+
+    def schedule(self, tour):
+        """Service start minute per tour position, or None if a window is missed."""
+        if not self.timed:
+            return None
+        t = self.start_minute
+        starts = np.empty(len(tour))
+        starts[0] = t
+        for pos in range(1, len(tour)):
+            prev, node = tour[pos - 1], tour[pos]
+            service = self.service_minutes if prev != 0 else 0
+            t = max(t + service + self.dist[prev, node] * self.minutes_per_km, self.earliest[node])
+            if t > self.latest[node]:
+                return None
+            starts[pos] = t
+        return starts
+
+    def feasible(self, tour):
+        return not self.timed or self.schedule(tour) is not None
+
+def _nearest_neighbor(problem, max_stops):
+    dist = problem.dist
+    visited = np.zeros(problem.n + 2, dtype=bool)
+    visited[0] = visited[problem.end] = True
+    tour = [0]
+    current, t = 0, problem.start_minute
+    limit = problem.n if max_stops is None else min(max_stops, problem.n)
+    while len(tour) - 1 < limit:
+        if problem.timed:
+            # Time-oriented NN: earliest feasible service start wins, nudged towards stops whose window closes soon
+            service = problem.service_minutes if current != 0 else 0
+            starts = np.maximum(t + service + dist[current] * problem.minutes_per_km, problem.earliest)
+            slack = problem.latest - starts
+            score = starts + URGENCY_WEIGHT * np.minimum(slack, URGENCY_HORIZON_MINUTES)
+            score[slack < 0] = np.inf
+        else:
+            score = dist[current].copy()
+        score[visited] = np.inf
+        nxt = int(np.argmin(score))
+        if not np.isfinite(score[nxt]):
+            break
+        if problem.timed:
+            t = starts[nxt]
+        visited[nxt] = True
+        tour.append(nxt)
+        current = nxt
+    tour.append(problem.end)
+    return np.array(tour)
+
+def _insert_unrouted(problem, tour, max_stops):
+    # Cheapest feasible insertion for stops the time-window NN skipped
+    dist = problem.dist
+    limit = problem.n if max_stops is None else min(max_stops, problem.n)
+    missing = np.setdiff1d(np.arange(1, problem.n + 1), tour)
+    for node in missing:
+        if len(tour) - 2 >= limit:
+            break
+        c, e = tour[:-1], tour[1:]
+        cost = dist[c, node] + dist[node, e] - dist[c, e]
+        for k in np.argsort(cost)[:5]:
+            candidate = np.concatenate([tour[:k + 1], [node], tour[k + 1:]])
+            if problem.feasible(candidate):
+                tour = candidate
+                break
+    return tour
+
+def _two_opt_pass(problem, tour, deadline):
+    dist = problem.dist
+    m = len(tour)
+    improved = False
+    for i in range(m - 3):
+        if time.perf_counter() > deadline:
+            break
+        a, b = tour[i], tour[i + 1]
+        c = tour[i + 2:m - 1]
+        e = tour[i + 3:m]
+        delta = dist[a, c] + dist[b, e] - dist[a, b] - dist[c, e]
+        for k in np.argsort(delta)[:3]:
+            if delta[k] >= -1e-9:
+                break
+            j = i + 2 + k
+            candidate = np.concatenate([tour[:i + 1], tour[i + 1:j + 1][::-1], tour[j + 1:]])
+            if problem.feasible(candidate):
+                tour = candidate
+                improved = True
+                break
+    return tour, improved
+
+def _or_opt_pass(problem, tour, deadline):
+    dist = problem.dist
+    improved = False
+    for seg_len in (1, 2, 3):
+        i = 1
+        while i + seg_len < len(tour):
+            if time.perf_counter() > deadline:
+                return tour, improved
+            p, s0, s1, nx = tour[i - 1], tour[i], tour[i + seg_len - 1], tour[i + seg_len]
+            removal_gain = dist[p, s0] + dist[s1, nx] - dist[p, nx]
+            rest = np.concatenate([tour[:i], tour[i + seg_len:]])
+            c, e = rest[:-1], rest[1:]
+            forward = dist[c, s0] + dist[s1, e] - dist[c, e]
+            backward = dist[c, s1] + dist[s0, e] - dist[c, e]
+            insert = np.minimum(forward, backward)
+            # Re-inserting where it came from is a no-op
+            insert[i - 1] = np.inf
+            k = int(np.argmin(insert))
+            if insert[k] - removal_gain < -1e-9:
+                segment = tour[i:i + seg_len]
+                if backward[k] < forward[k]:
+                    segment = segment[::-1]
+                candidate = np.concatenate([rest[:k + 1], segment, rest[k + 1:]])
+                if problem.feasible(candidate):
+                    tour = candidate
+                    improved = True
+                    continue
+            i += 1
+    return tour, improved
+
+def plan_route(start, lats, lngs, max_stops=None, time_windows=None, service_minutes=10,
+               speed_kmh=25, start_minute=0, time_limit=0.8):
+    """
+    Plans an open route from `start` (lat, lng) through the given stops.
+
+    Nearest-neighbour construction is improved with 2-opt and Or-opt moves
+    until no move helps or `time_limit` seconds pass. `time_windows` is an
+    optional (n, 2) array of earliest/latest arrival minutes (NaN = open);
+    stops that cannot be reached in their window, or beyond `max_stops`,
+    are returned in `unrouted`.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    if len(lats) == 0:
+        return RoutePlan(np.array([], dtype=int), np.array([]), None, np.array([], dtype=int))
+
+    deadline = time.perf_counter() + time_limit
+    problem = _Problem(start, lats, lngs, time_windows, service_minutes, speed_kmh, start_minute)
+    tour = _nearest_neighbor(problem, max_stops)
+    if problem.timed:
+        tour = _insert_unrouted(problem, tour, max_stops)
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        tour, improved_2opt = _two_opt_pass(problem, tour, deadline)
+        tour, improved_oropt = _or_opt_pass(problem, tour, deadline)
+        improved = improved_2opt or improved_oropt
+
+    path = tour[:-1]  # drop the free end node
+    leg_km = problem.dist[path[:-1], path[1:]]
+    arrival = problem.schedule(tour)
+    order = path[1:] - 1
+    unrouted = np.setdiff1d(np.arange(problem.n), order)
+    return RoutePlan(order, leg_km, None if arrival is None else arrival[1:-1], unrouted)
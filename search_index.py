@@ -0,0 +1,200 @@
+import re
+import math
+import unicodedata
+
+# Korean-aware text search over company names and addresses. Terms are compared as Hangul jamo
+# ("한결" -> "ㅎㅏㄴㄱㅕㄹ"), so a partly typed syllable or a one-letter typo still shares most
+# of its trigrams with the intended term. Pure Python; data_manager keeps the index current.
+
+CHOSEONG = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+JUNGSEONG = 'ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ'
+JONGSEONG = ['', 'ㄱ', 'ㄲ', 'ㄳ', 'ㄴ', 'ㄵ', 'ㄶ', 'ㄷ', 'ㄹ', 'ㄺ', 'ㄻ', 'ㄼ', 'ㄽ', 'ㄾ', 'ㄿ', 'ㅀ',
+             'ㅁ', 'ㅂ', 'ㅄ', 'ㅅ', 'ㅆ', 'ㅇ', 'ㅈ', 'ㅊ', 'ㅋ', 'ㅌ', 'ㅍ', 'ㅎ']
+_HANGUL_FIRST, _HANGUL_LAST = 0xAC00, 0xD7A3
+# NFKC turns typed jamo (ㅎ) into conjoining jamo (U+1112); map them back so they compare with decompose()
+_CONJOINING_JAMO = str.maketrans(
+    {0x1100 + i: ch for i, ch in enumerate(CHOSEONG)}
+    | {0x1161 + i: ch for i, ch in enumerate(JUNGSEONG)}
+    | {0x11A8 + i: ch for i, ch in enumerate(JONGSEONG[1:])}
+)
+
+# Legal forms are left out of names: "(주)한결" and "한결 주식회사" are the same customer
+_LEGAL_FORMS = re.compile(r'\(주\)|\(유\)|\(사\)|주식회사|유한회사|유한책임회사|사단법인')
+_NOT_WORD = re.compile(r'[^0-9a-z\-가-힣ㄱ-ㅣ]')
+
+GRAM = 3
+# Share of the query's trigrams a term must contain to count as a typo match
+MIN_OVERLAP = 0.6
+# Address words rank below company names with the same kind of match
+ADDRESS_WEIGHT = 0.9
+
+NAME, ADDRESS = 0, 1
+
+def normalize(text):
+    """Lower-case, width-folded text without legal forms, spaces or punctuation."""
+    if not isinstance(text, str):
+        return ''
+    text = unicodedata.normalize('NFKC', text).lower().translate(_CONJOINING_JAMO)
+    return _NOT_WORD.sub('', _LEGAL_FORMS.sub('', text))
+
+def decompose(text):
+    """Hangul syllables split into compatibility jamo; other characters are kept."""
+    out = []
+    for ch in text:
+        code = ord(ch)
+        if _HANGUL_FIRST <= code <= _HANGUL_LAST:
+            code -= _HANGUL_FIRST
+            out.append(CHOSEONG[code // 588] + JUNGSEONG[code % 588 // 28] + JONGSEONG[code % 28])
+        else:
+            out.append(ch)
+    return ''.join(out)
+
+def initials(text):
+    """Initial consonant of each syllable (초성), e.g. 한결 -> ㅎㄱ."""
+    return ''.join(
+        CHOSEONG[(ord(ch) - _HANGUL_FIRST) // 588] if _HANGUL_FIRST <= ord(ch) <= _HANGUL_LAST else ch
+        for ch in text
+    )
+
+def _grams(jamo):
+    return {jamo[i:i + GRAM] for i in range(len(jamo) - GRAM + 1)}
+
+def _address_words(address):
+    return {word for word in (normalize(w) for w in address.split()) if word} if isinstance(address, str) else set()
+
+class _Query:
+    def __init__(self, term):
+        self.jamo = decompose(term)
+        self.grams = _grams(self.jamo)
+        # Only consonants typed: match on syllable initials
+        self.initials_only = all(ch in CHOSEONG for ch in term)
+
+    def score(self, term_jamo, term_initials):
+        if self.initials_only:
+            if term_initials.startswith(self.jamo):
+                return 0.75
+            return 0.6 if self.jamo in term_initials else 0.0
+        if term_jamo == self.jamo:
+            return 1.0
+        if term_jamo.startswith(self.jamo):
+            return 0.9
+        if self.jamo in term_jamo:
+            return 0.8
+        if self.grams:
+            overlap = sum(gram in term_jamo for gram in self.grams) / len(self.grams)
+            if overlap >= MIN_OVERLAP:
+                return 0.7 * overlap
+        return 0.0
+
+class SearchIndex:
+    """
+    Incremental index over Company Name (matched as a whole) and Address
+    (matched word by word). Distinct terms are indexed once by jamo
+    trigrams, with the set of row ids using each term, so memory and search
+    time follow the vocabulary rather than the row count.
+    """
+
+    def __init__(self):
+        self._term_ids = {}   # (kind, term) -> term id
+        self._terms = []      # term id -> (kind, jamo, initials)
+        self._rows = []       # term id -> set of row ids
+        self._postings = {}   # trigram -> list of term ids
+
+    @classmethod
+    def build(cls, df):
+        """Index over a frame with Company Name and Address, indexed by row id."""
+        index = cls()
+        # Raw value -> term id (None = nothing to index); names and address words repeat a lot
+        name_ids, word_ids = {}, {}
+        for row_id, name, address in zip(df.index.tolist(), df['Company Name'].tolist(), df['Address'].tolist()):
+            if name not in name_ids:
+                term = normalize(name)
+                name_ids[name] = index._term_id(NAME, term) if term else None
+            if name_ids[name] is not None:
+                index._rows[name_ids[name]].add(row_id)
+            for word in address.split() if isinstance(address, str) else ():
+                if word not in word_ids:
+                    term = normalize(word)
+                    word_ids[word] = index._term_id(ADDRESS, term) if term else None
+                if word_ids[word] is not None:
+                    index._rows[word_ids[word]].add(row_id)
+        return index
+
+    def _term_id(self, kind, term):
+        key = (kind, term)
+        term_id = self._term_ids.get(key)
+        if term_id is None:
+            term_id = self._term_ids[key] = len(self._terms)
+            jamo = decompose(term)
+            self._terms.append((kind, jamo, initials(term)))
+            self._rows.append(set())
+            for gram in _grams(jamo):
+                self._postings.setdefault(gram, []).append(term_id)
+        return term_id
+
+    def _keys(self, name, address):
+        keys = [(ADDRESS, word) for word in _address_words(address)]
+        name = normalize(name)
+        if name:
+            keys.append((NAME, name))
+        return keys
+
+    def add(self, row_id, name, address):
+        for kind, term in self._keys(name, address):
+            self._rows[self._term_id(kind, term)].add(row_id)
+
+    def discard(self, row_id, name, address):
+        # Terms stay in the vocabulary; one without rows simply never matches
+        for key in self._keys(name, address):
+            term_id = self._term_ids.get(key)
+            if term_id is not None:
+                self._rows[term_id].discard(row_id)
+
+    def _match(self, kind, term):
+        query = _Query(term)
+        if query.initials_only or not query.grams:
+            # Too short for trigrams: scan the vocabulary, which is far smaller than the table
+            candidates = range(len(self._terms))
+        else:
+            # A term with enough overlap contains at least one of the rarest (grams - needed + 1) trigrams
+            needed = max(1, math.ceil(len(query.grams) * MIN_OVERLAP))
+            rarest = sorted(query.grams, key=lambda gram: len(self._postings.get(gram, ())))
+            candidates = set().union(*(self._postings.get(gram, ()) for gram in rarest[:len(query.grams) - needed + 1]))
+        found = []
+        for term_id in candidates:
+            term_kind, term_jamo, term_initials = self._terms[term_id]
+            if term_kind != kind or not self._rows[term_id]:
+                continue
+            score = query.score(term_jamo, term_initials)
+            if score:
+                found.append((score, self._rows[term_id]))
+        return found
+
+    def search(self, query):
+        """
+        Matches as [(score, row_ids)], best first. Scores are in (0, 1]: whole
+        term, prefix, substring, then trigram overlap for typos. A row can be
+        in several groups; its first one counts. The row-id sets are the
+        index's own and must not be modified.
+        """
+        groups = self._match(NAME, normalize(query)) if normalize(query) else []
+        words = [word for word in (normalize(w) for w in query.split()) if word]
+        if len(words) == 1:
+            groups += [(score * ADDRESS_WEIGHT, rows) for score, rows in self._match(ADDRESS, words[0])]
+        elif words:
+            # Every word has to match some word of the address; a row scores its weakest word
+            best = None
+            for word in words:
+                scores = {}
+                for score, rows in sorted(self._match(ADDRESS, word), key=lambda group: -group[0]):
+                    for row_id in rows if best is None else rows & best.keys():
+                        scores.setdefault(row_id, score)
+                best = scores if best is None else {row_id: min(best[row_id], score) for row_id, score in scores.items()}
+                if not best:
+                    break
+            by_score = {}
+            for row_id, score in best.items():
+                by_score.setdefault(score * ADDRESS_WEIGHT, set()).add(row_id)
+            groups += list(by_score.items())
+        groups.sort(key=lambda group: -group[0])
+        return groups
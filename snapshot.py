@@ -0,0 +1,57 @@
+import os
+import json
+import file_locks
+
+# Typed columnar copy of the contracts table. SQLite stays the source of truth;
+# the snapshot only makes cold loads cheap, and is ignored when it is stale.
+SNAPSHOT_FILE = "contracts.parquet"
+
+_METADATA_KEY = b'field_sales'
+
+def write_snapshot(df, generation, seq, path=SNAPSHOT_FILE):
+    """
+    Writes df (indexed by row id) with the store version it reflects,
+    atomically and under a cross-process lock. A snapshot of an older version
+    never replaces a newer one written meanwhile by another process.
+    Returns whether the file was written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    metadata = dict(table.schema.metadata or {})
+    metadata[_METADATA_KEY] = json.dumps({'generation': generation, 'seq': seq}).encode()
+    table = table.replace_schema_metadata(metadata)
+    with file_locks.locked(path):
+        current = read_version(path)
+        if current and tuple(current) > (generation, seq):
+            return False
+        file_locks.atomic_write(path, lambda tmp_path: pq.write_table(table, tmp_path))
+    return True
+
+def read_version(path=SNAPSHOT_FILE):
+    """(generation, seq) recorded in the snapshot, or None if there is no readable snapshot."""
+    if not os.path.exists(path):
+        return None
+    import pyarrow.parquet as pq
+
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+        info = json.loads(metadata[_METADATA_KEY])
+    except Exception as e:
+        print(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+    return info['generation'], info['seq']
+
+def read_snapshot(columns=None, path=SNAPSHOT_FILE):
+    """
+    Loads only `columns` (None = all) from the memory-mapped file and returns
+    (df, generation, seq), with the version read from the same file.
+    Dictionary-encoded columns come back as pandas categoricals.
+    """
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, columns=columns, memory_map=True, use_pandas_metadata=True)
+    info = json.loads(table.schema.metadata[_METADATA_KEY])
+    # Zero-copy conversion leaves views of immutable Arrow buffers; the caller patches deltas in place
+    return table.to_pandas().copy(), info['generation'], info['seq']
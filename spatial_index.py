@@ -0,0 +1,66 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+def _to_xyz(lats, lngs):
+    # Points on the unit sphere: chord length is monotonic in great-circle distance, so KD-tree queries stay exact
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lng = np.radians(np.asarray(lngs, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)])
+
+def _km_to_chord(km):
+    return 2 * np.sin(np.asarray(km, dtype=float) / (2 * EARTH_RADIUS_KM))
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord, dtype=float) / 2, 0.0, 1.0))
+
+class SpatialIndex:
+    """
+    Read-only index over the Latitude/Longitude of a contracts frame.
+    Queries return store row ids (the frame index), rows without coordinates are skipped.
+    """
+
+    def __init__(self, df):
+        # scipy costs a few hundred ms to import; only processes that actually query pay for it
+        from scipy.spatial import cKDTree
+
+        valid = df['Latitude'].notna() & df['Longitude'].notna()
+        self.row_ids = df.index[valid].to_numpy()
+        self.lats = df.loc[valid, 'Latitude'].to_numpy(dtype=float)
+        self.lngs = df.loc[valid, 'Longitude'].to_numpy(dtype=float)
+        self._tree = cKDTree(_to_xyz(self.lats, self.lngs)) if len(self.row_ids) else None
+        # Latitude-sorted view for viewport (bounding box) queries
+        self._lat_order = np.argsort(self.lats, kind='stable')
+        self._sorted_lats = self.lats[self._lat_order]
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def nearest(self, lat, lng, k=10):
+        """(row_ids, km) of the k nearest points, closest first."""
+        if self._tree is None:
+            return self.row_ids[:0], np.array([])
+        k = min(k, len(self.row_ids))
+        chord, idx = self._tree.query(_to_xyz([lat], [lng])[0], k=k)
+        idx = np.atleast_1d(idx)
+        return self.row_ids[idx], _chord_to_km(np.atleast_1d(chord))
+
+    def within(self, lat, lng, radius_km):
+        """Row ids within radius_km of (lat, lng), unordered."""
+        if self._tree is None:
+            return self.row_ids[:0]
+        idx = self._tree.query_ball_point(_to_xyz([lat], [lng])[0], r=float(_km_to_chord(radius_km)))
+        return self.row_ids[np.asarray(idx, dtype=int)]
+
+    def in_bounds(self, south, west, north, east):
+        """Row ids inside a map viewport; west > east is treated as crossing the antimeridian."""
+        lo = np.searchsorted(self._sorted_lats, south, side='left')
+        hi = np.searchsorted(self._sorted_lats, north, side='right')
+        candidates = self._lat_order[lo:hi]
+        lngs = self.lngs[candidates]
+        if west <= east:
+            mask = (lngs >= west) & (lngs <= east)
+        else:
+            mask = (lngs >= west) | (lngs <= east)
+        return self.row_ids[candidates[mask]]
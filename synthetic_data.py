@@ -0,0 +1,185 @@
+import time
+import zlib
+import argparse
+import numpy as np
+import pandas as pd
+from geocoding import GeocodingProvider, normalize_address
+
+# Synthetic contracts in the layout of the real Excel export, for load testing and benchmarks.
+# Nothing here touches the store; write the frame out and upload it, or pass it to apply_custom_mapping.
+
+# Source column per application field, as in the Excel export handled by init_db
+RAW_MAPPING = {
+    'Branch': '지사',
+    'Contract No': '계약번호',
+    'Company Name': '상호',
+    'Monthly Fee': ' 월정료(VAT미포함) ',
+    'Manager': '구역담당영업사원',
+    'Contact': '휴대폰',
+    'Address': '설치주소',
+    'Stop Reason': '정지사유',
+    'Stop Start Date': '정지시작일자',
+    'Stop Days': '당월말_정지일수',
+}
+
+# (city, district, branch, centre lat, centre lng, dongs)
+REGIONS = [
+    ('서울', '종로구', '강북', 37.5730, 126.9794, ['청운동', '사직동', '혜화동', '창신동', '숭인동']),
+    ('서울', '중구', '강북', 37.5638, 126.9976, ['명동', '필동', '신당동', '황학동', '회현동']),
+    ('서울', '동대문구', '강북', 37.5744, 127.0396, ['이문동', '회기동', '휘경동', '전농동', '장안동']),
+    ('서울', '성북구', '강북', 37.5894, 127.0167, ['성북동', '돈암동', '길음동', '정릉동', '석관동']),
+    ('서울', '은평구', '강북', 37.6027, 126.9291, ['대조동', '불광동', '응암동', '역촌동', '녹번동']),
+    ('서울', '마포구', '강서', 37.5663, 126.9019, ['합정동', '망원동', '연남동', '공덕동', '상암동']),
+    ('서울', '강서구', '강서', 37.5509, 126.8495, ['화곡동', '등촌동', '염창동', '가양동', '방화동']),
+    ('서울', '영등포구', '강서', 37.5264, 126.8962, ['여의도동', '당산동', '문래동', '신길동', '대림동']),
+    ('서울', '강남구', '강남', 37.5172, 127.0473, ['역삼동', '삼성동', '대치동', '논현동', '압구정동']),
+    ('서울', '서초구', '강남', 37.4837, 127.0324, ['서초동', '반포동', '방배동', '양재동', '잠원동']),
+    ('서울', '송파구', '강남', 37.5145, 127.1059, ['잠실동', '문정동', '가락동', '석촌동', '방이동']),
+    ('서울', '관악구', '강남', 37.4784, 126.9516, ['봉천동', '신림동', '남현동']),
+    ('경기', '고양시 일산동구', '고양', 37.6584, 126.7750, ['장항동', '마두동', '백석동', '풍동']),
+    ('경기', '고양시 덕양구', '고양', 37.6375, 126.8320, ['화정동', '행신동', '토당동', '성사동']),
+    ('경기', '성남시 분당구', '분당', 37.3826, 127.1190, ['정자동', '서현동', '야탑동', '수내동', '판교동']),
+    ('경기', '수원시 팔달구', '수원', 37.2826, 127.0199, ['인계동', '매교동', '우만동', '화서동']),
+    ('강원', '강릉시', '강릉', 37.7519, 128.8761, ['교동', '포남동', '주문진읍', '옥천동']),
+]
+
+COMPANY_PREFIXES = ['', '', '(주)', '주식회사 ', '(유)']
+COMPANY_WORDS = ['한결', '유화', '대성', '미래', '푸른', '동방', '새솔', '하나', '우리', '청솔', '신우', '태평', '온누리', '한빛', '제일']
+COMPANY_SUFFIXES = ['이엔씨', '상사', '식당', '카페', '약국', '의원', '마트', '테크', '물산', '건설', '치과', '부동산']
+SURNAMES = ['김', '이', '박', '최', '정', '강', '조', '윤', '장', '임']
+GIVEN_SYLLABLES = ['창', '승', '민', '서', '지', '현', '우', '영', '수', '곤', '원', '희', '준', '호', '성', '진', '경', '은',
+                   '혜', '재', '동', '상', '태', '정', '하', '윤', '규', '석', '훈', '미']
+STOP_REASONS = ['정상', '고객요청', '미납', '휴업', '이전']
+STOP_REASON_WEIGHTS = [0.7, 0.12, 0.1, 0.05, 0.03]
+
+def _dong_table():
+    # One row per dong with a stable point near its district centre
+    rows = []
+    for city, district, branch, lat, lng, dongs in REGIONS:
+        for i, dong in enumerate(dongs):
+            angle = 2 * np.pi * i / len(dongs)
+            rows.append((city, district, branch, dong, lat + 0.012 * np.sin(angle), lng + 0.015 * np.cos(angle)))
+    return pd.DataFrame(rows, columns=['city', 'district', 'branch', 'dong', 'lat', 'lng'])
+
+def _manager_names(count, rng):
+    pool = np.asarray([s + a + b for s in SURNAMES for a in GIVEN_SYLLABLES for b in GIVEN_SYLLABLES], dtype=object)
+    names = rng.choice(pool, size=min(count, len(pool)), replace=False).tolist()
+    # Very large runs: homonyms are told apart the way the CRM does, with a number
+    names += [f"{pool[i % len(pool)]}{i // len(pool) + 1}" for i in range(len(pool), count)]
+    return names
+
+def generate_raw(rows, seed=0, managers=None, duplicate_address_rate=0.15, unassigned_rate=0.1,
+                 masked_address_rate=0.3, duplicate_contract_rate=0.001):
+    """
+    `rows` synthetic contracts with the Excel export's columns (see RAW_MAPPING).
+
+    Managers follow a Zipf-like distribution (a few large portfolios, many
+    small ones) plus an unassigned share; a fraction of contracts share an
+    address with another contract (same building), a few share a contract
+    number, and house numbers are sometimes masked as in the real export.
+    The same seed always gives the same frame.
+    """
+    rng = np.random.default_rng(seed)
+    dongs = _dong_table()
+    managers = managers or max(5, rows // 400)
+
+    # Addresses: dong + lot number; duplicates point back at an earlier row's address
+    dong_idx = rng.integers(0, len(dongs), size=rows)
+    picked = dongs.iloc[dong_idx].reset_index(drop=True)
+    lot = pd.Series(rng.integers(1, 900, size=rows)).astype(str) + '-' + pd.Series(rng.integers(1, 40, size=rows)).astype(str)
+    lot = lot.where(rng.random(rows) >= masked_address_rate, '********')
+    address = picked['city'] + ' ' + picked['district'] + ' ' + picked['dong'] + ' ' + lot
+    duplicate = rng.random(rows) < duplicate_address_rate
+    duplicate[0] = False
+    source = (rng.random(rows) * np.arange(rows)).astype(int)
+    address = address.where(~duplicate, address.to_numpy()[source])
+    branch = picked['branch'].where(~duplicate, picked['branch'].to_numpy()[source])
+
+    names = _manager_names(managers, rng)
+    weights = 1.0 / np.arange(1, managers + 1) ** 1.1
+    manager = pd.Series(np.asarray(names, dtype=object)[rng.choice(managers, size=rows, p=weights / weights.sum())])
+    manager = manager.where(rng.random(rows) >= unassigned_rate, '미배정')
+
+    contract_no = pd.Series(50_000_000 + rng.choice(10_000_000, size=rows, replace=False)).astype(str)
+    repeated = rng.random(rows) < duplicate_contract_rate
+    repeated[0] = False
+    contract_no = contract_no.where(~repeated, contract_no.to_numpy()[(rng.random(rows) * np.arange(rows)).astype(int)])
+
+    company = (
+        pd.Series(rng.choice(COMPANY_PREFIXES, size=rows))
+        + pd.Series(rng.choice(COMPANY_WORDS, size=rows))
+        + pd.Series(rng.choice(COMPANY_SUFFIXES, size=rows))
+    )
+    fee = (np.round(rng.lognormal(np.log(50_000), 0.5, size=rows), -3)).astype(int)
+    contact = '010-' + pd.Series(rng.integers(1000, 10000, size=rows)).astype(str) + '-' + pd.Series(rng.integers(1000, 10000, size=rows)).astype(str)
+    stop_reason = pd.Series(rng.choice(STOP_REASONS, size=rows, p=STOP_REASON_WEIGHTS))
+    stopped = stop_reason != '정상'
+    start_date = pd.Timestamp('2026-01-01') + pd.to_timedelta(rng.integers(0, 60, size=rows), unit='D')
+
+    return pd.DataFrame({
+        RAW_MAPPING['Branch']: branch,
+        RAW_MAPPING['Contract No']: contract_no,
+        RAW_MAPPING['Company Name']: company,
+        RAW_MAPPING['Monthly Fee']: fee,
+        RAW_MAPPING['Manager']: manager,
+        RAW_MAPPING['Contact']: contact,
+        RAW_MAPPING['Address']: address,
+        RAW_MAPPING['Stop Reason']: stop_reason,
+        RAW_MAPPING['Stop Start Date']: pd.Series(start_date.strftime('%Y-%m-%d')).where(stopped, None),
+        RAW_MAPPING['Stop Days']: np.where(stopped, rng.integers(1, 32, size=rows), 0),
+    })
+
+def gazetteer():
+    """Dong-level Address/Latitude/Longitude frame; as a CSV it works with geocoding.GazetteerProvider."""
+    dongs = _dong_table()
+    return pd.DataFrame({
+        'Address': dongs['city'] + ' ' + dongs['district'] + ' ' + dongs['dong'],
+        'Latitude': dongs['lat'],
+        'Longitude': dongs['lng'],
+    })
+
+class SyntheticGeocoder(GeocodingProvider):
+    """
+    Offline stand-in for Nominatim over the synthetic addresses. Points are
+    spread around the dong centre by a hash of the full address, and
+    `latency` seconds per call simulate a remote service.
+    """
+    name = "synthetic"
+
+    def __init__(self, latency=0.0, max_workers=8):
+        self._coords = {normalize_address(a): (lat, lng) for a, lat, lng in gazetteer().itertuples(index=False)}
+        self.latency = latency
+        self.max_workers = max_workers
+
+    def geocode(self, address):
+        if self.latency:
+            time.sleep(self.latency)
+        tokens = address.split(' ')
+        while tokens:
+            coords = self._coords.get(' '.join(tokens))
+            if coords:
+                # crc32 rather than hash(): str hashes are salted per process, and runs must be comparable
+                digest = zlib.crc32(address.encode())
+                return (coords[0] + 0.006 * ((digest % 1000) / 1000 - 0.5), coords[1] + 0.008 * ((digest // 1000 % 1000) / 1000 - 0.5))
+            tokens.pop()
+        return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic contracts file for upload/load testing.")
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='synthetic_contracts.csv', help=".csv, .parquet or .xlsx")
+    parser.add_argument('--gazetteer', help="also write a GEOCODER_GAZETTEER csv here")
+    args = parser.parse_args()
+
+    df = generate_raw(args.rows, seed=args.seed)
+    if args.out.endswith('.parquet'):
+        df.to_parquet(args.out, index=False)
+    elif args.out.endswith('.xlsx'):
+        df.to_excel(args.out, index=False)
+    else:
+        df.to_csv(args.out, index=False)
+    print(f"Wrote {len(df):,} rows to {args.out}")
+    if args.gazetteer:
+        gazetteer().to_csv(args.gazetteer, index=False)
+        print(f"Wrote gazetteer to {args.gazetteer}")
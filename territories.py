@@ -0,0 +1,225 @@
+import numpy as np
+
+# Territory assignment: splits contracts into compact areas of balanced workload, one per manager.
+# Pure computation on arrays; data_manager reads the contracts and writes the result
+# (see assign_unassigned there).
+
+# Centres are fitted on a sample of at least this many contracts, and this many per territory;
+# only the final assignment sees every contract
+SAMPLE_SIZE = 20_000
+SAMPLE_PER_TERRITORY = 500
+# k-means rounds (centre updates), and price rounds (load balancing) per centre update; prices carry
+# over between rounds, so each needs only a few
+KMEANS_ROUNDS = 12
+BALANCE_ROUNDS = 10
+FINAL_BALANCE_ROUNDS = 20
+# Allowed deviation of a territory's load from its target, as a share of the target
+TOLERANCE = 0.05
+# Centres that moved less than this (km) count as converged
+CONVERGED_KM = 0.01
+
+_KM_PER_DEG_LAT = 111.32
+
+def to_km(lats, lngs):
+    """Local planar coordinates in km (equirectangular around the points' centre); fine at city scale."""
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    lat0 = np.radians(lats.mean()) if len(lats) else 0.0
+    return np.column_stack([lngs * _KM_PER_DEG_LAT * np.cos(lat0), lats * _KM_PER_DEG_LAT])
+
+def workloads(fees, fee_weight=0.5):
+    """
+    Per-contract load, summing to 1: a blend of an equal share per contract
+    and the contract's share of the total Monthly Fee.
+    """
+    fees = np.nan_to_num(np.asarray(fees, dtype=float), nan=0.0).clip(min=0)
+    count_share = np.full(len(fees), 1.0 / max(len(fees), 1))
+    if fees.sum() <= 0:
+        return count_share
+    return (1 - fee_weight) * count_share + fee_weight * fees / fees.sum()
+
+def _sq_dist(points, centers):
+    # (n, k) squared distances without materializing an (n, k, 2) array
+    return (
+        (points ** 2).sum(axis=1)[:, None]
+        - 2 * points @ centers.T
+        + (centers ** 2).sum(axis=1)[None, :]
+    ).clip(min=0)
+
+def _bisect_centers(points, loads, k):
+    """
+    Centroids of k cells of equal load, cut by recursive bisection across
+    each cell's wider side: an evenly loaded start for k-means, where
+    farthest-point seeding would put centres on outliers.
+    """
+    centers = []
+    cells = [(np.arange(len(points)), k)]
+    while cells:
+        idx, parts = cells.pop()
+        if parts == 1 or len(idx) <= 1:
+            centers += [points[idx].mean(axis=0) if len(idx) else points.mean(axis=0)] * parts
+            continue
+        axis = np.ptp(points[idx], axis=0).argmax()
+        order = idx[np.argsort(points[idx, axis], kind='stable')]
+        left = parts // 2
+        cut = np.searchsorted(np.cumsum(loads[order]), loads[idx].sum() * left / parts)
+        cells += [(order[cut:], parts - left), (order[:cut], left)]
+    return np.array(centers)
+
+def _initial_centers(points, loads, centers):
+    # Given centres stay; the others are the bisection centroids farthest from every centre chosen so far
+    centers = centers.copy()
+    candidates = _bisect_centers(points, loads, len(centers))
+    known = ~np.isnan(centers).any(axis=1)
+    if known.all():
+        return centers
+    if not known.any():
+        return candidates
+    nearest = _sq_dist(candidates, centers[known]).min(axis=1)
+    for j in np.flatnonzero(~known):
+        pick = np.argmax(nearest)
+        centers[j] = candidates[pick]
+        nearest = np.minimum(nearest, _sq_dist(candidates, candidates[pick:pick + 1])[:, 0])
+    return centers
+
+def _thresholds(groups, values, loads, amounts):
+    # Per group j: the smallest value at which the group's points, taken in value order, carry amounts[j] of load
+    k = len(amounts)
+    wanted = np.flatnonzero(amounts[groups] > 0)
+    order = wanted[np.lexsort((values[wanted], groups[wanted]))]
+    sorted_groups = groups[order]
+    cumulative = np.cumsum(loads[order])
+    starts = np.searchsorted(sorted_groups, np.arange(k))
+    ends = np.searchsorted(sorted_groups, np.arange(k), side='right')
+    before = np.concatenate([[0.0], cumulative])[starts]
+    out = np.zeros(k)
+    for j in np.flatnonzero((amounts > 0) & (ends > starts)):
+        position = np.searchsorted(cumulative[starts[j]:ends[j]] - before[j], amounts[j])
+        out[j] = values[order[starts[j] + min(position, ends[j] - starts[j] - 1)]]
+    return out
+
+def _balanced_labels(dist, loads, targets, prices, tolerance, rounds):
+    """
+    Assigns each point to argmin(dist + price), adjusting prices for up to
+    `rounds` rounds until every territory is within tolerance of its target.
+    An overloaded territory raises its price just enough to push its surplus
+    to the points' second choice; an underloaded one lowers it by half of
+    what would draw its deficit from points that have it as second choice.
+    `prices` is updated in place so the next call starts warm.
+    """
+    n, k = dist.shape
+    rows = np.arange(n)
+    active = np.isfinite(prices)
+    for _ in range(rounds):
+        if k == 1:
+            return np.zeros(n, dtype=int)
+        cost = dist + prices
+        labels = cost.argmin(axis=1)
+        best = cost[rows, labels]
+        cost[rows, labels] = np.inf
+        runner_up = cost.argmin(axis=1)
+        cluster_loads = np.bincount(labels, weights=loads, minlength=k)
+        excess = cluster_loads / targets - 1
+        if np.abs(excess[active]).max() <= tolerance:
+            break
+        gap = cost[rows, runner_up] - best
+        surplus = np.where(excess > tolerance / 2, cluster_loads - targets, 0)
+        deficit = np.where(active & (excess < -tolerance / 2), targets - cluster_loads, 0)
+        prices += _thresholds(labels, gap, loads, surplus) - _thresholds(runner_up, gap, loads, deficit) / 2
+    return labels
+
+def _repair(dist, loads, targets, labels, tolerance):
+    """
+    Last resort after pricing: moves points out of territories still over
+    tolerance into territories below target, cheapest extra distance first,
+    without filling any receiver past its target.
+    """
+    labels = labels.copy()
+    k = len(targets)
+    cluster_loads = np.bincount(labels, weights=loads, minlength=k)
+    for j in np.argsort(targets - cluster_loads):
+        surplus = cluster_loads[j] - targets[j]
+        under = np.flatnonzero(cluster_loads < targets)
+        if surplus <= targets[j] * tolerance or not len(under):
+            continue
+        members = np.flatnonzero(labels == j)
+        extra = dist[np.ix_(members, under)] - dist[members, j][:, None]
+        room = targets[under] - cluster_loads[under]
+        moved = np.zeros(len(members), dtype=bool)
+        for pair in np.argsort(extra, axis=None, kind='stable'):
+            member, receiver = divmod(int(pair), len(under))
+            load = loads[members[member]]
+            if moved[member] or room[receiver] < load:
+                continue
+            moved[member] = True
+            labels[members[member]] = under[receiver]
+            room[receiver] -= load
+            surplus -= load
+            if surplus <= 0:
+                break
+        cluster_loads = np.bincount(labels, weights=loads, minlength=k)
+    return labels
+
+def spread_km(lats, lngs, labels, k):
+    """Mean distance (km) from each territory's contracts to their centre; NaN for an empty territory."""
+    points = to_km(lats, lngs)
+    counts = np.bincount(labels, minlength=k).astype(float)
+    counts[counts == 0] = np.nan
+    centers = np.column_stack([np.bincount(labels, weights=points[:, i], minlength=k) / counts for i in (0, 1)])
+    distances = np.sqrt(((points - centers[labels]) ** 2).sum(axis=1))
+    return np.bincount(labels, weights=distances, minlength=k) / counts
+
+def balanced_kmeans(lats, lngs, loads, targets, centers=None, tolerance=TOLERANCE):
+    """
+    Labels 0..k-1 for each point so that territory j carries about
+    targets[j] of the total load (targets are normalized) and territories are
+    compact. `centers` is an optional (k, 2) lat/lng array of starting
+    centres, e.g. each manager's current area; NaN rows are seeded from the
+    points. Returns (labels, centers as lat/lng).
+    """
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    loads = np.asarray(loads, dtype=float)
+    targets = np.asarray(targets, dtype=float)
+    targets = targets / targets.sum() * loads.sum()
+    k = len(targets)
+    n = len(lats)
+    if n == 0:
+        return np.zeros(0, dtype=int), np.full((k, 2), np.nan)
+
+    lat0 = np.radians(lats.mean())
+    points = to_km(lats, lngs)
+    start = np.full((k, 2), np.nan) if centers is None else np.asarray(centers, dtype=float)
+    start_km = np.column_stack([start[:, 1] * _KM_PER_DEG_LAT * np.cos(lat0), start[:, 0] * _KM_PER_DEG_LAT])
+
+    # Fixed seed: the same data gives the same territories (a preview matches what is applied)
+    sample = np.arange(n)
+    sample_size = max(SAMPLE_SIZE, SAMPLE_PER_TERRITORY * k)
+    if n > sample_size:
+        sample = np.sort(np.random.default_rng(0).choice(n, sample_size, replace=False))
+    sample_points = points[sample]
+    sample_loads = loads[sample] * loads.sum() / loads[sample].sum()
+    center_km = _initial_centers(sample_points, sample_loads, start_km)
+
+    # Territories with no capacity never win a point
+    active = targets > 0
+    prices = np.where(active, 0.0, np.inf)
+    safe_targets = np.where(active, targets, 1.0)
+    for _ in range(KMEANS_ROUNDS):
+        dist = _sq_dist(sample_points, center_km)
+        labels = _balanced_labels(dist, sample_loads, safe_targets, prices, tolerance, BALANCE_ROUNDS)
+        counts = np.bincount(labels, minlength=k)
+        filled = counts > 0
+        moved = center_km.copy()
+        for axis in (0, 1):
+            moved[filled, axis] = np.bincount(labels, weights=sample_points[:, axis], minlength=k)[filled] / counts[filled]
+        shift = np.sqrt(((moved - center_km) ** 2).sum(axis=1)).max()
+        center_km = moved
+        if shift < CONVERGED_KM:
+            break
+
+    dist = _sq_dist(points, center_km)
+    labels = _balanced_labels(dist, loads, safe_targets, prices, tolerance, FINAL_BALANCE_ROUNDS)
+    labels = _repair(dist, loads, targets, labels, tolerance)
+    centers_out = np.column_stack([center_km[:, 1] / _KM_PER_DEG_LAT, center_km[:, 0] / (_KM_PER_DEG_LAT * np.cos(lat0))])
+    return labels, centers_out
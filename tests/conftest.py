@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_manager
+import synthetic_data
+
+STORE_ROWS = 600
+
+def _reset_store_state():
+    # Module-level caches belong to the previous test's directory (as in benchmark.py)
+    data_manager._dataset = data_manager.VersionedDataset()
+    data_manager._spatial_indexes.clear()
+    data_manager._schema_ready = False
+
+@pytest.fixture
+def raw():
+    """Synthetic source file in the Excel export's layout (see synthetic_data.RAW_MAPPING)."""
+    return synthetic_data.generate_raw(STORE_ROWS, seed=0)
+
+@pytest.fixture
+def store(tmp_path, monkeypatch, raw):
+    """data_manager on a fresh store in tmp_path, loaded with `raw`."""
+    monkeypatch.chdir(tmp_path)
+    # Compaction only where a test asks for it; a queued compaction job would race the assertions
+    monkeypatch.setattr(data_manager, 'COMPACT_THRESHOLD', 10 ** 9)
+    _reset_store_state()
+    data_manager.init_db()
+    data_manager.apply_custom_mapping(raw, synthetic_data.RAW_MAPPING)
+    yield data_manager
+    _reset_store_state()
+
+def fresh_state(dm):
+    """Comparable view of what readers see, from a dataset reloaded from disk."""
+    warm = dm._dataset
+    dm._dataset = dm.VersionedDataset()
+    try:
+        return state(dm)
+    finally:
+        dm._dataset = warm
+
+def state(dm, queries=('상사', '역삼', 'ㅎㄱ')):
+    """Frame, partitions, KPI aggregates and search results of the current dataset."""
+    frame = dm.get_data(include_removed=True)
+    frame = frame.astype({col: object for col in dm.CATEGORY_COLUMNS})
+    partitions = {
+        field: {
+            value: sorted(dm.get_data({field: value}, include_removed=True).index)
+            for value in dm.get_partition_values(field, include_removed=True)
+        }
+        for field in ('Manager', 'Branch', 'Status')
+    }
+    aggregates = {key: (count, round(fee, 6)) for key, (count, fee) in dm._dataset.aggregates().items()}
+    search = {query: dm._dataset.search(query) for query in queries}
+    return frame, partitions, aggregates, search
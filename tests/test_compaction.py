@@ -0,0 +1,56 @@
+import synthetic_data
+from conftest import fresh_state, state
+
+def _write_statuses(dm, row_ids, count):
+    for i in range(count):
+        dm.update_rows([(row_ids[i % len(row_ids)], 'Status', ['진행중', '완료', '미확인'][i % 3])])
+
+def test_changes_since_across_compaction(store):
+    row_ids = [int(i) for i in store.get_data().index[:12]]
+    start = store.get_data_version()
+    _write_statuses(store, row_ids, 20)
+    middle = store.get_data_version()
+    before = store.get_data(include_removed=True)['Status'].astype(object).copy()
+    _write_statuses(store, row_ids[3:], 10)
+
+    deleted = store.compact_journal(keep=10)
+    assert deleted == 20
+
+    # Behind the compacted journal: no partial answer, the caller has to reload
+    version, deltas = store.get_changes_since(start)
+    assert deltas is None and version == store.get_data_version()
+
+    # Within the kept tail: exactly the later writes, which bring the old copy up to date
+    version, deltas = store.get_changes_since(middle)
+    assert len(deltas) == 10
+    for row_id, field, value in deltas:
+        assert field == 'Status'
+        before[row_id] = value
+    current = store.get_data(include_removed=True)['Status'].astype(object)
+    assert before.equals(current)
+
+    # Up to date: nothing
+    assert store.get_changes_since(version) == (version, [])
+
+def test_reader_behind_compaction_reloads(store):
+    row_ids = [int(i) for i in store.get_data().index[:5]]
+    behind = store.VersionedDataset()
+    behind.sync()
+    _write_statuses(store, row_ids, 30)
+    store.compact_journal(keep=5)
+
+    # Its deltas are gone; it must come back from the snapshot plus the kept tail
+    warm = store._dataset
+    store._dataset = behind
+    try:
+        caught_up = state(store)
+    finally:
+        store._dataset = warm
+    assert caught_up[0].equals(fresh_state(store)[0])
+    assert caught_up[1:] == fresh_state(store)[1:]
+
+def test_new_generation_invalidates_versions(store, raw):
+    old = store.get_data_version()
+    store.apply_custom_mapping(raw, synthetic_data.RAW_MAPPING)
+    version, deltas = store.get_changes_since(old)
+    assert deltas is None and version[0] == old[0] + 1
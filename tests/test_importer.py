@@ -0,0 +1,32 @@
+import io
+import os
+import tempfile
+import time
+
+import importer
+
+def test_spool_keeps_the_suffix_and_contents(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    path = importer.spool(io.BytesIO(b'a,b\n1,2\n'), '계약.CSV')
+    assert os.path.basename(path).startswith(importer.SPOOL_PREFIX)
+    assert path.endswith('.csv')
+    with open(path, 'rb') as f:
+        assert f.read() == b'a,b\n1,2\n'
+    importer.discard_spool(path)
+    importer.discard_spool(path)
+    assert not os.path.exists(path)
+
+def test_sweep_removes_only_stale_spools(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    stale = tmp_path / f'{importer.SPOOL_PREFIX}old.xlsx'
+    fresh = tmp_path / f'{importer.SPOOL_PREFIX}new.xlsx'
+    other = tmp_path / 'unrelated.xlsx'
+    for path in (stale, fresh, other):
+        path.write_bytes(b'x')
+    old = time.time() - importer.SPOOL_MAX_AGE - 60
+    os.utime(stale, (old, old))
+    os.utime(other, (old, old))
+
+    assert importer.sweep_stale_spools() == 1
+    assert not stale.exists()
+    assert fresh.exists() and other.exists()
@@ -0,0 +1,61 @@
+import random
+
+import pandas as pd
+
+import synthetic_data
+from conftest import fresh_state, state
+
+def _assert_same(warm, fresh):
+    pd.testing.assert_frame_equal(warm[0], fresh[0])
+    assert warm[1:] == fresh[1:]
+
+def test_writes_are_visible_to_new_readers(store):
+    contract_no = store.get_data()['Contract No'].iloc[0]
+    store.update_status(contract_no, '완료')
+    store.update_checked(contract_no, True)
+
+    reloaded = fresh_state(store)[0]
+    rows = reloaded[reloaded['Contract No'] == contract_no]
+    assert (rows['Status'] == '완료').all() and rows['Checked'].all()
+
+def test_failed_write_leaves_store_unchanged(store):
+    before = store.get_data_version()
+    row_id = int(store.get_data().index[0])
+    try:
+        store.update_rows([(row_id, 'Status', '완료'), (row_id, 'No Such Field', 1)])
+    except ValueError:
+        pass
+    assert store.get_data_version() == before
+    assert fresh_state(store)[0].loc[row_id, 'Status'] == '미확인'
+
+def test_replay_matches_reload_after_random_writes(store, raw):
+    rng = random.Random(0)
+    # Warm every derived structure first, so the writes below are patched into them rather than rebuilt
+    _assert_same(state(store), fresh_state(store))
+
+    managers = store.get_partition_values('Manager')
+    for step in range(200):
+        df = store.get_data(include_removed=True)
+        row_id = int(rng.choice(df.index))
+        kind = rng.randrange(6)
+        if kind == 0:
+            store.update_rows([(row_id, 'Status', rng.choice(['미확인', '진행중', '완료']))])
+        elif kind == 1:
+            # Includes a manager that did not exist before, i.e. a new category and partition
+            store.update_rows([(row_id, 'Manager', rng.choice(managers + ['신규담당']))])
+        elif kind == 2:
+            store.update_rows([(row_id, 'Company Name', f"한결상사 {step}"), (row_id, 'Monthly Fee', rng.randrange(0, 90_000))])
+        elif kind == 3:
+            store.update_rows([(row_id, 'Removed', not df.at[row_id, 'Removed'])])
+        elif kind == 4:
+            store.batch_update([(df.at[row_id, 'Contract No'], 'Status', '완료')])
+        else:
+            store.update_rows([(row_id, 'Address', f"서울 강남구 역삼동 {step}")])
+        if step % 7 == 0:
+            # Readers catch up in between, so replay runs on many small batches
+            state(store)
+
+    # New rows arrive as whole-row deltas
+    extra = synthetic_data.generate_raw(20, seed=1)
+    store.upsert_mapped_chunks(iter([pd.concat([raw, extra], ignore_index=True)]), synthetic_data.RAW_MAPPING)
+    _assert_same(state(store), fresh_state(store))
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+import synthetic_data
+
+def _change(contract_no, status, changed_at=1.0, version=None):
+    change = {'Contract No': contract_no, 'Status': status, 'changed_at': changed_at}
+    if version is not None:
+        change['version'] = list(version)
+    return change
+
+def _status(dm, contract_no):
+    df = dm.get_data(include_removed=True)
+    return df.loc[df['Contract No'] == contract_no, 'Status'].iloc[0]
+
+@pytest.fixture
+def contracts(store):
+    return store.get_data()['Contract No'].drop_duplicates().iloc[:3].tolist()
+
+def test_change_applies_when_server_unchanged(store, contracts):
+    version = store.get_data_version()
+    result = store.sync_status_changes([_change(contracts[0], '완료')], base_version=version)
+    assert result['applied'] == 1 and result['conflicts'] == []
+    assert _status(store, contracts[0]) == '완료'
+
+def test_server_write_after_base_version_is_a_conflict(store, contracts):
+    version = store.get_data_version()
+    store.update_status(contracts[0], '진행중')
+    result = store.sync_status_changes(
+        [_change(contracts[0], '완료'), _change(contracts[1], '완료')], base_version=version
+    )
+    assert result['applied'] == 1
+    assert [(c['Contract No'], c['server_status']) for c in result['conflicts']] == [(contracts[0], '진행중')]
+    assert _status(store, contracts[0]) == '진행중'
+    assert _status(store, contracts[1]) == '완료'
+
+def test_latest_change_per_contract_wins(store, contracts):
+    version = store.get_data_version()
+    changes = [_change(contracts[0], '완료', changed_at=2.0), _change(contracts[0], '진행중', changed_at=1.0)]
+    assert store.sync_status_changes(changes, base_version=version)['applied'] == 1
+    assert _status(store, contracts[0]) == '완료'
+
+def test_unverifiable_changes_are_conflicts(store, contracts, raw):
+    # No version at all
+    result = store.sync_status_changes([_change(contracts[0], '완료')])
+    assert result['applied'] == 0 and len(result['conflicts']) == 1
+    # Unknown contract
+    result = store.sync_status_changes([_change('NO-SUCH-CONTRACT', '완료')], base_version=store.get_data_version())
+    assert result['conflicts'][0]['server_status'] is None
+    # Made against a table that has since been replaced
+    old = store.get_data_version()
+    store.apply_custom_mapping(raw, synthetic_data.RAW_MAPPING)
+    result = store.sync_status_changes([_change(contracts[0], '완료')], base_version=old)
+    assert result['applied'] == 0 and _status(store, contracts[0]) == '미확인'
+
+def test_bundle_upload_again_is_not_a_conflict_with_itself(store, contracts):
+    manager = store.get_data().set_index('Contract No').at[contracts[0], 'Manager']
+    bundle = json.loads(json.dumps(store.get_route_bundle(manager)))
+    contract_no = bundle['rows'][0][0]
+    bundle['changes'] = [_change(contract_no, '완료')]
+    assert store.sync_route_bundle(bundle)['applied'] == 1
+    assert store.sync_route_bundle(bundle)['conflicts'] == []
+
+    # Edited again on the device after the first upload: still its own write
+    bundle['changes'].append(_change(contract_no, '진행중', changed_at=2.0))
+    assert store.sync_route_bundle(bundle)['conflicts'] == []
+    assert _status(store, contract_no) == '진행중'
+
+    # Another writer in between is a conflict again
+    store.update_status(contract_no, '미확인')
+    bundle['changes'].append(_change(contract_no, '완료', changed_at=3.0))
+    assert len(store.sync_route_bundle(bundle)['conflicts']) == 1
+    # A different bundle does not inherit this one's writes
+    other = dict(bundle, bundle_id='other-device', changes=[_change(contract_no, '완료', changed_at=4.0)])
+    assert len(store.sync_route_bundle(other)['conflicts']) == 1
+
+@pytest.mark.parametrize('payload', [
+    {'rows': []},
+    [1, 2],
+    {'format': 'route-bundle/1', 'bundle_id': 'x', 'version': None, 'changes': []},
+    {'format': 'route-bundle/1', 'bundle_id': 'x', 'version': [1, 0], 'changes': [{'Status': '완료'}]},
+])
+def test_malformed_route_file_is_rejected(store, payload):
+    with pytest.raises(ValueError):
+        store.sync_route_bundle(payload)
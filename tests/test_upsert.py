@@ -0,0 +1,79 @@
+import pandas as pd
+
+import synthetic_data
+from conftest import fresh_state
+
+COLUMN = synthetic_data.RAW_MAPPING
+
+def _upsert(dm, raw_df, chunk=250):
+    chunks = [raw_df.iloc[i:i + chunk] for i in range(0, len(raw_df), chunk)]
+    return dm.upsert_mapped_chunks(iter(chunks), synthetic_data.RAW_MAPPING)
+
+def test_identical_upsert_is_a_no_op(store, raw):
+    version = store.get_data_version()
+    summary = _upsert(store, raw)
+    assert summary == {'inserted': 0, 'updated': 0, 'unchanged': len(raw), 'removed': 0, 'regeocode': 0}
+    assert store.get_data_version() == version
+
+def test_upsert_counts_and_preserved_progress(store, raw):
+    store.geocode_missing(provider=synthetic_data.SyntheticGeocoder())
+    df = store.get_data()
+    worked = df['Contract No'].iloc[:10].tolist()
+    store.batch_update((contract_no, 'Status', '완료') for contract_no in worked)
+
+    source = raw.copy()
+    contract = source[COLUMN['Contract No']].map(store._contract_key)
+    fee_changed = contract.isin(worked[:4])
+    source.loc[fee_changed, COLUMN['Monthly Fee']] = 123_456
+    moved = contract.isin(worked[4:6])
+    source.loc[moved, COLUMN['Address']] = '서울 강남구 역삼동 999-1'
+    dropped = contract.isin(df['Contract No'].iloc[-5:])
+    new_rows = synthetic_data.generate_raw(7, seed=42)
+    source = pd.concat([source[~dropped], new_rows], ignore_index=True)
+
+    summary = _upsert(store, source)
+    assert summary['inserted'] == len(new_rows)
+    assert summary['updated'] == fee_changed.sum() + moved.sum()
+    assert summary['removed'] == dropped.sum()
+    assert summary['unchanged'] == len(raw) - dropped.sum() - summary['updated']
+    assert summary['regeocode'] == moved.sum() + len(new_rows)
+
+    after = store.get_data(include_removed=True)
+    kept = after[after['Contract No'].isin(worked)]
+    # Field progress survives the re-import; coordinates only where the address changed
+    assert (kept['Status'] == '완료').all()
+    relocated = kept['Contract No'].isin(worked[4:6])
+    assert kept.loc[relocated, 'Latitude'].isna().all()
+    assert kept.loc[~relocated, 'Latitude'].notna().all()
+    assert (kept.loc[kept['Contract No'].isin(worked[:4]), 'Monthly Fee'] == 123_456).all()
+    assert after.loc[after['Contract No'].isin(df['Contract No'].iloc[-5:]), 'Removed'].all()
+    assert after.loc[~after['Removed'], 'Contract No'].nunique() == source[COLUMN['Contract No']].nunique()
+
+    # Removed contracts come back when they reappear
+    summary = _upsert(store, raw)
+    assert summary['removed'] == len(new_rows)
+    back = store.get_data(include_removed=True)
+    assert not back.loc[back['Contract No'].isin(df['Contract No'].iloc[-5:]), 'Removed'].any()
+    assert fresh_state(store)[0].equals(back.astype({col: object for col in store.CATEGORY_COLUMNS}))
+
+def test_repeated_contract_numbers_pair_by_order(store, raw):
+    source = raw.copy()
+    source.loc[1, COLUMN['Contract No']] = source.loc[0, COLUMN['Contract No']]
+    store.apply_custom_mapping(source, synthetic_data.RAW_MAPPING)
+    assert _upsert(store, source)['unchanged'] == len(source)
+
+    # The second occurrence is gone from the file: only one of the two rows is removed
+    summary = _upsert(store, source.drop(index=1))
+    assert summary['removed'] == 1
+    contract_no = store._contract_key(source.loc[0, COLUMN['Contract No']])
+    rows = store.get_data(include_removed=True).query('`Contract No` == @contract_no')
+    assert rows['Removed'].tolist() == [False, True]
+
+def test_source_without_manager_keeps_assignment(store, raw):
+    unassigned = store.get_data({'Manager': store.UNASSIGNED})
+    row_id = int(unassigned.index[0])
+    store.update_rows([(row_id, 'Manager', '홍길동')])
+
+    summary = _upsert(store, raw)
+    assert summary['updated'] == 0
+    assert store.get_data(include_removed=True).at[row_id, 'Manager'] == '홍길동'
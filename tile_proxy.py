@@ -0,0 +1,359 @@
+import os
+import math
+import time
+import sqlite3
+import argparse
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Caching proxy for the field map's base layers. Tiles fetched once are served from a local
+# SQLite file, so staff in the same district share one download and the map still draws when
+# the public tile servers throttle or are unreachable.
+#
+#   TILE_PROXY_URL=http://<host>:8765   public base URL of the proxy; unset = tiles come straight from upstream
+#   TILE_PROXY_HOST=127.0.0.1           interface the in-process server binds; the proxy has no authentication,
+#                                       so expose it through the app's reverse proxy rather than binding 0.0.0.0
+#   TILE_PROXY_PORT=8765                port the in-process server listens on
+#   TILE_CACHE_MB=512                   disk budget; least recently used tiles are evicted beyond it
+#   TILE_SOURCE_URL=https://.../{z}/{x}/{y}.png   optional self-hosted or licensed (keyed) tile server, shown as
+#                                       the first base layer; the only layer that may be pre-seeded
+#   TILE_SOURCE_ATTR=...                its attribution
+#
+# Run standalone with `python tile_proxy.py --host 127.0.0.1 --port 8765` when the app processes should not serve tiles.
+
+CACHE_FILE = "tile_cache.db"
+PUBLIC_URL = os.environ.get('TILE_PROXY_URL', '').rstrip('/')
+HOST = os.environ.get('TILE_PROXY_HOST', '127.0.0.1')
+PORT = int(os.environ.get('TILE_PROXY_PORT', 8765))
+MAX_BYTES = int(os.environ.get('TILE_CACHE_MB', 512)) * 1024 * 1024
+
+# Base layers of the field map: upstream URL (first subdomain when it has several), attribution, and
+# whether bulk downloads (seed) are allowed. The public servers' usage policies forbid them (OSM's tile
+# usage policy, Google's terms), so those tiles are only cached as staff view them.
+LAYERS = {
+    'osm': {
+        'url': 'https://tile.openstreetmap.org/{z}/{x}/{y}.png',
+        'attr': '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors',
+        'seed': False,
+    },
+    'carto': {
+        'url': 'https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}.png',
+        'attr': '&copy; OpenStreetMap contributors &copy; <a href="https://carto.com/attributions">CARTO</a>',
+        'seed': False,
+    },
+    'google': {
+        'url': 'http://mt0.google.com/vt/lyrs=y&hl=ko&x={x}&y={y}&z={z}',
+        'attr': 'Google',
+        'seed': False,
+    },
+}
+if os.environ.get('TILE_SOURCE_URL'):
+    LAYERS['source'] = {
+        'url': os.environ['TILE_SOURCE_URL'],
+        'attr': os.environ.get('TILE_SOURCE_ATTR', ''),
+        'seed': True,
+    }
+
+USER_AGENT = "field_sales_app tile proxy"
+FETCH_TIMEOUT = 10
+# Cached tiles older than this are refetched when upstream answers; otherwise the old tile is served
+REFRESH_AFTER = 30 * 24 * 3600
+# Last-access times are only rewritten this often, so a busy map does not turn every read into a write
+ACCESS_RESOLUTION = 3600
+# Eviction frees down to this share of MAX_BYTES so it does not run on every insert
+EVICT_TO = 0.9
+
+# Highest zoom any layer serves; requests outside 0..MAX_ZOOM or the zoom's tile grid are not forwarded
+MAX_ZOOM = 20
+
+SEED_ZOOMS = range(12, 17)
+MAX_SEED_TILES = 20_000
+SEED_WORKERS = 2
+
+def tile_url(layer):
+    """URL template for a folium TileLayer: through the proxy when TILE_PROXY_URL is set, else upstream."""
+    if not PUBLIC_URL:
+        return LAYERS[layer]['url']
+    start_server()
+    return f"{PUBLIC_URL}/{layer}/{{z}}/{{x}}/{{y}}.png"
+
+def seedable_layers():
+    """Layers whose source allows bulk downloads (see LAYERS)."""
+    return [layer for layer, info in LAYERS.items() if info['seed']]
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+def tile_range(south, west, north, east, zoom):
+    """(x_min, x_max, y_min, y_max) of the Web Mercator tiles covering a bounding box."""
+    def to_tile(lat, lng):
+        lat = max(min(lat, 85.0511), -85.0511)
+        n = 1 << zoom
+        x = int((lng + 180.0) / 360.0 * n)
+        y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+        return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+    x_min, y_min = to_tile(north, west)
+    x_max, y_max = to_tile(south, east)
+    return x_min, x_max, y_min, y_max
+
+class TileCache:
+    """
+    Tiles on disk keyed by (layer, z, x, y). The table is clustered on that
+    key, so each zoom level's tiles are stored together. Eviction is least
+    recently used by total size.
+    """
+
+    def __init__(self, path=CACHE_FILE, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tiles ("
+                "layer TEXT NOT NULL, z INTEGER NOT NULL, x INTEGER NOT NULL, y INTEGER NOT NULL, "
+                "content_type TEXT, data BLOB NOT NULL, size INTEGER NOT NULL, fetched_at REAL, accessed_at REAL, "
+                "PRIMARY KEY (layer, z, x, y)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tiles_accessed ON tiles (accessed_at)")
+            self._bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM tiles").fetchone()[0]
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @property
+    def size(self):
+        return self._bytes
+
+    def get(self, layer, z, x, y):
+        """(content_type, data, fetched_at) or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT content_type, data, fetched_at, accessed_at FROM tiles WHERE layer = ? AND z = ? AND x = ? AND y = ?",
+                (layer, z, x, y)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - (row[3] or 0) > ACCESS_RESOLUTION:
+                conn.execute(
+                    "UPDATE tiles SET accessed_at = ? WHERE layer = ? AND z = ? AND x = ? AND y = ?",
+                    (now, layer, z, x, y)
+                )
+        finally:
+            conn.close()
+        return row[0], row[1], row[2]
+
+    def has(self, layer, z, x, y):
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT 1 FROM tiles WHERE layer = ? AND z = ? AND x = ? AND y = ?", (layer, z, x, y)
+            ).fetchone() is not None
+        finally:
+            conn.close()
+
+    def put(self, layer, z, x, y, content_type, data):
+        now = time.time()
+        conn = self._connect()
+        try:
+            previous = conn.execute(
+                "SELECT size FROM tiles WHERE layer = ? AND z = ? AND x = ? AND y = ?", (layer, z, x, y)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (layer, z, x, y, content_type, data, len(data), now, now)
+            )
+        finally:
+            conn.close()
+        with self._lock:
+            self._bytes += len(data) - (previous[0] if previous else 0)
+            over = self._bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self):
+        """Deletes least recently used tiles until the cache is back under EVICT_TO of its budget."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                # Other processes share the file; start from its real size
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM tiles").fetchone()[0]
+                target = self.max_bytes * EVICT_TO
+                doomed = []
+                for layer, z, x, y, size in conn.execute(
+                    "SELECT layer, z, x, y, size FROM tiles ORDER BY accessed_at"
+                ):
+                    if total <= target:
+                        break
+                    doomed.append((layer, z, x, y))
+                    total -= size
+                conn.executemany("DELETE FROM tiles WHERE layer = ? AND z = ? AND x = ? AND y = ?", doomed)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+            self._bytes = total
+        if doomed:
+            print(f"Evicted {len(doomed)} map tiles")
+        return len(doomed)
+
+_cache = None
+_cache_lock = threading.Lock()
+# (layer, z, x, y) -> Event; concurrent requests for a tile wait for one upstream fetch
+_inflight = {}
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TileCache()
+        return _cache
+
+def _fetch_upstream(layer, z, x, y):
+    url = LAYERS[layer]['url'].format(s='a', z=z, x=x, y=y)
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+        return response.headers.get('Content-Type', 'image/png'), response.read()
+
+def get_tile(layer, z, x, y):
+    """(content_type, data) from the cache, fetched upstream on a miss. Raises when neither has it."""
+    if not valid_tile(z, x, y):
+        raise LookupError(f"Tile {(layer, z, x, y)} out of range")
+    cache = get_cache()
+    cached = cache.get(layer, z, x, y)
+    if cached and time.time() - (cached[2] or 0) < REFRESH_AFTER:
+        return cached[0], cached[1]
+    key = (layer, z, x, y)
+    with _cache_lock:
+        event = _inflight.get(key)
+        owner = event is None
+        if owner:
+            event = _inflight[key] = threading.Event()
+    if not owner:
+        event.wait(FETCH_TIMEOUT)
+        found = cache.get(layer, z, x, y) or cached
+        if found is None:
+            raise LookupError(f"Tile {key} unavailable")
+        return found[0], found[1]
+    try:
+        content_type, data = _fetch_upstream(layer, z, x, y)
+        cache.put(layer, z, x, y, content_type, data)
+        return content_type, data
+    except OSError:
+        # Upstream down or throttling: an old tile beats a blank map
+        if cached:
+            return cached[0], cached[1]
+        raise
+    finally:
+        with _cache_lock:
+            _inflight.pop(key, None)
+        event.set()
+
+def seed(bounds, layers=None, zooms=SEED_ZOOMS, max_tiles=MAX_SEED_TILES, progress=None):
+    """
+    Downloads the tiles covering `bounds` [(south, west, north, east), ...]
+    that are not cached yet, lowest zoom first so a partial run still covers
+    every area. Only seedable_layers() are fetched; others in `layers` are
+    skipped. At most `max_tiles` are fetched. Returns the number fetched.
+    """
+    layers = [layer for layer in layers or LAYERS if LAYERS[layer]['seed']]
+    if not layers:
+        print("No tile source allows seeding; set TILE_SOURCE_URL to a self-hosted or licensed tile server")
+        return 0
+    cache = get_cache()
+    wanted = []
+    for z in zooms:
+        for layer in layers:
+            for south, west, north, east in bounds:
+                x_min, x_max, y_min, y_max = tile_range(south, west, north, east, z)
+                wanted.extend((layer, z, x, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1))
+    # Overlapping boxes share tiles; dict keeps the zoom order
+    missing = [tile for tile in dict.fromkeys(wanted) if not cache.has(*tile)][:max_tiles]
+    fetched = 0
+
+    def fetch(tile):
+        try:
+            get_tile(*tile)
+            return True
+        except (OSError, LookupError) as e:
+            print(f"Tile {tile} not seeded: {e}")
+            return False
+
+    # Few workers: even a permitted source should not be flooded
+    with ThreadPoolExecutor(max_workers=SEED_WORKERS) as pool:
+        for done, ok in enumerate(pool.map(fetch, missing), start=1):
+            fetched += ok
+            if progress:
+                progress(done, len(missing))
+    return fetched
+
+class _TileHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        # /<layer>/<z>/<x>/<y>.png
+        parts = self.path.split('?')[0].strip('/').split('/')
+        try:
+            layer, z, x, y = parts[0], int(parts[1]), int(parts[2]), int(parts[3].split('.')[0])
+            if layer not in LAYERS or not valid_tile(z, x, y):
+                raise ValueError(layer)
+        except (IndexError, ValueError):
+            self.send_error(404)
+            return
+        try:
+            content_type, data = get_tile(layer, z, x, y)
+        except (OSError, LookupError):
+            self.send_error(502)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'public, max-age=86400')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+
+def start_server(port=PORT, host=HOST):
+    """Starts the proxy on a daemon thread once per process. Another process already on the port serves it instead."""
+    global _server
+    with _cache_lock:
+        if _server is not None:
+            return _server
+        try:
+            _server = ThreadingHTTPServer((host, port), _TileHandler)
+        except OSError as e:
+            print(f"Tile proxy not started on port {port}: {e}")
+            _server = False
+            return _server
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="tile-proxy", daemon=True).start()
+        print(f"Tile proxy listening on {host}:{port}")
+        return _server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Caching map tile proxy for the field map.")
+    parser.add_argument('--host', default=HOST, help="interface to bind (default %(default)s)")
+    parser.add_argument('--port', type=int, default=PORT)
+    args = parser.parse_args()
+    start_server(args.port, args.host)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass